@@ -1,13 +1,29 @@
 import os
 from datetime import timedelta
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, g, jsonify, request
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 from marshmallow import ValidationError
 
 # Import Models and Extensions
 from models import db, Category, User
 from schemas import ma
-from services.auth_service import bcrypt
+from services.auth_service import bcrypt, password_pool
+from services.token_service import UserClaimsCache, TokenBlocklist
+from utils.store import shared_store
+from utils.response_cache import response_cache
+from utils.rate_limit import rate_limiter
+from utils.json_provider import FastJSONProvider
+from utils.metrics import request_metrics
+from utils.profiling import request_profiler
+from utils.slow_query_log import slow_query_log
+from utils.db_engine import engine_options, configure_engine, REPLICA_BIND
+from services.image_processing import image_pipeline
+from services.storage import storage
+from services.search_index import search_index
+from services.cart_store import cart_store
+from utils.uploads import StreamingUploadRequest
+from exceptions import InvalidUploadException, ServiceBusyException, RateLimitExceededException
 from flask_jwt_extended import JWTManager
 
 # Import Blueprints
@@ -15,28 +31,188 @@ from routes.auth_routes import auth_bp
 from routes.product_routes import prod_bp
 from routes.cart_routes import cart_bp
 from routes.image_routes import image_bp
+from routes.debug_routes import debug_bp
+from commands import products_cli
 
 load_dotenv()
 
 def create_app():
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.request_class = StreamingUploadRequest
     
     # --- Configuration ---
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///ecommerce.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    
+    # Connection pool and engine tuning (pool settings apply per process)
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 10))
+    app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    app.config['DB_POOL_TIMEOUT'] = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    app.config['DB_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+    app.config['DB_STATEMENT_TIMEOUT_MS'] = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))  # PostgreSQL/MySQL, 0 = off
+    app.config['SQLITE_JOURNAL_MODE'] = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config)
+    
+    # Optional read replica for the read-only catalog routes; reads go to the
+    # primary for REPLICA_LAG_GRACE seconds after each catalog write
+    app.config['REPLICA_DATABASE_URL'] = os.getenv('REPLICA_DATABASE_URL')
+    app.config['REPLICA_LAG_GRACE'] = float(os.getenv('REPLICA_LAG_GRACE', 5))
+    if app.config['REPLICA_DATABASE_URL']:
+        replica_url = app.config['REPLICA_DATABASE_URL']
+        app.config['SQLALCHEMY_BINDS'] = {
+            REPLICA_BIND: {'url': replica_url, **engine_options(replica_url, app.config)}
+        }
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'dev-secret-key')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
     app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
     
+    # Password hashing: bcrypt cost and the bounded verification pool
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    app.config['BCRYPT_WORKERS'] = int(os.getenv('BCRYPT_WORKERS', os.cpu_count() or 1))
+    app.config['BCRYPT_MAX_PENDING'] = int(os.getenv('BCRYPT_MAX_PENDING', app.config['BCRYPT_WORKERS'] * 8))
+    
+    # Cached user claims for JWT-protected routes (seconds)
+    app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', 300))
+    
+    # Admission control: per-blueprint token buckets for write requests
+    # ('<count>/<second|minute|hour|day>', empty to disable) and per-worker
+    # caps on in-flight uploads and checkouts
+    app.config['RATE_LIMITS'] = {
+        'auth': os.getenv('RATE_LIMIT_AUTH', '10/minute'),
+        'cart': os.getenv('RATE_LIMIT_CART', '60/minute'),
+        'images': os.getenv('RATE_LIMIT_IMAGES', '20/minute'),
+        'products': os.getenv('RATE_LIMIT_PRODUCTS', '120/minute'),
+    }
+    app.config['RATE_LIMIT_STORAGE_URL'] = os.getenv('RATE_LIMIT_STORAGE_URL')  # memory:// per worker, or a shared store URL
+    app.config['CONCURRENCY_LIMITS'] = {
+        'uploads': int(os.getenv('MAX_CONCURRENT_UPLOADS', 8)),
+        'checkouts': int(os.getenv('MAX_CONCURRENT_CHECKOUTS', 16)),
+    }
+    # Reverse proxies / CDN hops in front of the app whose X-Forwarded-* headers
+    # are trusted, so anonymous clients are told apart by their real IP (0: none)
+    app.config['TRUSTED_PROXY_COUNT'] = int(os.getenv('TRUSTED_PROXY_COUNT', 0))
+    if app.config['TRUSTED_PROXY_COUNT']:
+        hops = app.config['TRUSTED_PROXY_COUNT']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
+    
+    # Pagination Configuration
+    app.config['PRODUCTS_PAGE_SIZE'] = int(os.getenv('PRODUCTS_PAGE_SIZE', 50))
+    app.config['PRODUCTS_MAX_PAGE_SIZE'] = int(os.getenv('PRODUCTS_MAX_PAGE_SIZE', 200))
+    
+    # Product search: 'auto' (SQLite FTS5 / Postgres tsvector / in-memory), 'fts5', 'postgres' or 'memory'
+    app.config['SEARCH_BACKEND'] = os.getenv('SEARCH_BACKEND', 'auto')
+    app.config['SEARCH_FALLBACK_MAX_MATCHES'] = int(os.getenv('SEARCH_FALLBACK_MAX_MATCHES', 5000))
+    app.config['SEARCH_PRICE_BUCKETS'] = [25, 50, 100, 250, 500]  # Upper bounds of the price facet ranges
+    
+    # Rows per batch for the streaming catalog export
+    app.config['EXPORT_BATCH_SIZE'] = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+    
+    # Bulk product import
+    app.config['IMPORT_CHUNK_SIZE'] = int(os.getenv('IMPORT_CHUNK_SIZE', 1000))
+    app.config['MAX_IMPORT_CONTENT_LENGTH'] = int(os.getenv('MAX_IMPORT_CONTENT_LENGTH', 512 * 1024 * 1024))
+    
+    # HTTP caching for public catalog endpoints (seconds)
+    app.config['CATALOG_CACHE_MAX_AGE'] = int(os.getenv('CATALOG_CACHE_MAX_AGE', 60))
+    app.config['CATALOG_STOCK_STALENESS'] = int(os.getenv('CATALOG_STOCK_STALENESS', 30))  # How long checkouts may leave stock stale
+    
+    # Server-side cache of encoded catalog responses (memory://, file:///path, redis://..., none://)
+    app.config['RESPONSE_CACHE_URL'] = os.getenv('RESPONSE_CACHE_URL')
+    app.config['RESPONSE_CACHE_TTL'] = int(os.getenv('RESPONSE_CACHE_TTL', 300))
+    app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+    app.config['RESPONSE_CACHE_MAX_BYTES'] = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    
+    # Request instrumentation: Server-Timing, 'app.requests' log lines and Prometheus metrics
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    app.config['METRICS_PATH'] = os.getenv('METRICS_PATH', '/metrics')
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')  # Scraper bearer token; unset = admins only
+    
+    # On-demand profiling (admins send X-Profile: pstats|collapsed) and the slow-query log
+    app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+    app.config['PROFILE_SAMPLE_INTERVAL'] = float(os.getenv('PROFILE_SAMPLE_INTERVAL', 0.005))
+    app.config['SLOW_QUERY_MS'] = int(os.getenv('SLOW_QUERY_MS', 0))  # Off unless set per environment, e.g. 200
+    app.config['SLOW_QUERY_KEEP'] = int(os.getenv('SLOW_QUERY_KEEP', 100))
+    app.config['SLOW_QUERY_EXPLAIN'] = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() in ('1', 'true', 'yes')
+    
+    # Shared store for cross-worker state (memory://, file:///path, redis://...)
+    app.config['SHARED_STORE_URL'] = os.getenv('SHARED_STORE_URL')
+    
+    # Carts in a key/value store (memory:// for one worker, redis://... for several),
+    # written back to CartItem every CART_WRITEBACK_INTERVAL seconds; unset keeps them in the database
+    app.config['CART_STORE_URL'] = os.getenv('CART_STORE_URL')
+    app.config['CART_STORE_TTL'] = int(os.getenv('CART_STORE_TTL', 7 * 24 * 3600))
+    app.config['CART_WRITEBACK_INTERVAL'] = float(os.getenv('CART_WRITEBACK_INTERVAL', 5))
+    app.config['CART_MAX_BATCH_ITEMS'] = int(os.getenv('CART_MAX_BATCH_ITEMS', 100))  # Lines per PATCH/PUT /api/cart
+    
     # File Upload Configuration
     app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB max file size
     
+    # Cache lifetime for content-addressed images served from /static (1 year)
+    app.config['STATIC_IMAGE_MAX_AGE'] = int(os.getenv('STATIC_IMAGE_MAX_AGE', 365 * 24 * 3600))
+    
+    # Image storage backend: 'local' (static/ on this node) or 's3' (any S3-compatible API)
+    app.config['STORAGE_BACKEND'] = os.getenv('STORAGE_BACKEND', 'local')
+    app.config['STORAGE_LOCAL_ROOT'] = os.getenv('STORAGE_LOCAL_ROOT', os.path.join(app.root_path, 'static'))
+    # Incoming uploads are streamed here; keep it on the same filesystem as STORAGE_LOCAL_ROOT
+    app.config['UPLOAD_STAGING_DIR'] = os.getenv('UPLOAD_STAGING_DIR', os.path.join(app.config['STORAGE_LOCAL_ROOT'], '.incoming'))
+    app.config['S3_BUCKET'] = os.getenv('S3_BUCKET')
+    app.config['S3_ENDPOINT_URL'] = os.getenv('S3_ENDPOINT_URL')  # e.g. MinIO: http://localhost:9000
+    app.config['S3_REGION'] = os.getenv('S3_REGION')
+    app.config['S3_KEY_PREFIX'] = os.getenv('S3_KEY_PREFIX', '')
+    app.config['S3_PUBLIC_BASE_URL'] = os.getenv('S3_PUBLIC_BASE_URL')  # CDN/public bucket; presigned redirects if unset
+    app.config['S3_PRESIGN_EXPIRES'] = int(os.getenv('S3_PRESIGN_EXPIRES', 3600))
+    app.config['S3_MAX_POOL_CONNECTIONS'] = int(os.getenv('S3_MAX_POOL_CONNECTIONS', 10))
+    # Local copies of S3 uploads until the image pipeline has processed them
+    app.config['STORAGE_WORK_DIR'] = os.getenv('STORAGE_WORK_DIR', os.path.join(app.instance_path, 'image-work'))
+    
+    # Background image processing ('thread', 'process' or 'sync')
+    app.config['IMAGE_EXECUTOR'] = os.getenv('IMAGE_EXECUTOR', 'thread')
+    app.config['IMAGE_WORKERS'] = int(os.getenv('IMAGE_WORKERS', 2))
+    app.config['IMAGE_VARIANT_SIZES'] = {'thumb': 150, 'medium': 600, 'large': 1600}
+    app.config['IMAGE_MAX_DIMENSION'] = int(os.getenv('IMAGE_MAX_DIMENSION', 2048))
+    
     # --- Initialize Extensions ---
     db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            configure_engine(engine, app.config)
+    request_metrics.init_app(app)
+    slow_query_log.init_app(app)
+    request_profiler.init_app(app)
     ma.init_app(app)
     bcrypt.init_app(app)
+    password_pool.init_app(app)
+    shared_store.init_app(app)
+    cart_store.init_app(app)
+    response_cache.init_app(app)
+    rate_limiter.init_app(app)
+    storage.init_app(app)
+    image_pipeline.init_app(app)
+    search_index.init_app(app)
     jwt = JWTManager(app)
     
+    # --- JWT Callbacks ---
+    # Both are served from the shared store, so authenticated requests
+    # don't hit the database just to re-check who the caller is
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return TokenBlocklist.is_revoked(jwt_payload)
+    
+    @jwt.user_lookup_loader
+    def load_user(jwt_header, jwt_payload):
+        # Reuse the user if the rate limiter already verified this request's token
+        current = request._get_current_object()
+        cached = g.get('jwt_user')
+        if cached and cached[0] is current and cached[1] == jwt_payload['sub']:
+            return cached[2]
+        user = UserClaimsCache.get_user(jwt_payload['sub'])
+        g.jwt_user = (current, jwt_payload['sub'], user)
+        return user
+    
     # --- Global Error Handlers ---
     @app.errorhandler(ValidationError)
     def handle_marshmallow_validation(err):
@@ -46,6 +222,22 @@ def create_app():
     def resource_not_found(e):
         return jsonify({"error": "Resource not found"}), 404
     
+    @app.errorhandler(InvalidUploadException)
+    def handle_invalid_upload(err):
+        return jsonify({"error": str(err)}), err.status_code
+    
+    @app.errorhandler(ServiceBusyException)
+    def handle_service_busy(err):
+        response = jsonify({"error": str(err)})
+        response.headers['Retry-After'] = str(err.retry_after)
+        return response, 503
+    
+    @app.errorhandler(RateLimitExceededException)
+    def handle_rate_limited(err):
+        response = jsonify({"error": str(err)})
+        response.headers['Retry-After'] = str(err.retry_after)
+        return response, 429
+    
     @app.errorhandler(413)
     def too_large(e):
         return jsonify({"error": "File too large. Maximum size: 5MB"}), 413
@@ -53,18 +245,23 @@ def create_app():
     # --- Serve Static Files (Images) ---
     @app.route('/static/<folder>/<filename>')
     def serve_image(folder, filename):
-        """Serve uploaded images"""
-        return send_from_directory(os.path.join(app.root_path, 'static', folder), filename)
+        """Serve uploaded images (local disk) or redirect to them (object storage)"""
+        return storage.serve(folder, filename)
     
     # --- Register Blueprints ---
     app.register_blueprint(auth_bp, url_prefix='/api')
     app.register_blueprint(prod_bp, url_prefix='/api')
     app.register_blueprint(cart_bp, url_prefix='/api')
     app.register_blueprint(image_bp, url_prefix='/api')
+    app.register_blueprint(debug_bp, url_prefix='/api')
+    
+    # --- CLI Commands ---
+    app.cli.add_command(products_cli)
     
     # --- Database Setup & Seeding ---
     with app.app_context():
         db.create_all()
+        search_index.create_schema()
         seed_categories()
         seed_admin()
     
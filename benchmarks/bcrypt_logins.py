@@ -0,0 +1,59 @@
+"""
+Benchmark: POST /api/login throughput at several bcrypt cost settings.
+
+    python benchmarks/bcrypt_logins.py [--costs 10,11,12] [--logins 40] [--threads 8]
+
+Reports logins/sec overall and per core (BCRYPT_WORKERS pool threads, one
+per core by default).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = 'bench-password'
+
+
+def run(cost, logins, threads):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    os.environ['BCRYPT_LOG_ROUNDS'] = str(cost)
+    os.environ['RATE_LIMIT_AUTH'] = ''  # Measure bcrypt, not the login rate limit
+    from app import create_app
+    
+    app = create_app()
+    client = app.test_client()
+    client.post('/api/register', json={'username': 'bench', 'password': PASSWORD})
+    
+    def login(_):
+        response = client.post('/api/login', json={'username': 'bench', 'password': PASSWORD})
+        return response.status_code
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        statuses = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    ok = statuses.count(200)
+    cores = min(app.config['BCRYPT_WORKERS'], os.cpu_count() or 1)
+    return ok, len(statuses) - ok, ok / elapsed, ok / elapsed / cores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--costs', default='10,11,12')
+    parser.add_argument('--logins', type=int, default=40)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+    
+    print(f"{'cost':>4} {'ok':>5} {'busy':>5} {'logins/s':>10} {'per core':>10}")
+    for cost in (int(c) for c in args.costs.split(',')):
+        ok, busy, rate, per_core = run(cost, args.logins, args.threads)
+        print(f"{cost:>4} {ok:>5} {busy:>5} {rate:>10.1f} {per_core:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Microbenchmark: stdlib vs orjson encoding of a 10k-product catalog dump.
+
+    python benchmarks/json_encoding.py [--products 10000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from flask.json.provider import DefaultJSONProvider
+from app import create_app
+from models import Category, Offer, Product
+from schemas import products_schema
+from utils.json_provider import FastJSONProvider, orjson
+
+
+def build_products(count):
+    now = datetime.utcnow()
+    category = Category(id=1, name="Electronics")
+    offer = Offer(id=1, name="Sale", discount_percent=15,
+                  start_time=now - timedelta(days=1), end_time=now + timedelta(days=1))
+    return [
+        Product(id=i, name=f"Product {i}", price=10 + i % 500, stock=i % 40,
+                category_id=1, category=category,
+                offer_id=1 if i % 3 == 0 else None, offer=offer if i % 3 == 0 else None,
+                image=f"{i:032x}.jpg" if i % 2 else None)
+        for i in range(1, count + 1)
+    ]
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    app = create_app()
+    with app.app_context():
+        data = products_schema.dump(build_products(args.products))
+        providers = [("stdlib", DefaultJSONProvider(app))]
+        if orjson is not None:
+            providers.append(("orjson", FastJSONProvider(app)))
+        else:
+            print("orjson not installed; only the stdlib provider is measured")
+        
+        baseline = None
+        for name, provider in providers:
+            seconds = best_of(args.repeat, lambda: provider.response(data))
+            size = len(provider.response(data).get_data())
+            baseline = baseline or seconds
+            print(f"{name:>7}: {seconds * 1000:8.2f} ms  {size / 1024:8.1f} KiB  "
+                  f"x{baseline / seconds:.2f}")
+
+
+if __name__ == '__main__':
+    main()
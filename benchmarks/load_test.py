@@ -0,0 +1,500 @@
+"""
+Load test: drives the main API flows and reports latency, throughput and SQL per request.
+
+    # In-process (Flask test client), seeding a fresh SQLite database
+    python benchmarks/load_test.py --products 100000 --requests 500 --concurrency 8
+    
+    # Over HTTP against gunicorn started by the harness on the seeded database
+    python benchmarks/load_test.py --mode http --gunicorn --workers 4 --threads 4
+    
+    # Over HTTP against a server you started yourself on the same DATABASE_URL
+    python benchmarks/load_test.py --seed-only --database-url sqlite:////tmp/bench.db
+    python benchmarks/load_test.py --mode http --url http://127.0.0.1:8000 --database-url sqlite:////tmp/bench.db
+    
+    # Record a baseline, then compare later runs against it (exit code 1 on regression)
+    python benchmarks/load_test.py --save-baseline benchmarks/baseline.json
+    python benchmarks/load_test.py --baseline benchmarks/baseline.json
+
+Scenarios: browse, active_offers, add_to_cart, checkout, login, image_upload
+(--scenarios to pick). SQL counts come from the Server-Timing header, so
+they are reported in both modes as long as METRICS_ENABLED is on. Rate
+limits are disabled for the run. Baselines are machine specific: record
+and compare them on the same host.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSWORD = 'bench-password'
+SCENARIOS = ('browse', 'active_offers', 'add_to_cart', 'checkout', 'login', 'image_upload')
+SQL_COUNT_RE = re.compile(r'sql;[^,]*desc="(\d+) queries"')
+ADJECTIVES = ('Classic', 'Smart', 'Portable', 'Wireless', 'Organic', 'Deluxe', 'Compact', 'Ultra', 'Eco', 'Pro')
+NOUNS = ('Lamp', 'Speaker', 'Backpack', 'Kettle', 'Headphones', 'Notebook', 'Sneakers', 'Blender', 'Watch', 'Camera')
+
+
+# --- Environment & seeding ---
+
+def bench_environment(args):
+    """Settings for the app under test (in this process and for gunicorn)"""
+    env = {
+        'DATABASE_URL': args.database_url,
+        'BCRYPT_LOG_ROUNDS': str(args.bcrypt_rounds),
+        'IMAGE_EXECUTOR': 'thread',
+        'MAX_CONCURRENT_UPLOADS': str(max(64, args.concurrency * 2)),
+        'MAX_CONCURRENT_CHECKOUTS': str(max(64, args.concurrency * 2)),
+        'METRICS_ENABLED': 'true',
+        'SLOW_QUERY_MS': '0',
+    }
+    for name in ('AUTH', 'CART', 'IMAGES', 'PRODUCTS'):
+        env[f'RATE_LIMIT_{name}'] = ''
+    if args.no_response_cache:
+        env['RESPONSE_CACHE_URL'] = 'none://'
+    return env
+
+
+def seed(app, args):
+    """Insert synthetic categories, offers, products, users and carts (skipped if already seeded)"""
+    from sqlalchemy import insert, func
+    from models import db, Category, Offer, Product, User, CartItem
+    from services import bcrypt
+    from services.search_index import search_index
+    from utils.http_cache import bump_catalog_version
+    
+    rng = random.Random(args.seed)
+    with app.app_context():
+        if db.session.query(User.id).filter(User.username == 'bench_0').first():
+            print("Database already seeded, reusing it")
+            return
+        started = time.perf_counter()
+        
+        existing = db.session.query(func.count(Category.id)).scalar()
+        if args.categories > existing:
+            db.session.execute(insert(Category), [
+                {'name': f'Bench category {i}'} for i in range(existing, args.categories)
+            ])
+        category_ids = [cid for (cid,) in db.session.query(Category.id)]
+        
+        now = datetime.utcnow()
+        offers = []
+        for i in range(args.offers):
+            if i % 4 == 3:  # Some expired offers, like a real catalog
+                start, end = now - timedelta(days=60), now - timedelta(days=30)
+            else:
+                start, end = now - timedelta(days=1), now + timedelta(days=30)
+            offers.append({'name': f'Bench offer {i}', 'discount_percent': rng.choice((5, 10, 15, 20)),
+                           'start_time': start, 'end_time': end})
+        if offers:
+            db.session.execute(insert(Offer), offers)
+        offer_ids = [oid for (oid,) in db.session.query(Offer.id)]
+        
+        batch = []
+        for i in range(args.products):
+            batch.append({
+                'sku': f'BENCH-{i:07d}',
+                'name': f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}',
+                'price': round(rng.uniform(1, 1000), 2),
+                'stock': 1_000_000,
+                'category_id': rng.choice(category_ids),
+                'offer_id': rng.choice(offer_ids) if offer_ids and rng.random() < args.offer_ratio else None,
+            })
+            if len(batch) == 10_000:
+                db.session.execute(insert(Product), batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(Product), batch)
+        
+        # One hash for every bench user, at the configured cost (no rehash on login)
+        password_hash = bcrypt.generate_password_hash(PASSWORD, args.bcrypt_rounds).decode('utf-8')
+        db.session.execute(insert(User), [
+            {'username': f'bench_{i}', 'password': password_hash, 'is_admin': False}
+            for i in range(args.users)
+        ])
+        db.session.commit()
+        
+        user_ids = [uid for (uid,) in db.session.query(User.id).filter(User.username.like('bench\\_%', escape='\\'))]
+        max_product = db.session.query(func.max(Product.id)).scalar()
+        cart_rows = [
+            {'user_id': uid, 'product_id': rng.randint(1, max_product), 'quantity': rng.randint(1, 3)}
+            for uid in user_ids[:args.carts] for _ in range(rng.randint(1, 5))
+        ]
+        if cart_rows:
+            db.session.execute(insert(CartItem), cart_rows)
+        db.session.commit()
+        search_index.invalidate()
+        bump_catalog_version()
+        print(f"Seeded {args.products} products, {args.offers} offers, {args.users} users, "
+              f"{min(args.carts, args.users)} carts in {time.perf_counter() - started:.1f}s")
+
+
+def catalog_bounds(app):
+    from sqlalchemy import func
+    from models import db, Product, Category
+    with app.app_context():
+        max_product = db.session.query(func.max(Product.id)).scalar() or 1
+        category_ids = [cid for (cid,) in db.session.query(Category.id)]
+    return max_product, category_ids
+
+
+# --- Clients ---
+
+class InProcessClient:
+    """Flask test client with the same interface as HttpClient"""
+    
+    def __init__(self, app):
+        self.client = app.test_client()
+    
+    def request(self, method, path, headers=None, json_body=None, upload=None):
+        kwargs = {'headers': headers or {}}
+        if json_body is not None:
+            kwargs['json'] = json_body
+        if upload is not None:
+            name, content = upload
+            kwargs['data'] = {'image': (io.BytesIO(content), name)}
+            kwargs['content_type'] = 'multipart/form-data'
+        response = self.client.open(path, method=method, **kwargs)
+        return response.status_code, response.headers, response.get_json(silent=True)
+
+
+class HttpClient:
+    """requests.Session against a running server"""
+    
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+    
+    def request(self, method, path, headers=None, json_body=None, upload=None):
+        kwargs = {'headers': headers or {}, 'json': json_body}
+        if upload is not None:
+            name, content = upload
+            kwargs['files'] = {'image': (name, content, 'image/png')}
+        response = self.session.request(method, self.base_url + path, **kwargs)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response.status_code, response.headers, body
+
+
+# --- Scenarios ---
+
+class Worker:
+    """One simulated client: its own connection, user and random stream"""
+    
+    def __init__(self, client, index, max_product, category_ids, seed):
+        self.client = client
+        self.index = index
+        self.max_product = max_product
+        self.category_ids = category_ids
+        self.rng = random.Random(seed * 1000 + index)
+        self.username = f'bench_{index}'
+        self.auth = None
+        self.images_uploaded = set()
+    
+    def login(self):
+        status, _, body = self.client.request('POST', '/api/login',
+                                              json_body={'username': self.username, 'password': PASSWORD})
+        if status != 200:
+            raise RuntimeError(f"Login failed for {self.username}: {status} {body}")
+        self.auth = {'Authorization': f"Bearer {body['access_token']}"}
+    
+    def product_id(self):
+        return self.rng.randint(1, self.max_product)
+    
+    def browse(self):
+        from utils.pagination import encode_cursor
+        params = [f"limit=50", f"cursor={encode_cursor(self.rng.randint(0, self.max_product))}"]
+        if self.rng.random() < 0.5:
+            params.append(f"category_id={self.rng.choice(self.category_ids)}")
+        return self.client.request('GET', '/api/products?' + '&'.join(params))
+    
+    def active_offers(self):
+        return self.client.request('GET', '/api/offers/active')
+    
+    def add_to_cart(self):
+        return self.client.request('POST', '/api/cart', headers=self.auth,
+                                   json_body={'product_id': self.product_id(), 'quantity': 1})
+    
+    def prepare_checkout(self):
+        for _ in range(self.rng.randint(1, 3)):
+            self.add_to_cart()
+    
+    def checkout(self):
+        return self.client.request('POST', '/api/checkout', headers=self.auth)
+    
+    def login_request(self):
+        return self.client.request('POST', '/api/login',
+                                   json_body={'username': self.username, 'password': PASSWORD})
+    
+    def image_upload(self):
+        from PIL import Image
+        product_id = self.product_id()
+        # Distinct bytes every time, so each upload is stored and processed
+        image = Image.new('RGB', (640, 480), tuple(self.rng.randrange(256) for _ in range(3)))
+        image.putpixel((self.rng.randrange(640), self.rng.randrange(480)), (0, 0, 0))
+        content = io.BytesIO()
+        image.save(content, format='PNG')
+        self.images_uploaded.add(product_id)
+        return self.client.request('POST', f'/api/products/{product_id}/image', headers=self.auth,
+                                   upload=(f'bench-{product_id}.png', content.getvalue()))
+    
+    def cleanup_images(self):
+        for product_id in self.images_uploaded:
+            self.client.request('DELETE', f'/api/products/{product_id}/image', headers=self.auth)
+        self.images_uploaded.clear()
+
+
+SCENARIO_CALLS = {
+    'browse': (None, Worker.browse),
+    'active_offers': (None, Worker.active_offers),
+    'add_to_cart': (None, Worker.add_to_cart),
+    'checkout': (Worker.prepare_checkout, Worker.checkout),  # Only the checkout itself is timed
+    'login': (None, Worker.login_request),
+    'image_upload': (None, Worker.image_upload),
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def run_scenario(name, workers, requests_total, warmup):
+    prepare, call = SCENARIO_CALLS[name]
+    per_worker = [requests_total // len(workers) + (i < requests_total % len(workers)) for i in range(len(workers))]
+    
+    def drive(worker, count, record):
+        samples = []
+        for _ in range(count):
+            if prepare:
+                prepare(worker)
+            started = time.perf_counter()
+            status, headers, _ = call(worker)
+            elapsed = time.perf_counter() - started
+            match = SQL_COUNT_RE.search(headers.get('Server-Timing', ''))
+            samples.append((elapsed, status, int(match.group(1)) if match else None))
+        return samples if record else []
+    
+    with ThreadPoolExecutor(len(workers)) as pool:
+        list(pool.map(lambda w: drive(w, warmup, False), workers))
+        started = time.perf_counter()
+        results = list(pool.map(drive, workers, per_worker, [True] * len(workers)))
+        wall = time.perf_counter() - started
+    
+    samples = [sample for worker_samples in results for sample in worker_samples]
+    latencies = sorted(elapsed for elapsed, _, _ in samples)
+    errors = sum(1 for _, status, _ in samples if status >= 400)
+    sql_counts = [count for _, _, count in samples if count is not None]
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'rps': round(len(samples) / wall, 1) if wall else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'sql_per_request': round(sum(sql_counts) / len(sql_counts), 2) if sql_counts else None,
+    }
+
+
+# --- Reporting ---
+
+def print_report(results, baseline=None):
+    print(f"\n{'scenario':<14} {'reqs':>6} {'errors':>6} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'sql/req':>8}")
+    for name, r in results.items():
+        print(f"{name:<14} {r['requests']:>6} {r['errors']:>6} {r['rps']:>9} {r['p50_ms']:>9} "
+              f"{r['p95_ms']:>9} {r['p99_ms']:>9} {str(r['sql_per_request']):>8}")
+        base = (baseline or {}).get(name)
+        if base:
+            print(f"{'  vs baseline':<14} {'':>6} {'':>6} {delta(r['rps'], base['rps']):>9} "
+                  f"{delta(r['p50_ms'], base['p50_ms']):>9} {delta(r['p95_ms'], base['p95_ms']):>9} "
+                  f"{delta(r['p99_ms'], base['p99_ms']):>9} {delta(r['sql_per_request'], base['sql_per_request']):>8}")
+
+
+def delta(current, base):
+    if current is None or not base:
+        return '-'
+    return f"{(current - base) / base * 100:+.1f}%"
+
+
+def regressions(results, baseline, tolerance):
+    """Scenarios slower or less efficient than the baseline beyond tolerance"""
+    found = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base['p95_ms'] and r['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            found.append(f"{name}: p95 {base['p95_ms']}ms -> {r['p95_ms']}ms")
+        if base['rps'] and r['rps'] < base['rps'] * (1 - tolerance):
+            found.append(f"{name}: rps {base['rps']} -> {r['rps']}")
+        # Query counts are deterministic, so any increase is a regression
+        if base['sql_per_request'] is not None and r['sql_per_request'] is not None \
+                and r['sql_per_request'] > base['sql_per_request'] + 0.01:
+            found.append(f"{name}: sql/request {base['sql_per_request']} -> {r['sql_per_request']}")
+        if r['errors'] > base.get('errors', 0):
+            found.append(f"{name}: errors {base.get('errors', 0)} -> {r['errors']}")
+    return found
+
+
+# --- gunicorn ---
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(args, env):
+    if shutil.which('gunicorn') is None:
+        raise SystemExit("gunicorn is not installed (pip install gunicorn)")
+    port = free_port()
+    command = ['gunicorn', '-w', str(args.workers), '--threads', str(args.threads),
+               '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:create_app()']
+    process = subprocess.Popen(command, cwd=ROOT, env={**os.environ, **env})
+    url = f'http://127.0.0.1:{port}'
+    import requests
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(url + '/api/categories', timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("gunicorn did not come up within 30s")
+
+
+# --- Main ---
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mode', choices=('inprocess', 'http'), default='inprocess')
+    parser.add_argument('--url', help='Base URL of a running server (http mode)')
+    parser.add_argument('--gunicorn', action='store_true', help='Start gunicorn on the seeded database (http mode)')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--database-url', help='Database to seed and test (default: a fresh temp SQLite file)')
+    parser.add_argument('--seed-only', action='store_true')
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--offers', type=int, default=20)
+    parser.add_argument('--offer-ratio', type=float, default=0.01, help='Share of products attached to an offer')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--carts', type=int, default=100, help='Users that start with items in their cart')
+    parser.add_argument('--bcrypt-rounds', type=int, default=int(os.getenv('BCRYPT_LOG_ROUNDS', 12)))
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per client and scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--no-response-cache', action='store_true', help='Measure uncached catalog responses')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write results as JSON')
+    parser.add_argument('--baseline', help='Compare with a stored baseline (exit 1 on regression)')
+    parser.add_argument('--save-baseline', help='Store these results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed slowdown vs baseline (0.10 = 10%%)')
+    args = parser.parse_args()
+    
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.concurrency > args.users:
+        parser.error("--concurrency can't exceed --users (each client logs in as its own user)")
+    if not args.database_url:
+        args.database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench-'), 'bench.db')}"
+    
+    env = bench_environment(args)
+    os.environ.update(env)
+    from app import create_app
+    app = create_app()
+    seed(app, args)
+    if args.seed_only:
+        return
+    max_product, category_ids = catalog_bounds(app)
+    
+    server = None
+    if args.mode == 'http':
+        if args.gunicorn:
+            server, url = start_gunicorn(args, env)
+        elif args.url:
+            url = args.url
+        else:
+            parser.error("http mode needs --url or --gunicorn")
+        make_client = lambda: HttpClient(url)
+    else:
+        make_client = lambda: InProcessClient(app)
+    
+    try:
+        workers = [Worker(make_client(), i, max_product, category_ids, args.seed) for i in range(args.concurrency)]
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(Worker.login, workers))
+        
+        results = {}
+        for name in scenarios:
+            print(f"Running {name}...", flush=True)
+            results[name] = run_scenario(name, workers, args.requests, args.warmup)
+        
+        if 'image_upload' in scenarios:
+            if args.mode == 'inprocess':
+                # Let variant generation finish so its files are removed with the images
+                from services.image_processing import image_pipeline
+                if image_pipeline.executor is not None:
+                    image_pipeline.executor.shutdown(wait=True)
+            for worker in workers:
+                worker.cleanup_images()
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+    
+    report = {
+        'meta': {
+            'mode': args.mode, 'concurrency': args.concurrency, 'products': args.products,
+            'requests': args.requests, 'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0],
+            'workers': args.workers if args.gunicorn else None,
+            'recorded_at': datetime.utcnow().isoformat(timespec='seconds'),
+        },
+        'scenarios': results,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['scenarios']
+    print_report(results, baseline)
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+    if baseline is not None:
+        found = regressions(results, baseline, args.tolerance)
+        if found:
+            print("\nRegressions vs baseline:\n  " + "\n  ".join(found))
+            sys.exit(1)
+        print("\nNo regressions vs baseline")
+
+
+if __name__ == '__main__':
+    main()
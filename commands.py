@@ -0,0 +1,34 @@
+# commands.py
+import json
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from services import ProductImportService
+
+products_cli = AppGroup('products', help="Product catalog maintenance")
+
+
+@products_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default=None,
+              help="Input format (default: from the file extension)")
+@click.option('--chunk-size', type=int, default=None, help="Rows per transaction")
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False), default=None,
+              help="Write the per-row error report to this file as JSON")
+def import_products(path, fmt, chunk_size, errors_path):
+    """Upsert products by SKU from a CSV or NDJSON file."""
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    chunk_size = chunk_size or current_app.config['IMPORT_CHUNK_SIZE']
+    with open(path, 'rb') as stream:
+        rows = ProductImportService.iter_csv(stream) if fmt == 'csv' else ProductImportService.iter_ndjson(stream)
+        report = ProductImportService.import_rows(rows, chunk_size=chunk_size)
+    
+    click.echo(f"Processed {report['processed']} rows in {report['seconds']}s "
+               f"({report['rows_per_second']} rows/s): {report['inserted']} inserted, "
+               f"{report['updated']} updated, {len(report['errors'])} rejected")
+    if errors_path:
+        with open(errors_path, 'w', encoding='utf-8') as f:
+            json.dump(report['errors'], f, indent=2)
+    else:
+        for error in report['errors'][:20]:
+            click.echo(f"  row {error['row']} ({error['sku']}): {error['errors']}", err=True)
@@ -22,4 +22,22 @@ class OfferNotFoundException(NotFoundException):
 
 class ValidationException(BaseAppException):
     """Validation error"""
-    pass
\ No newline at end of file
+    pass
+
+class InvalidUploadException(BaseAppException):
+    """Upload rejected while it was being received"""
+    def __init__(self, message, status_code=400):
+        self.status_code = status_code
+        super().__init__(message)
+
+class ServiceBusyException(BaseAppException):
+    """Admission control rejected the request; the client should retry later"""
+    def __init__(self, message, retry_after=1):
+        self.retry_after = retry_after
+        super().__init__(message)
+
+class RateLimitExceededException(BaseAppException):
+    """Client exceeded its request rate or a concurrency cap (HTTP 429)"""
+    def __init__(self, message, retry_after=1):
+        self.retry_after = retry_after
+        super().__init__(message)
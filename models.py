@@ -1,7 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timezone
+from utils.db_engine import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -9,6 +10,7 @@ class User(db.Model):
     password = db.Column(db.String(200), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
     profile_image = db.Column(db.String(200), nullable=True)  # NEW: Stores filename
+    profile_image_variants = db.Column(db.JSON, nullable=True)  # Set once processing finishes
 
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -25,12 +27,21 @@ class Offer(db.Model):
 
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
+    sku = db.Column(db.String(64), unique=True, nullable=True)  # External key for bulk imports
     name = db.Column(db.String, nullable=False)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Float, nullable=False, index=True)
     stock = db.Column(db.Integer, default=10)
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
-    offer_id = db.Column(db.Integer, db.ForeignKey('offer.id'), nullable=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False, index=True)
+    offer_id = db.Column(db.Integer, db.ForeignKey('offer.id'), nullable=True, index=True)
     image = db.Column(db.String(200), nullable=True)  # NEW: Stores filename
+    image_variants = db.Column(db.JSON, nullable=True)  # Set once processing finishes
+
+class ImageBlob(db.Model):
+    """Content-addressed stored image, shared by every entity that uploaded the same bytes"""
+    folder = db.Column(db.String(50), primary_key=True)
+    filename = db.Column(db.String(200), primary_key=True)  # <sha256>.<ext>
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    variants = db.Column(db.JSON, nullable=True)
 
 class CartItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -1,9 +1,10 @@
 from flask import Blueprint, request, jsonify
 from flask.views import MethodView
 from marshmallow import ValidationError
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from services import AuthService
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from services import AuthService, TokenBlocklist, password_pool
 from schemas import user_schema
+from utils.decorators import admin_required
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -38,7 +39,41 @@ class RefreshAPI(MethodView):
             return jsonify({"msg": "Session invalid or user not found"}), 401
         return jsonify(access_token=new_access_token), 200
 
+class LogoutAPI(MethodView):
+    @jwt_required(verify_type=False)
+    def post(self):
+        """Revoke the token sent with the request (access or refresh)"""
+        TokenBlocklist.revoke_token(get_jwt())
+        return jsonify({"message": "Token revoked"}), 200
+
+class UserAdminAPI(MethodView):
+    @admin_required
+    def put(self, user_id):
+        """Grant or revoke admin rights; the user's existing tokens are revoked"""
+        data = request.get_json() or {}
+        if not isinstance(data.get('is_admin'), bool):
+            return jsonify({"error": "is_admin must be true or false"}), 400
+        user = AuthService.set_admin(user_id, data['is_admin'])
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        return jsonify(user_schema.dump(user)), 200
+
+class UserTokensAPI(MethodView):
+    @admin_required
+    def delete(self, user_id):
+        """Revoke every token issued to a user so far"""
+        TokenBlocklist.revoke_user(user_id)
+        return jsonify({"message": "Tokens revoked"}), 200
+
+class PasswordPoolStatsAPI(MethodView):
+    @admin_required
+    def get(self):
+        return jsonify(password_pool.stats()), 200
+
 auth_bp.add_url_rule('/register', view_func=RegisterAPI.as_view('register_api'))
 auth_bp.add_url_rule('/login', view_func=LoginAPI.as_view('login_api'))
 auth_bp.add_url_rule('/refresh', view_func=RefreshAPI.as_view('refresh_api'))
-
+auth_bp.add_url_rule('/logout', view_func=LogoutAPI.as_view('logout_api'))
+auth_bp.add_url_rule('/users/<int:user_id>/admin', view_func=UserAdminAPI.as_view('user_admin_api'))
+auth_bp.add_url_rule('/users/<int:user_id>/tokens', view_func=UserTokensAPI.as_view('user_tokens_api'))
+auth_bp.add_url_rule('/auth/pool-stats', view_func=PasswordPoolStatsAPI.as_view('password_pool_stats_api'))
@@ -4,6 +4,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from services import CartService
 from schemas import cart_items_schema
 from marshmallow import ValidationError
+from utils.rate_limit import concurrency_limit
 
 cart_bp = Blueprint('cart', __name__)
 
@@ -28,10 +29,29 @@ class CartAPI(MethodView):
             return jsonify(err.messages), 400
         except ValueError as e:
             return jsonify({"error": str(e)}), 400
+    
+    def patch(self):
+        """Update, remove (quantity 0) or merge (mode 'merge') several lines at once"""
+        return self._update(replace=False)
+    
+    def put(self):
+        """Replace the whole cart with the listed lines"""
+        return self._update(replace=True)
+    
+    def _update(self, replace):
+        user_id = get_jwt_identity()
+        try:
+            CartService.update_cart(user_id, request.get_json(), replace=replace)
+        except ValidationError as err:
+            return jsonify(err.messages), 400
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return self.get()
 
 class CheckoutAPI(MethodView):
     decorators = [jwt_required()]
     
+    @concurrency_limit('checkouts')
     def post(self):
         user_id = get_jwt_identity()
         try:
@@ -0,0 +1,44 @@
+import os
+from flask import Blueprint, jsonify, current_app, send_from_directory, abort
+from flask.views import MethodView
+from utils.decorators import admin_required
+from utils.slow_query_log import slow_query_log
+
+debug_bp = Blueprint('debug', __name__)
+
+class SlowQueryAPI(MethodView):
+    @admin_required
+    def get(self):
+        """Most recent slow queries, newest first"""
+        return jsonify({
+            "threshold_ms": current_app.config['SLOW_QUERY_MS'],
+            "queries": slow_query_log.recent()
+        }), 200
+    
+    @admin_required
+    def delete(self):
+        slow_query_log.clear()
+        return jsonify({"message": "Slow query log cleared"}), 200
+
+class ProfileListAPI(MethodView):
+    @admin_required
+    def get(self):
+        """Profiles stored in PROFILE_DIR, newest first"""
+        directory = current_app.config['PROFILE_DIR']
+        if not directory or not os.path.isdir(directory):
+            return jsonify({"profiles": []}), 200
+        names = sorted(os.listdir(directory), reverse=True)
+        return jsonify({"profiles": names}), 200
+
+class ProfileFileAPI(MethodView):
+    @admin_required
+    def get(self, name):
+        """Download a stored profile (.prof for pstats/snakeviz, .collapsed for flamegraphs)"""
+        directory = current_app.config['PROFILE_DIR']
+        if not directory:
+            abort(404)
+        return send_from_directory(os.path.abspath(directory), name, as_attachment=True)
+
+debug_bp.add_url_rule('/debug/slow-queries', view_func=SlowQueryAPI.as_view('slow_query_api'))
+debug_bp.add_url_rule('/debug/profiles', view_func=ProfileListAPI.as_view('profile_list_api'))
+debug_bp.add_url_rule('/debug/profiles/<name>', view_func=ProfileFileAPI.as_view('profile_file_api'))
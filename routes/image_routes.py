@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify
 from flask.views import MethodView
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_current_user
 from services.image_service import ImageService
 from models import User, Product
 from schemas import user_schema, product_schema
+from utils.http_cache import catalog_cached
+from utils.rate_limit import concurrency_limit
 
 image_bp = Blueprint('images', __name__)
 
@@ -12,11 +14,10 @@ class UserImageUploadAPI(MethodView):
     decorators = [jwt_required()]
     
     def get(self):
-        """Get current user's profile"""
-        user_id = get_jwt_identity()
-        user = User.query.get_or_404(user_id)
-        return jsonify(user_schema.dump(user)), 200
+        """Get current user's profile (served from UserClaimsCache)"""
+        return jsonify(user_schema.dump(get_current_user())), 200
     
+    @concurrency_limit('uploads')
     def post(self):
         """Upload user profile image"""
         if 'image' not in request.files:
@@ -52,12 +53,14 @@ class UserImageUploadAPI(MethodView):
 
 class ProductImageUploadAPI(MethodView):
     
+    @catalog_cached
     def get(self, product_id):
         """Get product details (Public)"""
         product = Product.query.get_or_404(product_id)
         return jsonify(product_schema.dump(product)), 200
     
     @jwt_required()
+    @concurrency_limit('uploads')
     def post(self, product_id):
         """Upload product image (Authenticated)"""
         if 'image' not in request.files:
@@ -1,16 +1,49 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask.views import MethodView
 from flask_jwt_extended import jwt_required
-from services import ProductService, OfferService
+from services import ProductService, OfferService, PricingService, ProductImportService, SearchService
 from schemas import product_schema, products_schema, offer_schema, categories_schema
 from utils.decorators import admin_required  # Import decorator
+from exceptions import OfferNotFoundException, ValidationException
+from utils.http_cache import catalog_cached
+from utils.response_cache import response_cache
+from utils.db_engine import route_reads_to_replica
 
 prod_bp = Blueprint('products', __name__)
+prod_bp.before_request(route_reads_to_replica)
+
+def _parse_bool(value, name='in_stock'):
+    if value is None:
+        return None
+    value = value.lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f"{name} must be true or false")
 
 class ProductAPI(MethodView):
+    @catalog_cached
     def get(self):
-        prods = ProductService.get_all_products()
-        return jsonify(products_schema.dump(prods)), 200
+        default_size = current_app.config['PRODUCTS_PAGE_SIZE']
+        max_size = current_app.config['PRODUCTS_MAX_PAGE_SIZE']
+        limit = request.args.get('limit', default_size, type=int)
+        limit = max(1, min(limit, max_size))
+        try:
+            prods, next_cursor = ProductService.get_products_page(
+                cursor=request.args.get('cursor'),
+                limit=limit,
+                category_id=request.args.get('category_id', type=int),
+                min_price=request.args.get('min_price', type=float),
+                max_price=request.args.get('max_price', type=float),
+                in_stock=_parse_bool(request.args.get('in_stock'))
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({
+            "items": products_schema.dump(prods),
+            "next": next_cursor
+        }), 200
     
     @admin_required
     def post(self):
@@ -18,6 +51,88 @@ class ProductAPI(MethodView):
         product = ProductService.create_product(data)
         return jsonify(product_schema.dump(product)), 201
 
+class ProductSearchAPI(MethodView):
+    """Full-text search: ?q=<words>, the ProductAPI filters plus offer_id/on_offer, facets=false to skip counts"""
+    
+    @catalog_cached
+    def get(self):
+        default_size = current_app.config['PRODUCTS_PAGE_SIZE']
+        max_size = current_app.config['PRODUCTS_MAX_PAGE_SIZE']
+        limit = request.args.get('limit', default_size, type=int)
+        limit = max(1, min(limit, max_size))
+        try:
+            facets = _parse_bool(request.args.get('facets'), 'facets')
+            result = SearchService.search(
+                request.args.get('q', ''),
+                cursor=request.args.get('cursor'),
+                limit=limit,
+                facets=facets is not False,
+                category_id=request.args.get('category_id', type=int),
+                min_price=request.args.get('min_price', type=float),
+                max_price=request.args.get('max_price', type=float),
+                in_stock=_parse_bool(request.args.get('in_stock')),
+                offer_id=request.args.get('offer_id', type=int),
+                on_offer=_parse_bool(request.args.get('on_offer'), 'on_offer')
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        result["items"] = products_schema.dump(result["items"])
+        return jsonify(result), 200
+
+class ProductExportAPI(MethodView):
+    """
+    Full catalog export, streamed batch by batch as NDJSON or a JSON array.
+    ?format=ndjson|json wins over the Accept header; NDJSON by default.
+    """
+    FORMATS = {'application/x-ndjson': 'ndjson', 'application/json': 'json'}
+    
+    def get(self):
+        fmt = request.args.get('format')
+        if fmt is None:
+            best = request.accept_mimetypes.best_match(list(self.FORMATS), default='application/x-ndjson')
+            fmt = self.FORMATS[best]
+        if fmt not in ('ndjson', 'json'):
+            return jsonify({"error": "format must be ndjson or json"}), 400
+        batch_size = current_app.config['EXPORT_BATCH_SIZE']
+        dumps = current_app.json.dumps
+        
+        def generate():
+            first = True
+            if fmt == 'json':
+                yield '['
+            for batch in ProductService.iter_product_batches(batch_size):
+                lines = [dumps(item) for item in products_schema.dump(batch)]
+                PricingService.clear()
+                if fmt == 'ndjson':
+                    yield '\n'.join(lines) + '\n'
+                else:
+                    yield ('' if first else ',') + ','.join(lines)
+                first = False
+            if fmt == 'json':
+                yield ']\n'
+        
+        mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+        response = Response(stream_with_context(generate()), mimetype=mimetype)
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+class ProductImportAPI(MethodView):
+    """Bulk upsert by SKU from a raw text/csv or application/x-ndjson body"""
+    max_content_length_config = 'MAX_IMPORT_CONTENT_LENGTH'
+    
+    @admin_required
+    def post(self):
+        mimetype = request.mimetype
+        if mimetype in ('text/csv', 'application/csv'):
+            rows = ProductImportService.iter_csv(request.stream)
+        elif mimetype in ('application/x-ndjson', 'application/ndjson'):
+            rows = ProductImportService.iter_ndjson(request.stream)
+        else:
+            return jsonify({"error": "Send text/csv or application/x-ndjson"}), 415
+        chunk_size = request.args.get('chunk_size', current_app.config['IMPORT_CHUNK_SIZE'], type=int)
+        report = ProductImportService.import_rows(rows, chunk_size=max(1, chunk_size))
+        return jsonify(report), 200
+
 class OfferAPI(MethodView):
     @admin_required 
     def post(self):
@@ -26,16 +141,19 @@ class OfferAPI(MethodView):
         return jsonify(offer_schema.dump(offer)), 201
 
 class ActiveOffersAPI(MethodView):
+    @catalog_cached
     def get(self):
         products = OfferService.get_active_offers_products()
         return jsonify(products_schema.dump(products)), 200
 
 class CategoryListAPI(MethodView):
+    @catalog_cached
     def get(self):
         categories = ProductService.get_all_categories()
         return jsonify(categories_schema.dump(categories)), 200
 
 class ProductCategoryAPI(MethodView):
+    @catalog_cached
     def get(self, category_id):
         products = ProductService.get_products_by_category(category_id)
         return jsonify(products_schema.dump(products)), 200
@@ -49,9 +167,42 @@ class ApplyOfferAPI(MethodView):
         except Exception as e:
             return jsonify({"error": str(e)}), 404
 
+class CacheStatsAPI(MethodView):
+    @admin_required
+    def get(self):
+        return jsonify(response_cache.stats()), 200
+
+class BulkOfferAPI(MethodView):
+    """Apply/remove an offer across many products (product_ids, category_id or filter)"""
+    
+    @admin_required
+    def post(self, offer_id):
+        try:
+            count = OfferService.apply_offer_bulk(offer_id, request.get_json(silent=True))
+            return jsonify({"message": f"Offer {offer_id} applied", "updated": count}), 200
+        except OfferNotFoundException as e:
+            return jsonify({"error": str(e)}), 404
+        except ValidationException as e:
+            return jsonify({"error": str(e)}), 400
+    
+    @admin_required
+    def delete(self, offer_id):
+        try:
+            count = OfferService.remove_offer_bulk(offer_id, request.get_json(silent=True))
+            return jsonify({"message": f"Offer {offer_id} removed", "updated": count}), 200
+        except OfferNotFoundException as e:
+            return jsonify({"error": str(e)}), 404
+        except ValidationException as e:
+            return jsonify({"error": str(e)}), 400
+
 prod_bp.add_url_rule('/products', view_func=ProductAPI.as_view('product_api'))
+prod_bp.add_url_rule('/products/search', view_func=ProductSearchAPI.as_view('product_search_api'))
+prod_bp.add_url_rule('/products/export', view_func=ProductExportAPI.as_view('product_export_api'))
+prod_bp.add_url_rule('/products/import', view_func=ProductImportAPI.as_view('product_import_api'))
 prod_bp.add_url_rule('/offers', view_func=OfferAPI.as_view('offer_admin_api'))
 prod_bp.add_url_rule('/offers/active', view_func=ActiveOffersAPI.as_view('offer_active_api'))
 prod_bp.add_url_rule('/categories', view_func=CategoryListAPI.as_view('category_list_api'))
 prod_bp.add_url_rule('/categories/<int:category_id>/products', view_func=ProductCategoryAPI.as_view('prod_cat_api'))
+prod_bp.add_url_rule('/offers/<int:offer_id>/products', view_func=BulkOfferAPI.as_view('bulk_offer_api'))
 prod_bp.add_url_rule('/offers/<int:offer_id>/apply/<int:product_id>', view_func=ApplyOfferAPI.as_view('apply_offer_api'))
+prod_bp.add_url_rule('/cache/stats', view_func=CacheStatsAPI.as_view('cache_stats_api'))
@@ -1,11 +1,20 @@
 from flask_marshmallow import Marshmallow
-from marshmallow import fields, validate, post_dump, validates_schema, ValidationError
+from marshmallow import fields, validate, pre_dump, post_dump, validates_schema, ValidationError
 from models import User, Product, Category, CartItem, Offer, db
-from datetime import datetime, timezone
+from services.pricing_service import PricingService
+from services.file_service import FileService
+from utils.metrics import timed
 
 ma = Marshmallow()
 
-class UserSchema(ma.SQLAlchemyAutoSchema):
+class BaseSchema(ma.SQLAlchemyAutoSchema):
+    """Auto schema whose dumps count as the request's 'serialize' time (see utils.metrics)"""
+    
+    def dump(self, obj, *, many=None):
+        with timed('serialize'):
+            return super().dump(obj, many=many)
+
+class UserSchema(BaseSchema):
     class Meta:
         model = User
         load_instance = True
@@ -15,13 +24,22 @@ class UserSchema(ma.SQLAlchemyAutoSchema):
     username = fields.String(required=True, validate=validate.Length(min=3))
     password = fields.String(required=True, validate=validate.Length(min=6))
     profile_image_url = fields.Method("get_profile_image_url", dump_only=True)
+    profile_image_variants = fields.Method("get_profile_image_variants", dump_only=True)
     
     def get_profile_image_url(self, obj):
         if obj.profile_image:
-            return f"/static/users/{obj.profile_image}"
+            # Prefer the metadata-stripped copy once processing has made it
+            variants = obj.profile_image_variants or {}
+            return FileService.get_image_url(variants.get('original', obj.profile_image), 'users')
+        return None
+    
+    def get_profile_image_variants(self, obj):
+        # None until background processing has produced the variants
+        if obj.profile_image_variants:
+            return {k: FileService.get_image_url(v, 'users') for k, v in obj.profile_image_variants.items()}
         return None
 
-class CategorySchema(ma.SQLAlchemyAutoSchema):
+class CategorySchema(BaseSchema):
     class Meta:
         model = Category
         load_instance = True
@@ -30,9 +48,13 @@ class CategorySchema(ma.SQLAlchemyAutoSchema):
     product_count = fields.Method("get_product_count", dump_only=True)
     
     def get_product_count(self, obj):
+        # Precomputed by ProductService.get_all_categories when available
+        product_count = getattr(obj, 'product_count', None)
+        if product_count is not None:
+            return product_count
         return len(obj.products)
 
-class OfferSchema(ma.SQLAlchemyAutoSchema):
+class OfferSchema(BaseSchema):
     class Meta:
         model = Offer
         load_instance = True
@@ -41,7 +63,7 @@ class OfferSchema(ma.SQLAlchemyAutoSchema):
     discount_percent = fields.Float(required=True, validate=validate.Range(min=0, max=50))
     start_time = fields.DateTime(format='iso')
     end_time = fields.DateTime(format='iso')
-   
+    
     @validates_schema
     def validate_dates(self, data, **kwargs):
         """
@@ -52,8 +74,8 @@ class OfferSchema(ma.SQLAlchemyAutoSchema):
         
         if start and end and start >= end:
             raise ValidationError("end_time must be after start_time")
-        
-class ProductSchema(ma.SQLAlchemyAutoSchema):
+
+class ProductSchema(BaseSchema):
     class Meta:
         model = Product
         load_instance = True
@@ -68,6 +90,7 @@ class ProductSchema(ma.SQLAlchemyAutoSchema):
     
     # NEW: Image URL field
     image_url = fields.Method("get_image_url", dump_only=True)
+    image_variants = fields.Method("get_image_variants", dump_only=True)
     
     # Calculated fields
     current_price = fields.Method("get_current_price", dump_only=True)
@@ -76,27 +99,31 @@ class ProductSchema(ma.SQLAlchemyAutoSchema):
     
     def get_image_url(self, obj):
         if obj.image:
-            return f"/static/products/{obj.image}"
+            # Prefer the metadata-stripped copy once processing has made it
+            variants = obj.image_variants or {}
+            return FileService.get_image_url(variants.get('original', obj.image), 'products')
+        return None
+    
+    def get_image_variants(self, obj):
+        # None until background processing has produced the variants
+        if obj.image_variants:
+            return {k: FileService.get_image_url(v, 'products') for k, v in obj.image_variants.items()}
         return None
     
     def check_offer_active(self, obj):
-        if obj.offer:
-            now = datetime.now(timezone.utc)
-            start = obj.offer.start_time.replace(tzinfo=timezone.utc)
-            end = obj.offer.end_time.replace(tzinfo=timezone.utc)
-            return start <= now <= end
-        return False
+        return PricingService.quote(obj).is_on_offer
     
     def get_current_price(self, obj):
-        if self.check_offer_active(obj):
-            discount = obj.offer.discount_percent / 100
-            return round(obj.price * (1 - discount), 2)
-        return obj.price
+        return PricingService.quote(obj).current_price
     
     def get_discount_amount(self, obj):
-        if self.check_offer_active(obj):
-            return round(obj.price - self.get_current_price(obj), 2)
-        return 0.0
+        return PricingService.quote(obj).discount_amount
+    
+    @pre_dump(pass_many=True)
+    def warm_price_quotes(self, data, many, **kwargs):
+        # Price the whole batch up front against one reference time
+        PricingService.quote_many(data if many else [data])
+        return data
     
     @post_dump
     def remove_expired_offer(self, data, many, **kwargs):
@@ -104,7 +131,7 @@ class ProductSchema(ma.SQLAlchemyAutoSchema):
             data['offer'] = None
         return data
 
-class CartItemSchema(ma.SQLAlchemyAutoSchema):
+class CartItemSchema(BaseSchema):
     class Meta:
         model = CartItem
         load_instance = True
@@ -116,9 +143,29 @@ class CartItemSchema(ma.SQLAlchemyAutoSchema):
     line_total = fields.Method("get_line_total", dump_only=True)
     
     def get_line_total(self, obj):
-        unit_price = ProductSchema().get_current_price(obj.product)
+        unit_price = PricingService.quote(obj.product).current_price
         return round(unit_price * obj.quantity, 2)
 
+class CartLineSchema(ma.Schema):
+    product_id = fields.Int(required=True)
+    quantity = fields.Int(required=True, validate=validate.Range(min=0))
+
+class CartUpdateSchema(ma.Schema):
+    """
+    Batch cart change: 'set' makes each quantity absolute (0 removes the
+    line), 'merge' adds to what is already in the cart (e.g. a guest cart)
+    """
+    items = fields.List(fields.Nested(CartLineSchema), required=True)
+    mode = fields.Str(load_default='set', validate=validate.OneOf(('set', 'merge')))
+    
+    @validates_schema
+    def validate_unique_products(self, data, **kwargs):
+        if data.get('mode', 'set') != 'set':
+            return
+        product_ids = [line['product_id'] for line in data.get('items', [])]
+        if len(product_ids) != len(set(product_ids)):
+            raise ValidationError("Each product can only appear once", "items")
+
 # Schema instances
 user_schema = UserSchema()
 users_schema = UserSchema(many=True)
@@ -129,4 +176,5 @@ offers_schema = OfferSchema(many=True)
 product_schema = ProductSchema()
 products_schema = ProductSchema(many=True)
 cart_item_schema = CartItemSchema()
-cart_items_schema = CartItemSchema(many=True)
\ No newline at end of file
+cart_items_schema = CartItemSchema(many=True)
+cart_update_schema = CartUpdateSchema()
@@ -1,6 +1,11 @@
-from .auth_service import AuthService, bcrypt
+from .auth_service import AuthService, bcrypt, password_pool
+from .token_service import UserClaimsCache, TokenBlocklist
 from .product_service import ProductService
+from .product_import_service import ProductImportService
+from .search_service import SearchService
+from .pricing_service import PricingService
 from .cart_service import CartService
+from .cart_store import cart_store
 from .offer_service import OfferService
 from .file_service import FileService
 from .image_service import ImageService
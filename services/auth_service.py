@@ -1,17 +1,93 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
 from models import db, User
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import create_access_token, create_refresh_token
+from exceptions import ServiceBusyException
+from services.token_service import UserClaimsCache, TokenBlocklist
 
 bcrypt = Bcrypt()
 
+class PasswordPool:
+    """
+    Bounded worker pool for bcrypt hashing/verification.
+    
+    BCRYPT_WORKERS threads do the hashing (bcrypt releases the GIL), and at
+    most BCRYPT_MAX_PENDING calls may be running or queued. Beyond that new
+    calls are rejected with ServiceBusyException instead of piling up, so a
+    login burst cannot pin every web worker.
+    """
+    
+    def __init__(self, app=None):
+        self.executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self.workers = 0
+        self.max_pending = 0
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.config.setdefault('BCRYPT_WORKERS', 4)
+        app.config.setdefault('BCRYPT_MAX_PENDING', app.config['BCRYPT_WORKERS'] * 8)
+        self.workers = app.config['BCRYPT_WORKERS']
+        self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix='bcrypt')
+        self.max_pending = app.config['BCRYPT_MAX_PENDING']
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+    
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool and wait for the result"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ServiceBusyException("Too many concurrent logins, retry shortly")
+        with self._lock:
+            self.pending += 1
+        try:
+            return self.executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+            self._slots.release()
+    
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": min(self.pending, self.workers),
+            "queued": max(0, self.pending - self.workers),
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+password_pool = PasswordPool()
+
 class AuthService:
+    @staticmethod
+    def hash_password(password):
+        rounds = current_app.config['BCRYPT_LOG_ROUNDS']
+        return password_pool.run(bcrypt.generate_password_hash, password, rounds).decode('utf-8')
+    
+    @staticmethod
+    def password_cost(password_hash):
+        """Cost factor encoded in a bcrypt hash ($2b$<cost>$...), or None"""
+        try:
+            return int(password_hash.split('$')[2])
+        except (IndexError, ValueError):
+            return None
+    
     @staticmethod
     def register_user(data):
         from schemas import user_schema
         user = user_schema.load(data)   #deserializes the input
         if User.query.filter_by(username=user.username).first():
             raise ValueError("Username already exists")
-        user.password = bcrypt.generate_password_hash(user.password).decode('utf-8')
+        user.password = AuthService.hash_password(user.password)
         db.session.add(user)
         db.session.commit()
         return user
@@ -21,11 +97,16 @@ class AuthService:
         username = data.get('username')
         password = data.get('password')
         user = User.query.filter_by(username=username).first()
-        if user and bcrypt.check_password_hash(user.password, password):
-            claims = {"is_admin": user.is_admin}
+        if user and password_pool.run(bcrypt.check_password_hash, user.password, password):
+            # Transparently move the stored hash to the configured cost
+            if AuthService.password_cost(user.password) != current_app.config['BCRYPT_LOG_ROUNDS']:
+                user.password = AuthService.hash_password(password)
+                db.session.commit()
+            generation = TokenBlocklist.claims(user.id)
+            claims = {"is_admin": user.is_admin, **generation}
             return {
                 "access_token": create_access_token(identity=str(user.id), additional_claims=claims),
-                "refresh_token": create_refresh_token(identity=str(user.id)),
+                "refresh_token": create_refresh_token(identity=str(user.id), additional_claims=generation),
                 "user":{
                     "id": user.id,
                     "is_admin":user.is_admin
@@ -36,8 +117,23 @@ class AuthService:
     
     @staticmethod
     def refresh_access_token(user_id):
+        user = UserClaimsCache.get(user_id)
+        if not user:
+            return None
+        claims = {"is_admin": user['is_admin'], **TokenBlocklist.claims(user['id'])}
+        return create_access_token(identity=str(user['id']), additional_claims=claims)
+    
+    @staticmethod
+    def set_admin(user_id, is_admin):
+        """
+        Grant or revoke admin rights. Existing tokens carry the old claim,
+        so they are revoked and the user has to log in again.
+        """
         user = User.query.get(user_id)
         if not user:
             return None
-        claims = {"is_admin": user.is_admin}
-        return create_access_token(identity=str(user.id), additional_claims=claims)
+        user.is_admin = is_admin
+        db.session.commit()
+        UserClaimsCache.invalidate(user.id)
+        TokenBlocklist.revoke_user(user.id)
+        return user
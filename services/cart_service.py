@@ -1,10 +1,26 @@
+from flask import current_app
+from sqlalchemy import bindparam, delete, insert, update
+from sqlalchemy.orm import joinedload
 from models import db, CartItem, Product, Order, OrderItem
+from services.cart_store import cart_store
+from services.pricing_service import PricingService
+from utils.http_cache import mark_stock_changed
 
 class CartService:
+    # Dialects where SELECT ... FOR UPDATE actually takes row locks
+    ROW_LOCK_DIALECTS = {'postgresql', 'mysql', 'mariadb', 'oracle'}
+    
     @staticmethod
     def add_to_cart(user_id, data):
         from schemas import cart_item_schema
         item_data = cart_item_schema.load(data)
+        if cart_store.enabled:
+            # Only the stock is read; the line itself never touches the database
+            stock = db.first_or_404(db.select(Product.stock).filter_by(id=item_data.product_id))
+            if stock < item_data.quantity:
+                raise ValueError(f"Only {stock} items available")
+            cart_store.add(user_id, item_data.product_id, item_data.quantity)
+            return True
         product = Product.query.get_or_404(item_data.product_id)
         if product.stock < item_data.quantity:
             raise ValueError(f"Only {product.stock} items available")
@@ -19,36 +35,218 @@ class CartService:
     
     @staticmethod
     def get_user_cart(user_id):
-        items = CartItem.query.filter_by(user_id=user_id).all()
-        from schemas import product_schema
-        total = sum(product_schema.get_current_price(i.product) * i.quantity for i in items)
+        if cart_store.enabled:
+            lines = cart_store.lines(user_id)
+            products = Product.query.options(
+                joinedload(Product.category), joinedload(Product.offer)
+            ).filter(Product.id.in_(lines)).order_by(Product.id).all() if lines else []
+            # Transient rows for the schema; lines of deleted products are skipped
+            items = [CartItem(user_id=int(user_id), product_id=p.id, quantity=lines[p.id], product=p)
+                     for p in products]
+        else:
+            items = CartItem.query.options(
+                joinedload(CartItem.product).joinedload(Product.category),
+                joinedload(CartItem.product).joinedload(Product.offer)
+            ).filter_by(user_id=user_id).all()
+        quotes = PricingService.quote_many([i.product for i in items])
+        total = sum(q.current_price * i.quantity for q, i in zip(quotes, items))
         return items, round(total, 2)
     
+    @staticmethod
+    def _apply_changes(current, items, mode, replace, stock):
+        """
+        New cart lines after a batch of changes
+        Args:
+            current: dict of product_id -> quantity
+            items: [{"product_id", "quantity"}, ...]
+            mode: 'set' (absolute quantities) or 'merge' (added quantities)
+            replace: Start from an empty cart instead of `current`
+            stock: dict of product_id -> (name, stock) for every listed product that exists
+        Returns:
+            dict: product_id -> quantity, without removed lines
+        Raises:
+            ValueError: If a listed product doesn't exist or lacks stock
+        """
+        lines = {} if replace else dict(current)
+        for item in items:
+            product_id, quantity = item['product_id'], item['quantity']
+            lines[product_id] = lines.get(product_id, 0) + quantity if mode == 'merge' else quantity
+        lines = {pid: qty for pid, qty in lines.items() if qty > 0}
+        for product_id in sorted({item['product_id'] for item in items} & lines.keys()):
+            if product_id not in stock:
+                raise ValueError(f"Product {product_id} not found")
+            name, available = stock[product_id]
+            if available < lines[product_id]:
+                raise ValueError(f"Only {available} of {name} available")
+        return lines
+    
+    @staticmethod
+    def update_cart(user_id, data, replace=False):
+        """
+        Apply a batch of line changes in one transaction (or one atomic
+        cart store update). Stock for every listed product is read with a
+        single IN query.
+        Args:
+            data: {"items": [{"product_id", "quantity"}, ...], "mode": "set"|"merge"}
+            replace: Drop the lines that aren't listed (PUT)
+        Raises:
+            ValidationError: Malformed batch
+            ValueError: Unknown product, not enough stock or too many items
+        """
+        from schemas import cart_update_schema
+        changes = cart_update_schema.load(data)
+        items, mode = changes['items'], changes['mode']
+        if len(items) > current_app.config['CART_MAX_BATCH_ITEMS']:
+            raise ValueError(f"At most {current_app.config['CART_MAX_BATCH_ITEMS']} items per request")
+        product_ids = {item['product_id'] for item in items}
+        stock = {
+            pid: (name, available) for pid, name, available in
+            db.session.query(Product.id, Product.name, Product.stock).filter(Product.id.in_(product_ids))
+        } if product_ids else {}
+        
+        if cart_store.enabled:
+            cart_store.apply(user_id, lambda current: (
+                CartService._apply_changes(current, items, mode, replace, stock), None
+            ))
+            return
+        try:
+            query = CartItem.query.filter_by(user_id=user_id)
+            if CartService._supports_row_locks():
+                query = query.with_for_update()
+            rows = query.order_by(CartItem.id).all()
+            current = {}
+            for row in rows:
+                current[row.product_id] = current.get(row.product_id, 0) + row.quantity
+            lines = CartService._apply_changes(current, items, mode, replace, stock)
+            
+            kept = set()
+            for row in rows:
+                # Removed lines, and duplicate rows of one product, are dropped
+                if row.product_id in kept or row.product_id not in lines:
+                    db.session.delete(row)
+                else:
+                    row.quantity = lines[row.product_id]
+                    kept.add(row.product_id)
+            db.session.add_all([
+                CartItem(user_id=user_id, product_id=pid, quantity=qty)
+                for pid, qty in lines.items() if pid not in kept
+            ])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+    
+    @staticmethod
+    def _supports_row_locks():
+        return db.session.get_bind().dialect.name in CartService.ROW_LOCK_DIALECTS
+    
+    @staticmethod
+    def _reserve_stock(lines):
+        """
+        Decrement stock for every line with a conditional UPDATE that only
+        matches while enough stock is left, so concurrent checkouts cannot
+        oversell. Runs as a single executemany where the driver reports
+        per-batch rowcounts.
+        Args:
+            lines: dict of product_id -> quantity
+        Returns:
+            bool: True if every line was reserved
+        """
+        table = Product.__table__
+        stmt = update(table).where(
+            table.c.id == bindparam('pid'),
+            table.c.stock >= bindparam('qty')
+        ).values(stock=table.c.stock - bindparam('qty'))
+        params = [{'pid': pid, 'qty': qty} for pid, qty in lines.items()]
+        if db.session.get_bind().dialect.supports_sane_multi_rowcount:
+            return db.session.execute(stmt, params).rowcount == len(params)
+        return all(db.session.execute(stmt, p).rowcount == 1 for p in params)
+    
+    @staticmethod
+    def _shortage_message(lines):
+        products = Product.query.filter(Product.id.in_(lines)).order_by(Product.id).all()
+        for product in products:
+            if product.stock < lines[product.id]:
+                return f"Stock for {product.name} ran out"
+        return "Stock ran out"
+    
+    @staticmethod
+    def _consume_cart(user_id):
+        """
+        Delete the user's cart rows in the current transaction and return
+        what was deleted, so two concurrent checkouts of one cart can't both
+        use it: the loser deletes nothing (DELETE ... RETURNING) or sees a
+        rowcount that doesn't match the locked rows it read.
+        Returns:
+            dict: product_id -> quantity
+        Raises:
+            ValueError: If the cart changed while it was being checked out
+        """
+        table = CartItem.__table__
+        stmt = delete(table).where(table.c.user_id == user_id)
+        if db.session.get_bind().dialect.delete_returning:
+            rows = db.session.execute(stmt.returning(table.c.product_id, table.c.quantity)).all()
+        else:
+            rows = db.session.query(CartItem.product_id, CartItem.quantity).filter_by(
+                user_id=user_id
+            ).with_for_update().all()
+            if db.session.execute(stmt).rowcount != len(rows):
+                raise ValueError("Cart changed during checkout, please retry")
+        lines = {}
+        for product_id, quantity in rows:
+            lines[product_id] = lines.get(product_id, 0) + quantity
+        return lines
+    
     @staticmethod
     def checkout(user_id):
-        from schemas import product_schema
-        cart_items, total = CartService.get_user_cart(user_id)
-        if not cart_items:
-            raise ValueError("Cart is empty")
+        user_id = int(user_id)  # JWT identities are strings
+        lines = {}
         try:
+            if cart_store.enabled:
+                lines = cart_store.take(user_id)
+                CartItem.query.filter_by(user_id=user_id).delete()
+            else:
+                lines = CartService._consume_cart(user_id)
+            if not lines:
+                raise ValueError("Cart is empty")
+            locked_query = Product.query.options(joinedload(Product.offer)).filter(
+                Product.id.in_(lines)
+            ).order_by(Product.id).populate_existing()
+            if CartService._supports_row_locks():
+                # Lock the rows up front (in id order, to avoid deadlocks)
+                products = locked_query.with_for_update(of=Product).all()
+                for product in products:
+                    if product.stock < lines[product.id]:
+                        raise ValueError(f"Stock for {product.name} ran out")
+            if not CartService._reserve_stock(lines):
+                db.session.rollback()
+                raise ValueError(CartService._shortage_message(lines))
+            if not CartService._supports_row_locks():
+                # The UPDATE above holds the write lock, so prices read now are stable
+                products = locked_query.all()
+            
+            quotes = dict(zip((p.id for p in products), PricingService.quote_many(products)))
+            total = round(sum(quotes[pid].current_price * qty for pid, qty in lines.items()), 2)
             new_order = Order(user_id=user_id, total_price=total)
             db.session.add(new_order)
             db.session.flush()
-            for cart_item in cart_items:
-                if cart_item.product.stock < cart_item.quantity:
-                    raise ValueError(f"Stock for {cart_item.product.name} ran out")
-                final_price = product_schema.get_current_price(cart_item.product)
-                order_item = OrderItem(
-                    order_id=new_order.id,
-                    product_id=cart_item.product_id,
-                    quantity=cart_item.quantity,
-                    price_at_purchase=final_price
-                )
-                db.session.add(order_item)
-                cart_item.product.stock -= cart_item.quantity
-            CartItem.query.filter_by(user_id=user_id).delete()
+            db.session.execute(insert(OrderItem), [
+                {
+                    'order_id': new_order.id,
+                    'product_id': pid,
+                    'quantity': qty,
+                    'price_at_purchase': quotes[pid].current_price
+                }
+                for pid, qty in lines.items()
+            ])
             db.session.commit()
+            # Stock is part of the public product payload, but a checkout
+            # mustn't flush every catalog cache: let it show up within
+            # CATALOG_STOCK_STALENESS seconds instead
+            mark_stock_changed()
             return total
         except Exception as e:
             db.session.rollback()
+            if cart_store.enabled and lines:
+                cart_store.put_back(user_id, lines)
             raise e
@@ -0,0 +1,192 @@
+import atexit
+import logging
+import threading
+import weakref
+from flask import current_app
+from sqlalchemy import insert
+from models import db, CartItem
+from utils.store import make_store
+
+logger = logging.getLogger(__name__)
+
+DIRTY_KEY = 'cart:dirty'
+
+
+def _cart_key(user_id):
+    return f"cart:{user_id}"
+
+
+class CartStore:
+    """
+    Flask extension keeping carts in a key/value store (CART_STORE_URL:
+    memory:// for a single worker, redis://... shared between workers)
+    instead of reading and committing CartItem rows on every request.
+    
+    Each cart is one entry {product_id: quantity} changed atomically through
+    the store's update(). Changed carts are listed under DIRTY_KEY and
+    written back to CartItem every CART_WRITEBACK_INTERVAL seconds by a
+    background thread (and on shutdown); checkout syncs its user's rows in
+    its own transaction. CartItem stays the durable copy a cart is reloaded
+    from when it isn't in the store. Disabled (carts in the database only)
+    when CART_STORE_URL is unset.
+    """
+    
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.config.setdefault('CART_STORE_URL', None)
+        app.config.setdefault('CART_STORE_TTL', 7 * 24 * 3600)
+        app.config.setdefault('CART_WRITEBACK_INTERVAL', 5)
+        url = app.config['CART_STORE_URL']
+        app.extensions['cart_store'] = make_store(url) if url else None
+        if url:
+            self._start_writeback(app)
+    
+    def _start_writeback(self, app):
+        stop = threading.Event()
+        interval = app.config['CART_WRITEBACK_INTERVAL']
+        app_ref = weakref.ref(app)
+        
+        def flush():
+            app = app_ref()
+            if app is None:
+                return False
+            try:
+                with app.app_context():
+                    self.flush()
+            except Exception:
+                logger.exception("Cart write-back failed")
+            return True
+        
+        def run():
+            while not stop.wait(interval) and flush():
+                pass
+        
+        def shutdown():
+            stop.set()
+            flush()
+        
+        threading.Thread(target=run, name='cart-writeback', daemon=True).start()
+        atexit.register(shutdown)
+    
+    @property
+    def backend(self):
+        return current_app.extensions.get('cart_store')
+    
+    @property
+    def enabled(self):
+        return self.backend is not None
+    
+    # --- Cart access ---
+    @staticmethod
+    def _decode(value):
+        return {int(pid): qty for pid, qty in value.items()}
+    
+    @staticmethod
+    def _encode(lines):
+        # JSON object keys (file:// and redis:// stores) are strings
+        return {str(pid): qty for pid, qty in lines.items() if qty > 0}
+    
+    def _load(self, user_id):
+        """Put the user's CartItem rows in the store unless the cart is already there"""
+        if self.backend.get(_cart_key(user_id)) is not None:
+            return
+        lines = {}
+        rows = db.session.query(CartItem.product_id, CartItem.quantity).filter_by(user_id=user_id)
+        for product_id, quantity in rows:
+            lines[product_id] = lines.get(product_id, 0) + quantity
+        self.backend.update(_cart_key(user_id), lambda current: (
+            current if current is not None else self._encode(lines), None
+        ), ttl=current_app.config['CART_STORE_TTL'])
+    
+    def lines(self, user_id):
+        """
+        Get a user's cart
+        Returns:
+            dict: product_id -> quantity
+        """
+        user_id = int(user_id)  # JWT identities are strings
+        self._load(user_id)
+        return self._decode(self.backend.get(_cart_key(user_id)) or {})
+    
+    def apply(self, user_id, fn):
+        """
+        Atomically change a user's cart and schedule its write-back
+        Args:
+            fn: Called with the current {product_id: quantity} (a copy it may
+                modify), returns (new lines, result)
+        Returns:
+            The `result` returned by fn
+        """
+        user_id = int(user_id)
+        self._load(user_id)
+        
+        def change(current):
+            lines, result = fn(self._decode(current or {}))
+            return self._encode(lines), result
+        result = self.backend.update(_cart_key(user_id), change, ttl=current_app.config['CART_STORE_TTL'])
+        self._mark_dirty(user_id)
+        return result
+    
+    def add(self, user_id, product_id, quantity):
+        """Atomically add `quantity` of a product; returns the line's new quantity"""
+        def increment(lines):
+            lines[product_id] = lines.get(product_id, 0) + quantity
+            return lines, lines[product_id]
+        return self.apply(user_id, increment)
+    
+    def take(self, user_id):
+        """
+        Atomically empty a user's cart (for checkout), so concurrent
+        checkouts of one cart can't both get its lines
+        Returns:
+            dict: The removed product_id -> quantity
+        """
+        return self.apply(user_id, lambda current: ({}, current))
+    
+    def put_back(self, user_id, lines):
+        """Return lines taken by a failed checkout, keeping anything added meanwhile"""
+        def merge(current):
+            for product_id, quantity in lines.items():
+                current[product_id] = current.get(product_id, 0) + quantity
+            return current, None
+        self.apply(user_id, merge)
+    
+    # --- Write-back ---
+    def _mark_dirty(self, user_id):
+        self.backend.update(DIRTY_KEY, lambda current: (
+            sorted(set(current or []) | {user_id}), None
+        ))
+    
+    def flush(self):
+        """
+        Write every changed cart back to CartItem in one transaction
+        Returns:
+            int: Number of carts written
+        """
+        user_ids = self.backend.update(DIRTY_KEY, lambda current: ([], current or []))
+        if not user_ids:
+            return 0
+        try:
+            carts = {}
+            for user_id in user_ids:
+                value = self.backend.get(_cart_key(user_id))
+                if value is not None:  # Expired carts keep their last written rows
+                    carts[user_id] = self._decode(value)
+            CartItem.query.filter(CartItem.user_id.in_(carts)).delete(synchronize_session=False)
+            rows = [{'user_id': user_id, 'product_id': pid, 'quantity': qty}
+                    for user_id, lines in carts.items() for pid, qty in lines.items()]
+            if rows:
+                db.session.execute(insert(CartItem), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Retry them on the next round
+            self.backend.update(DIRTY_KEY, lambda current: (sorted(set(current or []) | set(user_ids)), None))
+            raise
+        return len(user_ids)
+
+
+cart_store = CartStore()
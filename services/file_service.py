@@ -1,16 +1,123 @@
+import hashlib
+import logging
 import os
 import uuid
-from werkzeug.utils import secure_filename
 from flask import current_app
+from exceptions import InvalidUploadException
+from services.storage import storage
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes identifying each allowed image type -> stored extension
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+SNIFF_BYTES = 12
+
+
+def sniff_image_type(head):
+    """Return the image extension for the given leading bytes, or None"""
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+class UploadSink:
+    """
+    Writable file-like target for an incoming upload.
+    
+    Chunks go straight to a temp file in the staging folder while they are
+    hashed and counted. The type is sniffed from the first bytes and the
+    upload is aborted as soon as it is not an image or exceeds max_size,
+    so bogus or oversized files never get fully received.
+    """
+    
+    def __init__(self, staging_path, max_size):
+        os.makedirs(staging_path, exist_ok=True)
+        self.path = os.path.join(staging_path, f".upload-{uuid.uuid4().hex}.tmp")
+        self.max_size = max_size
+        self.size = 0
+        self.extension = None
+        self._head = b''
+        self._digest = hashlib.sha256()
+        self._file = open(self.path, 'w+b')
+        self._committed = False
+    
+    def _reject(self, message, status_code=400):
+        self.close()
+        raise InvalidUploadException(message, status_code)
+    
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            self._reject(f"File too large. Maximum size: {self.max_size // (1024 * 1024)}MB", 413)
+        if self.extension is None and len(self._head) < SNIFF_BYTES:
+            self._head += chunk[:SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= SNIFF_BYTES:
+                self._sniff()
+        self._digest.update(chunk)
+        return self._file.write(chunk)
+    
+    def _sniff(self):
+        self.extension = sniff_image_type(self._head)
+        if self.extension is None:
+            self._reject("Invalid file type. Allowed: png, jpg, jpeg, gif, webp")
+    
+    def finish(self):
+        """Validate a completed upload (catches files shorter than the sniff window)"""
+        if self.extension is None:
+            self._sniff()
+        self._file.flush()
+    
+    def hexdigest(self):
+        return self._digest.hexdigest()
+    
+    def detach(self):
+        """Close the upload and hand its temp file over to the caller"""
+        self._file.close()
+        self._committed = True
+        return self.path
+    
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self._committed and os.path.exists(self.path):
+            os.remove(self.path)
+    
+    # Reading back (werkzeug rewinds the stream once the part is complete)
+    def seek(self, *args):
+        return self._file.seek(*args)
+    
+    def tell(self):
+        return self._file.tell()
+    
+    def read(self, *args):
+        return self._file.read(*args)
+    
+    def readline(self, *args):
+        return self._file.readline(*args)
+    
+    @property
+    def closed(self):
+        return self._file.closed
+
 
 class FileService:
     """
     Low-level file handling service for image uploads.
     Handles validation, storage, and deletion of image files.
+    Bytes are kept by the configured storage backend (see services.storage).
     """
     
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
     MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+    CHUNK_SIZE = 64 * 1024
     
     @staticmethod
     def allowed_file(filename):
@@ -25,48 +132,73 @@ class FileService:
                filename.rsplit('.', 1)[1].lower() in FileService.ALLOWED_EXTENSIONS
     
     @staticmethod
-    def save_image(file, folder='uploads'):
+    def staging_path():
+        """Folder incoming uploads are streamed into (same filesystem as storage)"""
+        return current_app.config['UPLOAD_STAGING_DIR']
+    
+    @staticmethod
+    def open_upload_sink():
+        """New UploadSink for an incoming file, bounded by MAX_FILE_SIZE"""
+        return UploadSink(FileService.staging_path(), FileService.MAX_FILE_SIZE)
+    
+    @staticmethod
+    def receive_image(file):
         """
-        Save uploaded image with a unique filename
+        Validate and hash an uploaded image without storing it yet.
+        Uploads parsed by StreamingUploadRequest were already validated,
+        hashed and written while they were received; anything else is
+        streamed through an UploadSink here.
         
         Args:
             file: FileStorage object from request.files
-            folder: Subfolder name (e.g., 'users', 'products')
-            
+        
         Returns:
-            str: The saved filename (UUID-based)
-            
+            tuple: (local_path, filename) - a temp file for storage.put_file
+                   and its content-addressed name (<sha256>.<extension>)
+        
         Raises:
             ValueError: If file type is invalid or file is too large
         """
         if not file or file.filename == '':
             raise ValueError("No file provided")
-            
+        
         if not FileService.allowed_file(file.filename):
             raise ValueError("Invalid file type. Allowed: png, jpg, jpeg, gif, webp")
         
-        # Check file size
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)  # Reset file pointer
+        try:
+            sink = file.stream
+            if not isinstance(sink, UploadSink):
+                sink = FileService.open_upload_sink()
+                for chunk in iter(lambda: file.stream.read(FileService.CHUNK_SIZE), b''):
+                    sink.write(chunk)
+            sink.finish()
+        except InvalidUploadException as e:
+            raise ValueError(str(e))
         
-        if file_size > FileService.MAX_FILE_SIZE:
-            raise ValueError("File too large. Maximum size: 5MB")
+        # Stored under its content hash, with the extension of the sniffed type
+        return sink.detach(), f"{sink.hexdigest()}.{sink.extension}"
+    
+    @staticmethod
+    def save_image(file, folder='uploads'):
+        """
+        Save uploaded image under a content-addressed filename.
+        Identical uploads map to the same file, which is only written once.
         
-        # Generate unique filename to prevent collisions
-        original_filename = secure_filename(file.filename)
-        extension = original_filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"{uuid.uuid4().hex}.{extension}"
+        Args:
+            file: FileStorage object from request.files
+            folder: Subfolder name (e.g., 'users', 'products')
         
-        # Create upload directory if it doesn't exist
-        upload_path = os.path.join(current_app.root_path, 'static', folder)
-        os.makedirs(upload_path, exist_ok=True)
+        Returns:
+            str: The saved filename (<sha256>.<extension>). A local copy stays
+                 readable via storage.local_path until storage.release_local.
         
-        # Save file
-        file_path = os.path.join(upload_path, unique_filename)
-        file.save(file_path)
+        Raises:
+            ValueError: If file type is invalid or file is too large
+        """
+        local_path, content_filename = FileService.receive_image(file)
+        storage.put_file(local_path, folder, content_filename, keep_local=True)
         
-        return unique_filename
+        return content_filename
     
     @staticmethod
     def delete_image(filename, folder='uploads'):
@@ -76,24 +208,18 @@ class FileService:
         Args:
             filename: Name of the file to delete
             folder: Subfolder where the file is stored
-            
+        
         Returns:
             bool: True if file was deleted, False if file didn't exist
         """
         if not filename:
             return False
-            
-        file_path = os.path.join(current_app.root_path, 'static', folder, filename)
-        
-        if os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-                return True
-            except OSError as e:
-                # Log error in production
-                print(f"Error deleting file {filename}: {e}")
-                return False
-        return False
+        
+        try:
+            return storage.delete(folder, filename)
+        except Exception:
+            logger.exception("Error deleting file %s/%s", folder, filename)
+            return False
     
     @staticmethod
     def get_image_url(filename, folder='uploads'):
@@ -103,13 +229,13 @@ class FileService:
         Args:
             filename: Name of the image file
             folder: Subfolder where the file is stored
-            
+        
         Returns:
             str: URL path to access the image, or None if no filename
         """
         if not filename:
             return None
-        return f"/static/{folder}/{filename}"
+        return storage.url(folder, filename)
     
     @staticmethod
     def file_exists(filename, folder='uploads'):
@@ -119,11 +245,10 @@ class FileService:
         Args:
             filename: Name of the file
             folder: Subfolder to check
-            
+        
         Returns:
             bool: True if file exists, False otherwise
         """
         if not filename:
             return False
-        file_path = os.path.join(current_app.root_path, 'static', folder, filename)
-        return os.path.exists(file_path)
\ No newline at end of file
+        return storage.exists(folder, filename)
\ No newline at end of file
@@ -0,0 +1,185 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from flask import current_app
+from PIL import Image, ImageOps, features
+from sqlalchemy import update
+from models import db, Product, User, ImageBlob
+from services.storage import storage
+
+logger = logging.getLogger(__name__)
+
+# Image.info entries still needed to encode the pixels correctly. Everything
+# else (icc_profile, exif, xmp, text chunks, comments) is dropped, because
+# some encoders (PNG, GIF) copy it from info into the output.
+KEEP_INFO = ('transparency',)
+
+def supported_formats():
+    """Variant formats the installed Pillow can encode"""
+    Image.init()
+    formats = []
+    if features.check('webp'):
+        formats.append('webp')
+    if 'AVIF' in Image.SAVE:
+        formats.append('avif')
+    return formats
+
+
+def process_image(path, output_dir, sizes, max_dimension, max_pixels, formats):
+    """
+    Decode an uploaded original, strip its metadata and write resized variants.
+    Runs in a worker thread or process, so it only touches the local filesystem.
+    
+    Args:
+        path: Local path of the uploaded original
+        output_dir: Directory the variants are written to
+        sizes: dict of variant name -> bounding box edge in pixels
+        max_dimension: Originals larger than this are downscaled in place
+        max_pixels: Refuse to decode images with more pixels than this
+        formats: Variant formats to encode (e.g. ['webp', 'avif'])
+    Returns:
+        dict: "original" and "<name>_<format>" -> variant filename in output_dir
+    Raises:
+        ValueError: If the file is not a decodable image or is too large
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    try:
+        with Image.open(path) as img:
+            img_format = img.format
+            animated = getattr(img, 'n_frames', 1) > 1
+            img.load()
+            img = ImageOps.exif_transpose(img)
+            img.info = {key: value for key, value in img.info.items() if key in KEEP_INFO}
+    except (OSError, Image.DecompressionBombError, SyntaxError) as e:
+        raise ValueError(f"Could not decode image: {e}")
+    
+    stem, extension = os.path.basename(path).rsplit('.', 1)
+    variants = {}
+    
+    # Re-encode the original without its metadata, capped at max_dimension.
+    # It is written next to the upload rather than over it, because stored
+    # names are content hashes and must never change content.
+    # Animated images are left alone so they keep their frames.
+    if not animated:
+        original = img.copy()
+        original.thumbnail((max_dimension, max_dimension))
+        if img_format == 'JPEG' and original.mode not in ('RGB', 'L'):
+            original = original.convert('RGB')
+        variant_name = f"{stem}_original.{extension}"
+        original.save(os.path.join(output_dir, variant_name), format=img_format)
+        variants['original'] = variant_name
+    
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+    
+    for name, edge in sizes.items():
+        resized = img.copy()
+        resized.thumbnail((edge, edge))
+        for fmt in formats:
+            variant_name = f"{stem}_{name}.{fmt}"
+            resized.save(os.path.join(output_dir, variant_name), format=fmt.upper())
+            variants[f"{name}_{fmt}"] = variant_name
+    return variants
+
+
+class ImagePipeline:
+    """
+    Flask extension running process_image on a bounded worker pool.
+    
+    IMAGE_EXECUTOR selects the pool: 'thread' (default), 'process', or
+    'sync' to run inline (handy for debugging). When a job finishes, the
+    variant filenames are written to the upload's ImageBlob and to the
+    `<image field>_variants` column of every entity pointing at it.
+    Workers read and write local files only; variants are handed to the
+    storage backend once the job is done.
+    """
+    
+    def __init__(self, app=None):
+        self.executor = None
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.config.setdefault('IMAGE_EXECUTOR', 'thread')
+        app.config.setdefault('IMAGE_WORKERS', 2)
+        app.config.setdefault('IMAGE_VARIANT_SIZES', {'thumb': 150, 'medium': 600, 'large': 1600})
+        app.config.setdefault('IMAGE_MAX_DIMENSION', 2048)
+        app.config.setdefault('IMAGE_MAX_PIXELS', 40_000_000)
+        kind = app.config['IMAGE_EXECUTOR']
+        if kind == 'thread':
+            self.executor = ThreadPoolExecutor(app.config['IMAGE_WORKERS'], thread_name_prefix='image')
+        elif kind == 'process':
+            self.executor = ProcessPoolExecutor(app.config['IMAGE_WORKERS'])
+        elif kind == 'sync':
+            self.executor = None
+        else:
+            raise ValueError(f"Unknown IMAGE_EXECUTOR: {kind}")
+        app.extensions['image_pipeline'] = self
+    
+    def submit(self, model, image_field, folder, filename):
+        """
+        Queue variant generation for an upload whose ImageBlob is already committed
+        Returns:
+            Future: Resolves to the variants dict (or raises ValueError)
+        """
+        app = current_app._get_current_object()
+        config = app.config
+        path = storage.local_path(folder, filename)
+        output_dir = storage.work_dir(folder)
+        args = (path, output_dir, config['IMAGE_VARIANT_SIZES'], config['IMAGE_MAX_DIMENSION'],
+                config['IMAGE_MAX_PIXELS'], supported_formats())
+        
+        if self.executor is None:
+            future = Future()
+            try:
+                future.set_result(process_image(*args))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            future = self.executor.submit(process_image, *args)
+        future.add_done_callback(
+            lambda f: self._finish(app, f, model, image_field, filename, folder, output_dir)
+        )
+        return future
+    
+    def _finish(self, app, future, model, image_field, filename, folder, output_dir):
+        from services.file_service import FileService
+        from services.token_service import UserClaimsCache
+        from utils.http_cache import bump_catalog_version
+        
+        with app.app_context():
+            try:
+                variants = future.result()
+            except Exception as e:
+                logger.error("Image processing failed for %s/%s: %s", folder, filename, e)
+                variants = {}
+            # Variants must be in storage before any URL to them is published
+            for variant in variants.values():
+                storage.put_file(os.path.join(output_dir, variant), folder, variant)
+            storage.release_local(folder, filename)
+            result = db.session.execute(
+                update(ImageBlob)
+                .where(ImageBlob.folder == folder, ImageBlob.filename == filename)
+                .values(variants=variants)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.execute(
+                update(model)
+                .where(getattr(model, image_field) == filename)
+                .values({f"{image_field}_variants": variants})
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            if result.rowcount == 0:
+                # Every reference was dropped while we were working
+                for variant in variants.values():
+                    FileService.delete_image(variant, folder)
+            elif model is Product:
+                bump_catalog_version()
+            elif model is User:
+                user_ids = db.session.scalars(db.select(User.id).where(User.profile_image == filename))
+                for user_id in user_ids:
+                    UserClaimsCache.invalidate(user_id)
+
+
+image_pipeline = ImagePipeline()
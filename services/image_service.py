@@ -1,13 +1,103 @@
+import logging
+import os
+from functools import partial
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
 from services.file_service import FileService
-from models import db
+from services.image_processing import image_pipeline
+from services.storage import storage
+from models import db, Product, User, ImageBlob
+from services.token_service import UserClaimsCache
+from utils.http_cache import bump_catalog_version
+
+logger = logging.getLogger(__name__)
 
 class ImageService:
     """Handles all image-related business logic"""
     
+    @staticmethod
+    def _image_field(entity):
+        return 'profile_image' if hasattr(entity, 'profile_image') else 'image'
+    
+    @staticmethod
+    def _blob_filter(folder, filename):
+        return (ImageBlob.folder == folder, ImageBlob.filename == filename)
+    
+    @staticmethod
+    def _acquire_blob(folder, filename):
+        """
+        Add a reference to a stored image, creating its ImageBlob if needed
+        Returns:
+            tuple: (blob, created)
+        """
+        stmt = update(ImageBlob).where(*ImageService._blob_filter(folder, filename)).values(
+            ref_count=ImageBlob.ref_count + 1
+        ).execution_options(synchronize_session=False)
+        if db.session.execute(stmt).rowcount == 0:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(ImageBlob(folder=folder, filename=filename, ref_count=1))
+                return db.session.get(ImageBlob, (folder, filename)), True
+            except IntegrityError:
+                # Someone else stored the same bytes concurrently
+                db.session.execute(stmt)
+        return db.session.get(ImageBlob, (folder, filename), populate_existing=True), False
+    
+    @staticmethod
+    def _release_blob(folder, filename):
+        """
+        Drop a reference to a stored image. Nothing is deleted yet: the
+        caller commits first, then runs the returned purge.
+        Images stored before content addressing have no ImageBlob and are
+        deleted by the purge unconditionally.
+        Returns:
+            callable: Deletes the files once the release is committed, or
+                None while the image is still referenced
+        """
+        blob = db.session.get(ImageBlob, (folder, filename))
+        if blob is None:
+            return partial(FileService.delete_image, filename, folder)
+        db.session.execute(update(ImageBlob).where(*ImageService._blob_filter(folder, filename)).values(
+            ref_count=ImageBlob.ref_count - 1
+        ).execution_options(synchronize_session=False))
+        db.session.refresh(blob)
+        if blob.ref_count <= 0:
+            return partial(ImageService._purge_blob, folder, filename)
+        return None
+    
+    @staticmethod
+    def _purge_blob(folder, filename):
+        """
+        Delete an unreferenced image and its variants, unless an upload of the
+        same bytes took a reference after the release committed. The row is
+        only deleted while ref_count is still 0, and the files go before that
+        commits, so an upload blocked on the row re-creates it and stores
+        its file again (uploads take their reference before storing).
+        """
+        filters = ImageService._blob_filter(folder, filename)
+        try:
+            variants = db.session.scalar(select(ImageBlob.variants).where(*filters)) or {}
+            purged = db.session.execute(
+                delete(ImageBlob).where(*filters, ImageBlob.ref_count <= 0)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if purged:
+                FileService.delete_image(filename, folder)
+                for variant in variants.values():
+                    FileService.delete_image(variant, folder)
+            db.session.commit()
+        except Exception:
+            # The entity change is committed; an unreferenced blob only wastes space
+            db.session.rollback()
+            logger.exception("Could not purge image %s/%s", folder, filename)
+    
     @staticmethod
     def upload_image(entity, file, folder):
         """
         Upload image for any entity (User or Product)
+        Identical uploads share one stored file. Thumbnails and WebP/AVIF
+        variants are generated in the background the first time a file is
+        stored; `<image field>_variants` stays None until they are ready.
         Args:
             entity: Database model instance
             file: Uploaded file
@@ -18,17 +108,42 @@ class ImageService:
             ValueError: If file validation fails
         """
         # Determine image field name
-        image_field = 'profile_image' if hasattr(entity, 'profile_image') else 'image'
-        
-        # Delete old image if exists
+        image_field = ImageService._image_field(entity)
         old_image = getattr(entity, image_field)
-        if old_image:
-            FileService.delete_image(old_image, folder)
         
-        # Save new image
-        filename = FileService.save_image(file, folder)
+        # Take a reference to the new image (deduplicated) before storing it,
+        # so a concurrent purge of the same bytes either sees the reference
+        # or has finished deleting by the time the file is stored; and before
+        # releasing the old one, in case both are the same file.
+        # Only a new blob keeps a local copy, for its pipeline job (which
+        # releases it); a duplicate must not touch that copy, as the job
+        # may still be queued.
+        local_path, filename = FileService.receive_image(file)
+        try:
+            blob, created = ImageService._acquire_blob(folder, filename)
+            storage.put_file(local_path, folder, filename, keep_local=created)
+        except Exception:
+            db.session.rollback()
+            if os.path.exists(local_path):
+                os.remove(local_path)
+            raise
+        purge = ImageService._release_blob(folder, old_image) if old_image else None
+        
         setattr(entity, image_field, filename)
+        setattr(entity, f"{image_field}_variants", blob.variants)
         db.session.commit()
+        if purge:
+            purge()
+        if isinstance(entity, Product):
+            bump_catalog_version()
+        elif isinstance(entity, User):
+            UserClaimsCache.invalidate(entity.id)
+        
+        if created:
+            future = image_pipeline.submit(type(entity), image_field, folder, filename)
+            if future.done():
+                # Processed inline (IMAGE_EXECUTOR='sync'); pick up the variants
+                db.session.refresh(entity)
         
         return entity
     
@@ -36,6 +151,7 @@ class ImageService:
     def delete_image(entity, folder):
         """
         Delete image for any entity
+        The stored file is only removed once nothing references it.
         Args:
             entity: Database model instance
             folder: Storage folder name
@@ -44,14 +160,21 @@ class ImageService:
         Raises:
             ValueError: If no image exists
         """
-        image_field = 'profile_image' if hasattr(entity, 'profile_image') else 'image'
+        image_field = ImageService._image_field(entity)
         current_image = getattr(entity, image_field)
         
         if not current_image:
             raise ValueError("No image to delete")
         
-        FileService.delete_image(current_image, folder)
+        purge = ImageService._release_blob(folder, current_image)
         setattr(entity, image_field, None)
+        setattr(entity, f"{image_field}_variants", None)
         db.session.commit()
+        if purge:
+            purge()
+        if isinstance(entity, Product):
+            bump_catalog_version()
+        elif isinstance(entity, User):
+            UserClaimsCache.invalidate(entity.id)
         
-        return entity
\ No newline at end of file
+        return entity
@@ -0,0 +1,82 @@
+import threading
+from datetime import datetime, timezone
+from sqlalchemy import select
+from models import db, Offer
+from utils.store import shared_store
+
+GENERATION_KEY = 'offers:generation'
+
+def _as_utc(value):
+    return value.replace(tzinfo=timezone.utc)
+
+class ActiveOfferIndex:
+    """
+    In-process index of currently active offer ids.
+    
+    Offers only change state at their start_time/end_time, so the index
+    remembers the next such transition and rebuilds only when it is
+    reached, or when the shared generation counter is bumped by a write
+    (see invalidate). The counter lives in the shared store so every
+    worker notices writes made by any other worker.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active_ids = None
+        self._next_transition = None
+        self._last_transition = None
+        self._generation = None
+    
+    def _is_stale(self, now, generation):
+        if self._active_ids is None or generation != self._generation:
+            return True
+        return self._next_transition is not None and now >= self._next_transition
+    
+    def _rebuild(self, now, generation):
+        # Always from the primary: a request routed to the replica before a
+        # write would otherwise cache lagging rows under the new generation
+        offers = db.session.execute(
+            select(Offer.id, Offer.start_time, Offer.end_time), bind_arguments={'bind': db.engine}
+        ).all()
+        active_ids = []
+        upcoming = []
+        past = []
+        for offer_id, start_time, end_time in offers:
+            start, end = _as_utc(start_time), _as_utc(end_time)
+            if start <= now <= end:
+                active_ids.append(offer_id)
+            for moment in (start, end):
+                (upcoming if moment > now else past).append(moment)
+        self._active_ids = tuple(sorted(active_ids))
+        self._next_transition = min(upcoming) if upcoming else None
+        self._last_transition = max(past) if past else None
+        self._generation = generation
+    
+    def active_offer_ids(self, now=None):
+        """
+        Get ids of offers active at `now`
+        Returns:
+            tuple: Active offer ids (rebuilt from the database only when stale)
+        """
+        now = now or datetime.now(timezone.utc)
+        generation = shared_store.get(GENERATION_KEY) or 0
+        with self._lock:
+            if self._is_stale(now, generation):
+                self._rebuild(now, generation)
+            return self._active_ids
+    
+    def next_transition(self):
+        """Time at which the active set next changes, or None"""
+        return self._next_transition
+    
+    def last_transition(self):
+        """Most recent start/end time that has already passed, or None"""
+        return self._last_transition
+    
+    def invalidate(self):
+        """Drop the local index and signal every other worker to rebuild"""
+        shared_store.incr(GENERATION_KEY)
+        with self._lock:
+            self._active_ids = None
+
+active_offer_index = ActiveOfferIndex()
@@ -1,14 +1,37 @@
+from sqlalchemy import update
 from models import db, Offer, Product
-from datetime import datetime, timezone
-from sqlalchemy.orm import joinedload
-from exceptions import ProductNotFoundException, OfferNotFoundException
+from exceptions import ProductNotFoundException, OfferNotFoundException, ValidationException
+from services.offer_index import active_offer_index
+from services.product_service import ProductService
+from utils.http_cache import bump_catalog_version
+
+def _is_int(value):
+    # bool is an int subclass; `true` must not mean product 1
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
 class OfferService:
+    FILTER_KEYS = {'category_id', 'min_price', 'max_price', 'in_stock'}
+    
+    @staticmethod
+    def _invalidate():
+        """Drop everything derived from offer data after a committed write"""
+        # MODIFIED_KEY first: requests starting after the generation bump
+        # must already stay off the (possibly lagging) replica
+        bump_catalog_version()
+        active_offer_index.invalidate()
+    
     @staticmethod
     def create_offer(data):
         from schemas import offer_schema
         offer = offer_schema.load(data)
         db.session.add(offer)
         db.session.commit()
+        OfferService._invalidate()
         return offer
     
     @staticmethod
@@ -26,16 +49,97 @@ class OfferService:
         # Apply offer
         product.offer_id = offer_id
         db.session.commit()
+        OfferService._invalidate()
         return product
     
+    @staticmethod
+    def _selector_clauses(selector):
+        """
+        Translate a bulk selector into SQL criteria. Exactly one of:
+            {"product_ids": [1, 2, 3]}
+            {"category_id": 4}
+            {"filter": {"category_id": 4, "min_price": 10, "max_price": 50, "in_stock": true}}
+        Raises:
+            ValidationException: If the selector is malformed or selects everything
+        """
+        selector = selector or {}
+        keys = {'product_ids', 'category_id', 'filter'} & set(selector)
+        if len(keys) != 1:
+            raise ValidationException("Provide exactly one of product_ids, category_id or filter")
+        if 'product_ids' in selector:
+            product_ids = selector['product_ids']
+            if not isinstance(product_ids, list) or not all(_is_int(i) for i in product_ids):
+                raise ValidationException("product_ids must be a list of integers")
+            return [Product.id.in_(product_ids)]
+        if 'category_id' in selector:
+            if not _is_int(selector['category_id']):
+                raise ValidationException("category_id must be an integer")
+            return ProductService.filter_clauses(category_id=selector['category_id'])
+        filters = selector['filter']
+        if not isinstance(filters, dict) or set(filters) - OfferService.FILTER_KEYS:
+            raise ValidationException(f"filter accepts only: {', '.join(sorted(OfferService.FILTER_KEYS))}")
+        if not filters:
+            # Would match the whole catalog
+            raise ValidationException("filter must contain at least one condition")
+        for key in ('min_price', 'max_price'):
+            if key in filters and not _is_number(filters[key]):
+                raise ValidationException(f"{key} must be a number")
+        if 'category_id' in filters and not _is_int(filters['category_id']):
+            raise ValidationException("category_id must be an integer")
+        if 'in_stock' in filters and not isinstance(filters['in_stock'], bool):
+            raise ValidationException("in_stock must be true or false")
+        return ProductService.filter_clauses(**filters)
+    
+    @staticmethod
+    def apply_offer_bulk(offer_id, selector):
+        """
+        Attach an offer to every selected product with one UPDATE
+        Returns:
+            int: Number of products updated
+        Raises:
+            OfferNotFoundException: If the offer doesn't exist
+            ValidationException: If the selector is malformed
+        """
+        clauses = OfferService._selector_clauses(selector)
+        if not db.session.get(Offer, offer_id):
+            raise OfferNotFoundException(offer_id)
+        result = db.session.execute(
+            update(Product).where(*clauses).values(offer_id=offer_id)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        OfferService._invalidate()
+        return result.rowcount
+    
+    @staticmethod
+    def remove_offer_bulk(offer_id, selector=None):
+        """
+        Detach an offer from the selected products (all of its products if
+        no selector is given) with one UPDATE
+        Returns:
+            int: Number of products updated
+        Raises:
+            OfferNotFoundException: If the offer doesn't exist
+            ValidationException: If the selector is malformed
+        """
+        clauses = OfferService._selector_clauses(selector) if selector else []
+        if not db.session.get(Offer, offer_id):
+            raise OfferNotFoundException(offer_id)
+        result = db.session.execute(
+            update(Product).where(Product.offer_id == offer_id, *clauses).values(offer_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        OfferService._invalidate()
+        return result.rowcount
     
     @staticmethod
     def get_active_offers_products():
-        now = datetime.now(timezone.utc)
-        return Product.query.join(Offer).options(
-            joinedload(Product.category),
-            joinedload(Product.offer)
-        ).filter(
-            Offer.start_time <= now,
-            Offer.end_time >= now
-        ).all()
+        # Active offer ids come from the in-memory timeline index, so the
+        # only query left is an indexed lookup on Product.offer_id
+        active_ids = active_offer_index.active_offer_ids()
+        if not active_ids:
+            return []
+        return ProductService.with_relations(Product.query).filter(
+            Product.offer_id.in_(active_ids)
+        ).order_by(Product.id).all()
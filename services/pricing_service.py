@@ -0,0 +1,81 @@
+from collections import namedtuple
+from datetime import datetime, timezone
+from flask import g, has_app_context
+
+PriceQuote = namedtuple('PriceQuote', ['current_price', 'discount_amount', 'is_on_offer'])
+
+class PricingService:
+    """
+    Computes effective product prices once per product per request.
+    Every quote in a request is evaluated against the same "now", and
+    results are memoized on flask.g so schemas and services share them.
+    """
+    
+    @staticmethod
+    def now():
+        """Reference time for offer evaluation, fixed for the current app context"""
+        if not has_app_context():
+            return datetime.now(timezone.utc)
+        if 'pricing_now' not in g:
+            g.pricing_now = datetime.now(timezone.utc)
+        return g.pricing_now
+    
+    @staticmethod
+    def is_offer_active(offer, now):
+        if not offer:
+            return False
+        start = offer.start_time.replace(tzinfo=timezone.utc)
+        end = offer.end_time.replace(tzinfo=timezone.utc)
+        return start <= now <= end
+    
+    @staticmethod
+    def compute(product, now):
+        """Compute a PriceQuote for a product without touching the cache"""
+        if PricingService.is_offer_active(product.offer, now):
+            discount = product.offer.discount_percent / 100
+            current_price = round(product.price * (1 - discount), 2)
+            return PriceQuote(current_price, round(product.price - current_price, 2), True)
+        return PriceQuote(product.price, 0.0, False)
+    
+    @staticmethod
+    def _cache():
+        if not has_app_context():
+            return None
+        if 'price_quotes' not in g:
+            g.price_quotes = {}
+        return g.price_quotes
+    
+    @staticmethod
+    def quote(product):
+        """
+        Get the effective price of a product for the current request
+        Args:
+            product: Product instance (offer relationship should be loaded)
+        Returns:
+            PriceQuote: (current_price, discount_amount, is_on_offer)
+        """
+        now = PricingService.now()
+        cache = PricingService._cache()
+        if cache is None or product.id is None:
+            return PricingService.compute(product, now)
+        # price/offer_id are part of the key so in-request edits are never served stale
+        key = (product.id, product.price, product.offer_id)
+        quote = cache.get(key)
+        if quote is None:
+            quote = cache[key] = PricingService.compute(product, now)
+        return quote
+    
+    @staticmethod
+    def clear():
+        """Forget memoized quotes, e.g. between batches of a long streaming export"""
+        if has_app_context():
+            g.pop('price_quotes', None)
+    
+    @staticmethod
+    def quote_many(products):
+        """
+        Quote a batch of products against a single "now"
+        Returns:
+            list: PriceQuote per product, in input order
+        """
+        return [PricingService.quote(product) for product in products]
@@ -0,0 +1,137 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+from marshmallow import ValidationError
+from sqlalchemy import insert, update
+from models import db, Product, Category, Offer
+from services.search_index import search_index
+from utils.http_cache import bump_catalog_version
+
+class ProductImportService:
+    """
+    Bulk product upsert keyed on Product.sku.
+    Rows are validated with ProductSchema a chunk at a time and written
+    with executemany INSERT/UPDATE, one transaction per chunk.
+    """
+    
+    FIELDS = ('sku', 'name', 'price', 'stock', 'category_id', 'offer_id')
+    
+    @staticmethod
+    def iter_csv(stream):
+        """Yield rows from a CSV byte stream; empty cells count as missing"""
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8', newline=''))
+        for row in reader:
+            yield {k: v for k, v in row.items() if k and v not in (None, '')}
+    
+    @staticmethod
+    def iter_ndjson(stream):
+        """Yield rows from an NDJSON byte stream (one object per line)"""
+        for line in io.TextIOWrapper(stream, encoding='utf-8'):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield {"_error": "Invalid JSON"}
+    
+    @staticmethod
+    def _existing_ids(model, ids):
+        ids = {i for i in ids if i is not None}
+        if not ids:
+            return set()
+        return {row[0] for row in db.session.query(model.id).filter(model.id.in_(ids))}
+    
+    @staticmethod
+    def _import_chunk(schema, numbered_rows, report):
+        errors = {}
+        candidates = []
+        for number, row in numbered_rows:
+            if not isinstance(row, dict):
+                errors[number] = {"_schema": ["Row must be an object"]}
+            elif '_error' in row:
+                errors[number] = {"_schema": [row['_error']]}
+            elif not row.get('sku'):
+                errors[number] = {"sku": ["Missing data for required field."]}
+            else:
+                candidates.append((number, row))
+        
+        # One pass: rows that failed come back in err.messages by index,
+        # and err.valid_data still holds every row's loaded fields
+        try:
+            loaded = schema.load([row for _, row in candidates]) if candidates else []
+            validation = {}
+        except ValidationError as err:
+            loaded, validation = err.valid_data, err.messages
+        valid = []
+        for index, ((number, _), data) in enumerate(zip(candidates, loaded)):
+            if index in validation:
+                errors[number] = validation[index]
+            else:
+                valid.append((number, data))
+        
+        # Foreign keys are checked once per chunk instead of per row
+        categories = ProductImportService._existing_ids(Category, (data.get('category_id') for _, data in valid))
+        offers = ProductImportService._existing_ids(Offer, (data.get('offer_id') for _, data in valid))
+        by_sku = {}
+        for number, data in valid:
+            if data['category_id'] not in categories:
+                errors[number] = {"category_id": [f"Category {data['category_id']} does not exist"]}
+            elif data.get('offer_id') is not None and data['offer_id'] not in offers:
+                errors[number] = {"offer_id": [f"Offer {data['offer_id']} does not exist"]}
+            else:
+                by_sku[data['sku']] = data  # Last occurrence of a SKU wins
+        
+        existing = dict(db.session.query(Product.sku, Product.id).filter(Product.sku.in_(by_sku)))
+        inserts = [data for sku, data in by_sku.items() if sku not in existing]
+        updates = [dict(data, id=existing[sku]) for sku, data in by_sku.items() if sku in existing]
+        try:
+            if inserts:
+                db.session.execute(insert(Product), inserts)
+            if updates:
+                db.session.execute(update(Product), updates)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        report['inserted'] += len(inserts)
+        report['updated'] += len(updates)
+        report['errors'].extend(
+            {"row": number, "sku": row.get('sku') if isinstance(row, dict) else None, "errors": errors[number]}
+            for number, row in numbered_rows if number in errors
+        )
+    
+    @staticmethod
+    def import_rows(rows, chunk_size=1000):
+        """
+        Upsert products by SKU
+        Args:
+            rows: Iterable of dicts with sku, name, price, stock, category_id, offer_id
+            chunk_size: Rows validated and committed per transaction
+        Returns:
+            dict: Counts, per-row errors (1-based row numbers) and throughput
+        """
+        from schemas import ProductSchema
+        schema = ProductSchema(many=True, load_instance=False, only=ProductImportService.FIELDS)
+        report = {"processed": 0, "inserted": 0, "updated": 0, "errors": []}
+        started = time.perf_counter()
+        numbered = enumerate(rows, start=1)
+        try:
+            while True:
+                chunk = list(islice(numbered, chunk_size))
+                if not chunk:
+                    break
+                ProductImportService._import_chunk(schema, chunk, report)
+                report['processed'] += len(chunk)
+        finally:
+            # Also when a later chunk raised: the earlier ones are committed
+            if report['inserted'] or report['updated']:
+                search_index.invalidate()
+                bump_catalog_version()
+        elapsed = time.perf_counter() - started
+        report['seconds'] = round(elapsed, 3)
+        report['rows_per_second'] = round(report['processed'] / elapsed, 1) if elapsed else None
+        return report
@@ -1,22 +1,110 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
 from models import db, Product, Category
+from services.search_index import search_index
+from utils.pagination import encode_cursor, decode_cursor
+from utils.http_cache import bump_catalog_version
 
 class ProductService:
+    @staticmethod
+    def with_relations(query):
+        """Eager-load the relationships ProductSchema serializes (category, offer)"""
+        return query.options(
+            joinedload(Product.category),
+            joinedload(Product.offer)
+        )
+    
     @staticmethod
     def create_product(data):
         from schemas import product_schema
         product = product_schema.load(data)
         db.session.add(product)
         db.session.commit()
+        search_index.invalidate()
+        bump_catalog_version()
         return product
     
+    @staticmethod
+    def filter_clauses(category_id=None, min_price=None, max_price=None, in_stock=None):
+        """SQL criteria for the catalog filters, usable in queries and bulk UPDATEs"""
+        clauses = []
+        if category_id is not None:
+            clauses.append(Product.category_id == category_id)
+        if min_price is not None:
+            clauses.append(Product.price >= min_price)
+        if max_price is not None:
+            clauses.append(Product.price <= max_price)
+        if in_stock is True:
+            clauses.append(Product.stock > 0)
+        elif in_stock is False:
+            clauses.append(Product.stock <= 0)
+        return clauses
+    
     @staticmethod
     def get_all_products():
-        return Product.query.all()
+        return ProductService.with_relations(Product.query).all()
+    
+    @staticmethod
+    def get_products_page(cursor=None, limit=50, category_id=None,
+                          min_price=None, max_price=None, in_stock=None):
+        """
+        Keyset-paginated product listing ordered by Product.id
+        Args:
+            cursor: Opaque cursor returned by the previous page
+            limit: Page size
+            category_id, min_price, max_price, in_stock: Optional filters
+        Returns:
+            tuple: (products, next_cursor) - next_cursor is None on the last page
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        query = ProductService.with_relations(Product.query)
+        last_id = decode_cursor(cursor)
+        if last_id is not None:
+            query = query.filter(Product.id > last_id)
+        query = query.filter(*ProductService.filter_clauses(category_id, min_price, max_price, in_stock))
+        
+        # Fetch one extra row to know whether another page exists
+        rows = query.order_by(Product.id).limit(limit + 1).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, encode_cursor(rows[-1].id)
+        return rows, None
+    
+    @staticmethod
+    def iter_product_batches(batch_size=1000):
+        """
+        Stream the whole catalog in id order without loading it at once
+        Args:
+            batch_size: Rows fetched from the cursor per batch (yield_per)
+        Yields:
+            list: Products with category and offer loaded
+        """
+        stmt = ProductService.with_relations(select(Product)).order_by(Product.id)
+        result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+        for batch in result.scalars().partitions():
+            yield batch
     
     @staticmethod
     def get_all_categories():
-        return Category.query.all()
+        """
+        List categories with their product counts in a single statement.
+        The count is attached as `product_count` so CategorySchema does not
+        have to load every product just to count them.
+        """
+        counts = db.session.query(
+            Product.category_id,
+            func.count(Product.id).label('product_count')
+        ).group_by(Product.category_id).subquery()
+        rows = db.session.query(
+            Category, func.coalesce(counts.c.product_count, 0)
+        ).outerjoin(counts, counts.c.category_id == Category.id).order_by(Category.id).all()
+        categories = []
+        for category, product_count in rows:
+            category.product_count = product_count
+            categories.append(category)
+        return categories
     
     @staticmethod
     def get_products_by_category(category_id):
-        return Product.query.filter_by(category_id=category_id).all()
+        return ProductService.with_relations(Product.query).filter_by(category_id=category_id).all()
@@ -0,0 +1,230 @@
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import select, case, func, literal_column, table, column, text
+from models import db, Product
+from utils.store import shared_store
+
+GENERATION_KEY = 'search:generation'
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(value):
+    """Lower-cased words of a product's searchable text or a query"""
+    return WORD_RE.findall((value or '').lower())
+
+
+class Fts5Backend:
+    """
+    SQLite FTS5 external-content table over product.name/sku.
+    Triggers keep it in sync with every write to product, including
+    executemany bulk inserts/updates, so nothing has to call invalidate().
+    """
+    name = 'fts5'
+    _fts = table('product_search', column('rowid'), column('product_search'))
+    
+    def create_schema(self):
+        exists = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_search'"
+        )).first()
+        if exists:
+            return
+        for statement in (
+            "CREATE VIRTUAL TABLE product_search USING fts5("
+            "name, sku, content='product', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+            "CREATE TRIGGER product_search_ai AFTER INSERT ON product BEGIN "
+            "INSERT INTO product_search(rowid, name, sku) VALUES (new.id, new.name, new.sku); END",
+            "CREATE TRIGGER product_search_ad AFTER DELETE ON product BEGIN "
+            "INSERT INTO product_search(product_search, rowid, name, sku) "
+            "VALUES ('delete', old.id, old.name, old.sku); END",
+            "CREATE TRIGGER product_search_au AFTER UPDATE OF name, sku ON product BEGIN "
+            "INSERT INTO product_search(product_search, rowid, name, sku) "
+            "VALUES ('delete', old.id, old.name, old.sku); "
+            "INSERT INTO product_search(rowid, name, sku) VALUES (new.id, new.name, new.sku); END",
+            # Index products that existed before the table did
+            "INSERT INTO product_search(product_search) VALUES ('rebuild')",
+        ):
+            db.session.execute(text(statement))
+        db.session.commit()
+    
+    def ranked(self, terms):
+        match = ' '.join(f'"{term}"*' for term in terms)
+        fts = self._fts
+        return select(
+            fts.c.rowid.label('product_id'),
+            func.bm25(fts.c.product_search).label('rank')  # Lower is better
+        ).where(fts.c.product_search.op('MATCH')(match)).subquery('matches')
+    
+    def invalidate(self):
+        pass
+
+
+class PostgresBackend:
+    """
+    tsvector over product.name/sku with a GIN expression index. The
+    vector is computed from the row itself, so it is never out of sync.
+    """
+    name = 'postgres'
+    VECTOR_SQL = "to_tsvector('simple'::regconfig, coalesce({t}name, '') || ' ' || coalesce({t}sku, ''))"
+    
+    def create_schema(self):
+        db.session.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_product_search ON product "
+            f"USING GIN ({self.VECTOR_SQL.format(t='')})"
+        ))
+        db.session.commit()
+    
+    def ranked(self, terms):
+        vector = literal_column(self.VECTOR_SQL.format(t='product.'))
+        query = func.to_tsquery(literal_column("'simple'::regconfig"), ' & '.join(f"{term}:*" for term in terms))
+        return select(
+            Product.id.label('product_id'),
+            (-func.ts_rank(vector, query)).label('rank')
+        ).where(vector.op('@@')(query)).subquery('matches')
+    
+    def invalidate(self):
+        pass
+
+
+class MemoryBackend:
+    """
+    In-process inverted index for databases without full-text search.
+    Rebuilt when the shared generation counter moves (see invalidate), so
+    writers must call search_index.invalidate() after changing names/SKUs.
+    """
+    name = 'memory'
+    
+    def __init__(self, max_matches):
+        self.max_matches = max_matches
+        self._lock = threading.Lock()
+        self._postings = None
+        self._vocabulary = None
+        self._size = 0
+        self._generation = None
+    
+    def create_schema(self):
+        pass
+    
+    def _rebuild(self, generation):
+        postings = defaultdict(set)
+        rows = db.session.query(Product.id, Product.name, Product.sku).yield_per(1000)
+        size = 0
+        for product_id, name, sku in rows:
+            size += 1
+            for token in tokenize(f"{name} {sku or ''}"):
+                postings[token].add(product_id)
+        self._postings = dict(postings)
+        self._vocabulary = sorted(postings)
+        self._size = size
+        self._generation = generation
+    
+    def _score(self, term):
+        """product id -> score for one query term (exact words beat prefixes)"""
+        scores = {}
+        start = bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            ids = self._postings[token]
+            idf = math.log(1 + self._size / len(ids))
+            weight = idf if token == term else idf / 2
+            for product_id in ids:
+                if weight > scores.get(product_id, 0):
+                    scores[product_id] = weight
+        return scores
+    
+    def ranked(self, terms):
+        generation = shared_store.get(GENERATION_KEY) or 0
+        with self._lock:
+            if self._postings is None or generation != self._generation:
+                self._rebuild(generation)
+            # Every term has to match (AND), like the SQL backends
+            scores = None
+            for term in terms:
+                term_scores = self._score(term)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {pid: s + term_scores[pid] for pid, s in scores.items() if pid in term_scores}
+                if not scores:
+                    break
+        top = heapq.nlargest(self.max_matches, (scores or {}).items(), key=lambda item: item[1])
+        if not top:
+            return select(Product.id.label('product_id'), literal_column('0').label('rank')).where(
+                Product.id.is_(None)).subquery('matches')
+        return select(
+            Product.id.label('product_id'),
+            case({product_id: -score for product_id, score in top}, value=Product.id).label('rank')
+        ).where(Product.id.in_([product_id for product_id, _ in top])).subquery('matches')
+    
+    def invalidate(self):
+        shared_store.incr(GENERATION_KEY)
+        with self._lock:
+            self._postings = None
+
+
+class SearchIndex:
+    """
+    Flask extension selecting the full-text backend for product search.
+    
+    SEARCH_BACKEND is 'auto' (FTS5 on SQLite builds that have it, tsvector
+    on PostgreSQL, the in-memory index otherwise), or one of 'fts5',
+    'postgres', 'memory'. Every backend exposes ranked(terms): a subquery
+    of (product_id, rank) for products matching all terms as prefixes,
+    lower rank first.
+    """
+    
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.config.setdefault('SEARCH_BACKEND', 'auto')
+        app.config.setdefault('SEARCH_FALLBACK_MAX_MATCHES', 5000)
+        app.extensions['search_index'] = None  # Chosen in create_schema, once the engine exists
+    
+    @property
+    def backend(self):
+        return current_app.extensions['search_index']
+    
+    @staticmethod
+    def _has_fts5():
+        options = db.session.execute(text("PRAGMA compile_options")).scalars().all()
+        return 'ENABLE_FTS5' in options
+    
+    def create_schema(self):
+        """Pick the backend and create its tables/indexes (call after db.create_all)"""
+        kind = current_app.config['SEARCH_BACKEND']
+        dialect = db.engine.dialect.name
+        if kind == 'auto':
+            if dialect == 'sqlite' and self._has_fts5():
+                kind = 'fts5'
+            elif dialect == 'postgresql':
+                kind = 'postgres'
+            else:
+                kind = 'memory'
+        if kind == 'fts5':
+            backend = Fts5Backend()
+        elif kind == 'postgres':
+            backend = PostgresBackend()
+        elif kind == 'memory':
+            backend = MemoryBackend(current_app.config['SEARCH_FALLBACK_MAX_MATCHES'])
+        else:
+            raise ValueError(f"Unknown SEARCH_BACKEND: {kind}")
+        backend.create_schema()
+        current_app.extensions['search_index'] = backend
+    
+    def ranked(self, terms):
+        return self.backend.ranked(terms)
+    
+    def invalidate(self):
+        """Signal that product names/SKUs changed (only the memory backend needs it)"""
+        self.backend.invalidate()
+
+
+search_index = SearchIndex()
@@ -0,0 +1,101 @@
+from sqlalchemy import select, func, case, or_
+from flask import current_app
+from models import db, Product, Category
+from services.offer_index import active_offer_index
+from services.product_service import ProductService
+from services.search_index import search_index, tokenize
+from utils.pagination import encode_cursor, decode_cursor
+
+class SearchService:
+    MAX_TERMS = 8
+    
+    @staticmethod
+    def _filter_clauses(category_id=None, min_price=None, max_price=None, in_stock=None,
+                        offer_id=None, on_offer=None):
+        clauses = ProductService.filter_clauses(category_id, min_price, max_price, in_stock)
+        if offer_id is not None:
+            clauses.append(Product.offer_id == offer_id)
+        if on_offer is not None:
+            active_ids = active_offer_index.active_offer_ids()
+            if on_offer:
+                clauses.append(Product.offer_id.in_(active_ids))
+            else:
+                clauses.append(or_(Product.offer_id.is_(None), Product.offer_id.not_in(active_ids)))
+        return clauses
+    
+    @staticmethod
+    def _facets(matches, clauses):
+        """Category, active-offer and price-range counts over the whole result set"""
+        def grouped(*columns):
+            return select(*columns, func.count(Product.id)).select_from(Product).join(
+                matches, matches.c.product_id == Product.id
+            ).where(*clauses)
+        
+        categories = db.session.execute(
+            grouped(Category.id, Category.name).join(Category, Category.id == Product.category_id)
+            .group_by(Category.id, Category.name).order_by(func.count(Product.id).desc(), Category.id)
+        ).all()
+        
+        active_ids = set(active_offer_index.active_offer_ids())
+        offers = db.session.execute(
+            grouped(Product.offer_id).where(Product.offer_id.is_not(None)).group_by(Product.offer_id)
+        ).all()
+        
+        edges = current_app.config['SEARCH_PRICE_BUCKETS']
+        bucket = case(
+            *((Product.price < edge, index) for index, edge in enumerate(edges)),
+            else_=len(edges)
+        ).label('bucket')
+        buckets = dict(db.session.execute(grouped(bucket).group_by(bucket)).all())
+        bounds = [0, *edges, None]
+        
+        return {
+            "categories": [{"id": cid, "name": name, "count": count} for cid, name, count in categories],
+            "offers": [{"id": oid, "count": count} for oid, count in offers if oid in active_ids],
+            "price": [
+                {"min": bounds[i], "max": bounds[i + 1], "count": buckets.get(i, 0)}
+                for i in range(len(edges) + 1)
+            ],
+        }
+    
+    @staticmethod
+    def search(q, cursor=None, limit=20, facets=True, **filters):
+        """
+        Ranked full-text search over product names and SKUs
+        Every word must match, as a prefix ("lap pro" finds "Laptop Pro 14").
+        Args:
+            q: Search text
+            cursor: Opaque cursor returned by the previous page
+            limit: Page size
+            facets: Include facet counts for the result set
+            **filters: category_id, min_price, max_price, in_stock, offer_id, on_offer
+        Returns:
+            dict: items (Products, best match first), next, total and facets
+        Raises:
+            ValueError: If the query has no words or the cursor is malformed
+        """
+        terms = tokenize(q)[:SearchService.MAX_TERMS]
+        if not terms:
+            raise ValueError("q must contain at least one word")
+        offset = decode_cursor(cursor) or 0
+        if offset < 0:
+            raise ValueError("Invalid cursor")
+        matches = search_index.ranked(terms)
+        clauses = SearchService._filter_clauses(**filters)
+        
+        stmt = ProductService.with_relations(select(Product)).join(
+            matches, matches.c.product_id == Product.id
+        ).where(*clauses).order_by(matches.c.rank, Product.id)
+        # Fetch one extra row to know whether another page exists
+        rows = db.session.execute(stmt.offset(offset).limit(limit + 1)).scalars().all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(offset + limit)
+        
+        result = {"items": rows, "next": next_cursor}
+        if facets:
+            result["facets"] = SearchService._facets(matches, clauses)
+            # Every product has exactly one category
+            result["total"] = sum(c["count"] for c in result["facets"]["categories"])
+        return result
@@ -0,0 +1,208 @@
+import mimetypes
+import os
+from flask import current_app, redirect, send_from_directory
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+
+
+class LocalStorage:
+    """Files under <root>/<folder>/<filename> on this node's disk, served by Flask"""
+    
+    def __init__(self, root, max_age):
+        self.root = root
+        self.max_age = max_age
+    
+    def path(self, folder, filename):
+        return os.path.join(self.root, folder, filename)
+    
+    def put_file(self, local_path, folder, filename, keep_local=False):
+        """Take ownership of local_path and store it under folder/filename (no-op if already stored)"""
+        dest = self.path(folder, filename)
+        if os.path.abspath(local_path) == os.path.abspath(dest):
+            return
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if os.path.exists(dest):
+            os.remove(local_path)
+        else:
+            os.replace(local_path, dest)
+    
+    def delete(self, folder, filename):
+        file_path = self.path(folder, filename)
+        if not os.path.exists(file_path):
+            return False
+        os.remove(file_path)
+        return True
+    
+    def exists(self, folder, filename):
+        return os.path.exists(self.path(folder, filename))
+    
+    def url(self, folder, filename):
+        return f"/static/{folder}/{filename}"
+    
+    def local_path(self, folder, filename):
+        """Readable local copy of a stored file (the file itself on local disk)"""
+        return self.path(folder, filename)
+    
+    def work_dir(self, folder):
+        """Where derived files are written before put_file (directly in place here)"""
+        work_dir = os.path.join(self.root, folder)
+        os.makedirs(work_dir, exist_ok=True)
+        return work_dir
+    
+    def release_local(self, folder, filename):
+        pass
+    
+    def serve(self, folder, filename):
+        """
+        Stored names are content hashes (or derived from one), so a name
+        never changes content and can be cached forever. Range requests are
+        handled by send_from_directory.
+        """
+        response = send_from_directory(
+            os.path.join(self.root, folder), filename,
+            etag=filename.rsplit('.', 1)[0], max_age=self.max_age
+        )
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+class S3Storage:
+    """
+    Files in an S3-compatible bucket (AWS S3, MinIO, moto, ...).
+    
+    Clients get either a public/CDN URL (S3_PUBLIC_BASE_URL) or a
+    /static/... URL that redirects to a short-lived presigned URL, so image
+    bytes never pass through the Flask workers. A local work directory
+    holds fresh uploads until the image pipeline has processed them.
+    """
+    
+    def __init__(self, bucket, work_root, max_age, endpoint_url=None, region=None,
+                 key_prefix='', public_base_url=None, presign_expires=3600, max_pool_connections=10):
+        if boto3 is None:
+            raise RuntimeError("The 'boto3' package is required for STORAGE_BACKEND='s3'")
+        self.bucket = bucket
+        self.work_root = work_root
+        self.max_age = max_age
+        self.key_prefix = key_prefix
+        self.public_base_url = public_base_url.rstrip('/') if public_base_url else None
+        self.presign_expires = presign_expires
+        # boto3 clients are thread-safe; one pooled client per process
+        self.client = boto3.client(
+            's3', endpoint_url=endpoint_url, region_name=region,
+            config=BotoConfig(max_pool_connections=max_pool_connections)
+        )
+    
+    def key(self, folder, filename):
+        return f"{self.key_prefix}{folder}/{filename}"
+    
+    def put_file(self, local_path, folder, filename, keep_local=False):
+        """
+        Upload local_path unless the object already exists. The local file is
+        dropped, or with keep_local moved into the work directory so the image
+        pipeline can read it without downloading it again.
+        """
+        if not self.exists(folder, filename):
+            content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            self.client.upload_file(local_path, self.bucket, self.key(folder, filename), ExtraArgs={
+                'ContentType': content_type,
+                'CacheControl': f"public, max-age={self.max_age}, immutable"
+            })
+        if keep_local:
+            os.replace(local_path, os.path.join(self.work_dir(folder), filename))
+        else:
+            os.remove(local_path)
+    
+    def delete(self, folder, filename):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(folder, filename))
+        return True
+    
+    def exists(self, folder, filename):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key(folder, filename))
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+    
+    def url(self, folder, filename):
+        if self.public_base_url:
+            return f"{self.public_base_url}/{self.key(folder, filename)}"
+        return f"/static/{folder}/{filename}"
+    
+    def presigned_url(self, folder, filename):
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self.key(folder, filename)},
+            ExpiresIn=self.presign_expires
+        )
+    
+    def local_path(self, folder, filename):
+        """Local copy of a stored object, downloaded into the work directory if needed"""
+        path = os.path.join(self.work_dir(folder), filename)
+        if not os.path.exists(path):
+            self.client.download_file(self.bucket, self.key(folder, filename), path)
+        return path
+    
+    def work_dir(self, folder):
+        work_dir = os.path.join(self.work_root, folder)
+        os.makedirs(work_dir, exist_ok=True)
+        return work_dir
+    
+    def release_local(self, folder, filename):
+        path = os.path.join(self.work_root, folder, filename)
+        if os.path.exists(path):
+            os.remove(path)
+    
+    def serve(self, folder, filename):
+        response = redirect(self.presigned_url(folder, filename), code=302)
+        # Let clients reuse the redirect for a while, but never past the signature's expiry
+        response.cache_control.max_age = max(0, self.presign_expires - 60)
+        return response
+
+
+class Storage:
+    """Flask extension exposing the configured storage backend as `storage`"""
+    
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.config.setdefault('STORAGE_BACKEND', 'local')
+        app.config.setdefault('STORAGE_LOCAL_ROOT', os.path.join(app.root_path, 'static'))
+        app.config.setdefault('UPLOAD_STAGING_DIR', os.path.join(app.config['STORAGE_LOCAL_ROOT'], '.incoming'))
+        app.config.setdefault('STATIC_IMAGE_MAX_AGE', 365 * 24 * 3600)
+        max_age = app.config['STATIC_IMAGE_MAX_AGE']
+        backend = app.config['STORAGE_BACKEND']
+        if backend == 'local':
+            app.extensions['storage'] = LocalStorage(app.config['STORAGE_LOCAL_ROOT'], max_age)
+        elif backend == 's3':
+            app.extensions['storage'] = S3Storage(
+                bucket=app.config['S3_BUCKET'],
+                work_root=app.config.get('STORAGE_WORK_DIR') or os.path.join(app.instance_path, 'image-work'),
+                max_age=max_age,
+                endpoint_url=app.config.get('S3_ENDPOINT_URL'),
+                region=app.config.get('S3_REGION'),
+                key_prefix=app.config.get('S3_KEY_PREFIX', ''),
+                public_base_url=app.config.get('S3_PUBLIC_BASE_URL'),
+                presign_expires=app.config.get('S3_PRESIGN_EXPIRES', 3600),
+                max_pool_connections=app.config.get('S3_MAX_POOL_CONNECTIONS', 10)
+            )
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    
+    @property
+    def backend(self):
+        return current_app.extensions['storage']
+    
+    def __getattr__(self, name):
+        return getattr(current_app.extensions['storage'], name)
+
+
+storage = Storage()
@@ -0,0 +1,83 @@
+import time
+from flask import current_app
+from models import User
+from utils.store import shared_store
+
+class UserClaimsCache:
+    """
+    Short-lived snapshot of the user fields JWT-protected routes need,
+    kept in the shared store so auth checks skip the database.
+    Call invalidate() whenever one of SNAPSHOT_FIELDS changes.
+    """
+    
+    SNAPSHOT_FIELDS = ('id', 'username', 'is_admin', 'profile_image', 'profile_image_variants')
+    
+    @staticmethod
+    def _key(user_id):
+        return f"user:{user_id}"
+    
+    @staticmethod
+    def get(user_id):
+        """
+        Get a user's snapshot, loading it from the database on a miss
+        Returns:
+            dict or None: Snapshot, or None if the user doesn't exist
+        """
+        key = UserClaimsCache._key(user_id)
+        snapshot = shared_store.get(key)
+        if snapshot is None:
+            user = User.query.get(user_id)
+            if not user:
+                return None
+            snapshot = {field: getattr(user, field) for field in UserClaimsCache.SNAPSHOT_FIELDS}
+            shared_store.set(key, snapshot, ttl=current_app.config['USER_CACHE_TTL'])
+        return snapshot
+    
+    @staticmethod
+    def get_user(user_id):
+        """Detached (transient) User built from the snapshot - read-only use, e.g. dumping"""
+        snapshot = UserClaimsCache.get(user_id)
+        return User(**snapshot) if snapshot else None
+    
+    @staticmethod
+    def invalidate(user_id):
+        shared_store.delete(UserClaimsCache._key(user_id))
+
+
+class TokenBlocklist:
+    """
+    Revoked JWTs. Single tokens are revoked by jti, kept in the shared store
+    until they would expire anyway. revoke_user() bumps the user's token
+    generation: every token carries the generation it was issued under
+    ('gen' claim, see claims()), and only the current one is accepted - so
+    a token issued right after a revocation is valid, whatever the clock says.
+    """
+    
+    @staticmethod
+    def _generation_key(user_id):
+        return f"token_gen:{user_id}"
+    
+    @staticmethod
+    def generation(user_id):
+        return shared_store.get(TokenBlocklist._generation_key(user_id)) or 0
+    
+    @staticmethod
+    def claims(user_id):
+        """Claims to add to every token issued to the user"""
+        return {"gen": TokenBlocklist.generation(user_id)}
+    
+    @staticmethod
+    def revoke_token(jwt_payload):
+        ttl = max(1, int(jwt_payload['exp'] - time.time()))
+        shared_store.set(f"revoked:{jwt_payload['jti']}", True, ttl=ttl)
+    
+    @staticmethod
+    def revoke_user(user_id):
+        # No TTL: a forgotten generation would accept revoked tokens again
+        shared_store.incr(TokenBlocklist._generation_key(user_id))
+    
+    @staticmethod
+    def is_revoked(jwt_payload):
+        if shared_store.get(f"revoked:{jwt_payload['jti']}"):
+            return True
+        return jwt_payload.get('gen', 0) != TokenBlocklist.generation(jwt_payload['sub'])
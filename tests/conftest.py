@@ -0,0 +1,54 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app(request, tmp_path, monkeypatch):
+    """
+    App on a fresh SQLite file (not :memory:, so threads share it), without
+    rate limits, storing files under tmp_path. Parametrize indirectly with a dict of extra environment
+    settings, e.g. {'CART_STORE_URL': 'memory://'} ('{tmp_path}' is filled in).
+    """
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv('BCRYPT_LOG_ROUNDS', '4')
+    monkeypatch.setenv('MAX_CONCURRENT_CHECKOUTS', '1024')
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path / 'profiles'))
+    monkeypatch.setenv('STORAGE_LOCAL_ROOT', str(tmp_path / 'static'))
+    monkeypatch.setenv('STORAGE_WORK_DIR', str(tmp_path / 'image-work'))
+    for name in ('AUTH', 'CART', 'IMAGES', 'PRODUCTS'):
+        monkeypatch.setenv(f'RATE_LIMIT_{name}', '')
+    for name, value in getattr(request, 'param', {}).items():
+        monkeypatch.setenv(name, value.format(tmp_path=tmp_path))
+    from app import create_app
+    from models import db
+    
+    app = create_app()
+    app.config['TESTING'] = True
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    # `db` outlives this app: forget bind keys (e.g. the replica) other apps don't configure
+    for key in [key for key in db.metadatas if key is not None]:
+        del db.metadatas[key]
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app):
+    """auth_headers(user_id) -> Authorization header for that user"""
+    from flask_jwt_extended import create_access_token
+    
+    def make(user_id, is_admin=False):
+        with app.app_context():
+            token = create_access_token(identity=str(user_id), additional_claims={'is_admin': is_admin})
+        return {'Authorization': f'Bearer {token}'}
+    return make
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+import pytest
+from models import db, Offer, Product
+
+
+@pytest.fixture
+def catalog(app):
+    """An active offer and six products: three in category 1 (one out of stock), three in category 2"""
+    with app.app_context():
+        now = datetime.utcnow()
+        offer = Offer(name='Sale', discount_percent=10, start_time=now - timedelta(days=1), end_time=now + timedelta(days=1))
+        db.session.add(offer)
+        products = [Product(name=f'p{i}', price=10.0 * (i + 1), stock=0 if i == 0 else 5, category_id=1 if i < 3 else 2)
+                    for i in range(6)]
+        db.session.add_all(products)
+        db.session.commit()
+        return offer.id, [product.id for product in products]
+
+
+def _offered(app, offer_id):
+    with app.app_context():
+        return sorted(db.session.scalars(db.select(Product.id).where(Product.offer_id == offer_id)))
+
+
+def test_apply_by_product_ids(app, client, auth_headers, catalog):
+    offer_id, ids = catalog
+    response = client.post(f'/api/offers/{offer_id}/products', headers=auth_headers(1, is_admin=True), json={'product_ids': ids[:2]})
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == 2
+    assert _offered(app, offer_id) == ids[:2]
+
+
+def test_apply_by_category_and_filter(app, client, auth_headers, catalog):
+    offer_id, ids = catalog
+    headers = auth_headers(1, is_admin=True)
+    response = client.post(f'/api/offers/{offer_id}/products', headers=headers, json={'category_id': 2})
+    assert response.get_json()['updated'] == 3
+    
+    response = client.post(f'/api/offers/{offer_id}/products', headers=headers,
+                           json={'filter': {'category_id': 1, 'in_stock': True, 'max_price': 20}})
+    assert response.get_json()['updated'] == 1
+    assert _offered(app, offer_id) == [ids[1]] + ids[3:]
+
+
+def test_remove_with_and_without_selector(app, client, auth_headers, catalog):
+    offer_id, ids = catalog
+    headers = auth_headers(1, is_admin=True)
+    client.post(f'/api/offers/{offer_id}/products', headers=headers, json={'product_ids': ids})
+    
+    response = client.delete(f'/api/offers/{offer_id}/products', headers=headers, json={'category_id': 1})
+    assert response.get_json()['updated'] == 3
+    assert _offered(app, offer_id) == ids[3:]
+    
+    response = client.delete(f'/api/offers/{offer_id}/products', headers=headers)
+    assert response.get_json()['updated'] == 3
+    assert _offered(app, offer_id) == []
+
+
+@pytest.mark.parametrize('selector', [
+    {'filter': {}},
+    {'product_ids': [True]},
+    {'category_id': True},
+    {'filter': {'category_id': False}},
+    {'filter': {'min_price': True}},
+    {'filter': {'color': 'red'}},
+    {'product_ids': [1], 'category_id': 1},
+    {},
+])
+def test_invalid_selectors_update_nothing(app, client, auth_headers, catalog, selector):
+    offer_id, ids = catalog
+    response = client.post(f'/api/offers/{offer_id}/products', headers=auth_headers(1, is_admin=True), json=selector)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert _offered(app, offer_id) == []
+
+
+def test_empty_filter_does_not_remove_every_product(app, client, auth_headers, catalog):
+    offer_id, ids = catalog
+    headers = auth_headers(1, is_admin=True)
+    client.post(f'/api/offers/{offer_id}/products', headers=headers, json={'product_ids': ids})
+    response = client.delete(f'/api/offers/{offer_id}/products', headers=headers, json={'filter': {}})
+    assert response.status_code == 400
+    assert _offered(app, offer_id) == ids
+
+
+def test_unknown_offer_and_non_admin(client, auth_headers, catalog):
+    offer_id, ids = catalog
+    response = client.post('/api/offers/999/products', headers=auth_headers(1, is_admin=True), json={'product_ids': ids})
+    assert response.status_code == 404
+    response = client.post(f'/api/offers/{offer_id}/products', headers=auth_headers(1), json={'product_ids': ids})
+    assert response.status_code == 403
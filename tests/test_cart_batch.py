@@ -0,0 +1,94 @@
+import pytest
+from models import db, Product
+
+STORES = pytest.mark.parametrize('app', [
+    {'CART_MAX_BATCH_ITEMS': '3'},
+    {'CART_MAX_BATCH_ITEMS': '3', 'CART_STORE_URL': 'memory://'},
+], indirect=True, ids=['database', 'cart-store'])
+
+
+def _create_products(app, *stocks):
+    with app.app_context():
+        products = [Product(name=f'p{i}', price=2.5, stock=stock, category_id=1) for i, stock in enumerate(stocks)]
+        db.session.add_all(products)
+        db.session.commit()
+        return [product.id for product in products]
+
+
+def _lines(body):
+    return {item['product_id']: item['quantity'] for item in body['items']}
+
+
+def _cart(client, headers):
+    return _lines(client.get('/api/cart', headers=headers).get_json())
+
+
+@STORES
+def test_patch_sets_merges_and_removes_lines(app, client, auth_headers):
+    a, b, c = _create_products(app, 10, 10, 10)
+    headers = auth_headers(1)
+    response = client.patch('/api/cart', headers=headers, json={'items': [
+        {'product_id': a, 'quantity': 2}, {'product_id': b, 'quantity': 1}
+    ]})
+    assert response.status_code == 200
+    assert _lines(response.get_json()) == {a: 2, b: 1}
+    assert response.get_json()['grand_total'] == 7.5
+    
+    response = client.patch('/api/cart', headers=headers, json={'mode': 'merge', 'items': [
+        {'product_id': a, 'quantity': 3}, {'product_id': c, 'quantity': 1}, {'product_id': c, 'quantity': 1}
+    ]})
+    assert _lines(response.get_json()) == {a: 5, b: 1, c: 2}
+    
+    response = client.patch('/api/cart', headers=headers, json={'items': [
+        {'product_id': b, 'quantity': 0}, {'product_id': c, 'quantity': 4}
+    ]})
+    assert _lines(response.get_json()) == {a: 5, c: 4}
+    assert _cart(client, headers) == {a: 5, c: 4}
+
+
+@STORES
+def test_put_replaces_the_cart(app, client, auth_headers):
+    a, b, c = _create_products(app, 10, 10, 10)
+    headers = auth_headers(1)
+    client.patch('/api/cart', headers=headers, json={'items': [
+        {'product_id': a, 'quantity': 2}, {'product_id': b, 'quantity': 1}
+    ]})
+    response = client.put('/api/cart', headers=headers, json={'items': [{'product_id': c, 'quantity': 3}]})
+    assert response.status_code == 200
+    assert _cart(client, headers) == {c: 3}
+    
+    assert client.put('/api/cart', headers=headers, json={'items': []}).status_code == 200
+    assert _cart(client, headers) == {}
+
+
+@STORES
+def test_rejected_batches_leave_the_cart_alone(app, client, auth_headers):
+    a, b = _create_products(app, 10, 2)
+    headers = auth_headers(1)
+    client.patch('/api/cart', headers=headers, json={'items': [{'product_id': a, 'quantity': 1}]})
+    
+    def patch(items, **extra):
+        return client.patch('/api/cart', headers=headers, json={'items': items, **extra})
+    
+    response = patch([{'product_id': a, 'quantity': 5}, {'product_id': 999, 'quantity': 1}])
+    assert (response.status_code, response.get_json()) == (400, {'error': 'Product 999 not found'})
+    
+    response = patch([{'product_id': a, 'quantity': 5}, {'product_id': b, 'quantity': 3}])
+    assert (response.status_code, response.get_json()) == (400, {'error': 'Only 2 of p1 available'})
+    
+    # Merged quantities are checked against stock too
+    patch([{'product_id': b, 'quantity': 2}])
+    response = patch([{'product_id': b, 'quantity': 1}], mode='merge')
+    assert response.status_code == 400
+    
+    response = patch([{'product_id': a + i, 'quantity': 1} for i in range(4)])
+    assert (response.status_code, response.get_json()) == (400, {'error': 'At most 3 items per request'})
+    
+    response = patch([{'product_id': a, 'quantity': 1}, {'product_id': a, 'quantity': 2}])
+    assert response.status_code == 400
+    assert 'items' in response.get_json()
+    
+    assert _cart(client, headers) == {a: 1, b: 2}
+    
+    # Removing a product that no longer exists is allowed
+    assert patch([{'product_id': 999, 'quantity': 0}]).status_code == 200
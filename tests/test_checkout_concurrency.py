@@ -0,0 +1,81 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from sqlalchemy import func
+from models import db, User, Product, CartItem, Order, OrderItem
+
+# Carts in the database, and in the key/value cart store
+CART_BACKENDS = pytest.mark.parametrize('app', [{}, {'CART_STORE_URL': 'memory://'}],
+                                        indirect=True, ids=['database', 'cart-store'])
+
+
+def _create_users(app, count):
+    with app.app_context():
+        users = [User(username=f'shopper{i}', password='x') for i in range(count)]
+        db.session.add_all(users)
+        db.session.commit()
+        return [user.id for user in users]
+
+
+def _create_product(app, stock, name='Widget'):
+    with app.app_context():
+        product = Product(name=name, price=10.0, stock=stock, category_id=1)
+        db.session.add(product)
+        db.session.commit()
+        return product.id
+
+
+def _fill_cart(app, user_id, lines):
+    with app.app_context():
+        db.session.add_all([CartItem(user_id=user_id, product_id=pid, quantity=qty) for pid, qty in lines.items()])
+        db.session.commit()
+
+
+def _checkout_all(app, headers, threads):
+    """POST /api/checkout once per header set, all released at the same moment"""
+    start = threading.Event()
+    
+    def checkout(h):
+        client = app.test_client()
+        start.wait()
+        return client.post('/api/checkout', headers=h).status_code
+    
+    with ThreadPoolExecutor(threads) as pool:
+        futures = [pool.submit(checkout, h) for h in headers]
+        start.set()
+        return [future.result() for future in futures]
+
+
+@CART_BACKENDS
+def test_parallel_checkouts_of_one_cart_create_one_order(app, auth_headers):
+    [user_id] = _create_users(app, 1)
+    products = [_create_product(app, stock=100, name=f'p{i}') for i in range(3)]
+    _fill_cart(app, user_id, {pid: 1 for pid in products})
+    
+    statuses = _checkout_all(app, [auth_headers(user_id)] * 10, threads=10)
+    
+    assert statuses.count(200) == 1
+    assert statuses.count(400) == 9
+    with app.app_context():
+        assert Order.query.count() == 1
+        assert db.session.query(func.sum(OrderItem.quantity)).scalar() == 3
+        assert [p.stock for p in Product.query.filter(Product.id.in_(products))] == [99, 99, 99]
+        assert CartItem.query.count() == 0
+
+
+@CART_BACKENDS
+def test_parallel_checkouts_never_oversell(app, auth_headers):
+    stock = 50
+    product_id = _create_product(app, stock=stock)
+    user_ids = _create_users(app, 200)
+    for user_id in user_ids:
+        _fill_cart(app, user_id, {product_id: 1})
+    
+    statuses = _checkout_all(app, [auth_headers(uid) for uid in user_ids], threads=32)
+    
+    assert statuses.count(200) == stock
+    assert statuses.count(400) == len(user_ids) - stock
+    with app.app_context():
+        assert db.session.get(Product, product_id).stock == 0
+        assert Order.query.count() == stock
+        assert db.session.query(func.sum(OrderItem.quantity)).scalar() == stock
@@ -0,0 +1,14 @@
+import logging
+from services.file_service import FileService
+
+
+def test_failed_delete_is_logged(app, monkeypatch, caplog):
+    def broken(folder, filename):
+        raise OSError("disk on fire")
+    
+    with app.app_context():
+        monkeypatch.setattr(app.extensions['storage'], 'delete', broken)
+        with caplog.at_level(logging.ERROR, logger='services.file_service'):
+            assert FileService.delete_image('a.png', 'products') is False
+    assert "Error deleting file products/a.png" in caplog.text
+    assert "disk on fire" in caplog.text
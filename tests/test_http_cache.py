@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+from models import db, Product, CartItem, User
+from utils.response_cache import response_cache
+
+
+class AnHourLater(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return datetime.now(tz) + timedelta(hours=1)
+
+
+def test_checkouts_keep_catalog_caches_and_show_stock_within_the_window(app, client, auth_headers, monkeypatch):
+    app.config['CATALOG_STOCK_STALENESS'] = 3600
+    with app.app_context():
+        users = [User(username=f'shopper{i}', password='x') for i in range(2)]
+        product = Product(name='Widget', price=10.0, stock=5, category_id=1)
+        db.session.add_all([*users, product])
+        db.session.commit()
+        db.session.add_all([CartItem(user_id=u.id, product_id=product.id, quantity=2) for u in users])
+        db.session.commit()
+        user_ids, product_id = [u.id for u in users], product.id
+    
+    # The first stock change of a window may change the ETag; later ones in it don't
+    assert client.post('/api/checkout', headers=auth_headers(user_ids[0])).status_code == 200
+    etag = client.get('/api/products').headers['ETag']
+    assert client.post('/api/checkout', headers=auth_headers(user_ids[1])).status_code == 200
+    assert client.get('/api/products', headers={'If-None-Match': etag}).status_code == 304
+    with app.app_context():
+        assert len(response_cache.backend) == 1
+    
+    # Once the window holding the checkout is over, the new stock is served
+    monkeypatch.setattr('utils.http_cache.datetime', AnHourLater)
+    refreshed = client.get('/api/products', headers={'If-None-Match': etag})
+    assert refreshed.status_code == 200
+    [item] = [p for p in refreshed.get_json()['items'] if p['id'] == product_id]
+    assert item['stock'] == 1
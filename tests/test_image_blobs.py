@@ -0,0 +1,75 @@
+import io
+import pytest
+from PIL import Image
+from models import db, Product, ImageBlob
+from services.image_service import ImageService
+from services.storage import storage
+
+SYNC_IMAGES = pytest.mark.parametrize('app', [{'IMAGE_EXECUTOR': 'sync'}], indirect=True)
+
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _create_products(app, count):
+    with app.app_context():
+        products = [Product(name=f'p{i}', price=1.0, stock=1, category_id=1) for i in range(count)]
+        db.session.add_all(products)
+        db.session.commit()
+        return [product.id for product in products]
+
+
+def _upload(client, headers, product_id, data):
+    response = client.post(f'/api/products/{product_id}/image', headers=headers,
+                           data={'image': (io.BytesIO(data), 'photo.png')}, content_type='multipart/form-data')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['product']
+
+
+def _stored(app, product_id):
+    with app.app_context():
+        filename = db.session.get(Product, product_id).image
+        blob = db.session.get(ImageBlob, ('products', filename))
+        return filename, blob.ref_count if blob else None, storage.exists('products', filename)
+
+
+@SYNC_IMAGES
+def test_shared_image_is_deleted_with_its_last_reference(app, client, auth_headers):
+    first, second = _create_products(app, 2)
+    headers = auth_headers(1)
+    data = _png()
+    _upload(client, headers, first, data)
+    _upload(client, headers, second, data)
+    filename, refs, exists = _stored(app, first)
+    assert (refs, exists) == (2, True)
+    
+    assert client.delete(f'/api/products/{first}/image', headers=headers).status_code == 200
+    assert _stored(app, second) == (filename, 1, True)
+    
+    assert client.delete(f'/api/products/{second}/image', headers=headers).status_code == 200
+    with app.app_context():
+        assert db.session.get(ImageBlob, ('products', filename)) is None
+        assert not storage.exists('products', filename)
+
+
+@SYNC_IMAGES
+def test_upload_between_release_and_purge_keeps_the_files(app, client, auth_headers, monkeypatch):
+    first, second = _create_products(app, 2)
+    headers = auth_headers(1)
+    data = _png()
+    _upload(client, headers, first, data)
+    purge = ImageService._purge_blob
+    
+    def upload_then_purge(folder, filename):
+        # The release is committed (ref_count 0) and the same bytes come in again
+        _upload(app.test_client(), headers, second, data)
+        purge(folder, filename)
+    monkeypatch.setattr(ImageService, '_purge_blob', staticmethod(upload_then_purge))
+    
+    assert client.delete(f'/api/products/{first}/image', headers=headers).status_code == 200
+    filename, refs, exists = _stored(app, second)
+    assert (refs, exists) == (1, True)
+    assert client.get(f'/static/products/{filename}').status_code == 200
@@ -0,0 +1,27 @@
+from PIL import Image
+from services.image_processing import process_image, supported_formats
+
+SIZES = {'thumb': 16}
+
+
+def _process(tmp_path, img, name='a.png'):
+    path = tmp_path / name
+    img.save(path, format='PNG', icc_profile=b'not really a profile', exif=Image.Exif())
+    variants = process_image(str(path), str(tmp_path), SIZES, 2048, 40_000_000, supported_formats())
+    return {key: Image.open(tmp_path / filename) for key, filename in variants.items()}
+
+
+def test_variants_drop_the_icc_profile(tmp_path):
+    variants = _process(tmp_path, Image.new('RGB', (32, 32), 'red'))
+    assert 'original' in variants and len(variants) == 1 + len(supported_formats())
+    for key, img in variants.items():
+        assert 'icc_profile' not in img.info, key
+        assert 'exif' not in img.info, key
+
+
+def test_palette_transparency_survives(tmp_path):
+    img = Image.new('P', (32, 32), 0)
+    img.putpalette([255, 0, 0, 0, 255, 0])
+    img.info['transparency'] = 0
+    variants = _process(tmp_path, img)
+    assert variants['original'].info.get('transparency') == 0
@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+from models import db, User
+
+
+def _create_user(app, is_admin):
+    with app.app_context():
+        user = User(username='ops' if is_admin else 'shopper', password='x', is_admin=is_admin)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def test_metrics_require_an_admin(app, client, auth_headers):
+    admin_id = _create_user(app, is_admin=True)
+    user_id = _create_user(app, is_admin=False)
+    
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers=auth_headers(user_id)).status_code == 403
+    response = client.get('/metrics', headers=auth_headers(admin_id, is_admin=True))
+    assert response.status_code == 200
+    assert b'http_requests_total' in response.data
+
+
+@pytest.mark.parametrize('app', [{'METRICS_TOKEN': 's3cret'}], indirect=True)
+def test_metrics_accept_the_configured_token(app, client):
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+
+
+@pytest.mark.parametrize('app', [{'SLOW_QUERY_MS': '1'}], indirect=True)
+def test_failed_statements_leave_no_timing_behind(app):
+    with app.app_context(), db.engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.exec_driver_sql('SELECT * FROM no_such_table')
+        assert conn.info['query_started'] == []
+        assert conn.info['slow_query_started'] == []
@@ -0,0 +1,60 @@
+import threading
+import pytest
+from models import db, User
+from services.auth_service import bcrypt, password_pool, AuthService
+
+ONE_SLOT = pytest.mark.parametrize('app', [{'BCRYPT_WORKERS': '1', 'BCRYPT_MAX_PENDING': '1'}], indirect=True)
+CREDENTIALS = {'username': 'shopper', 'password': 'secret1'}
+
+
+def _stored_cost(app):
+    with app.app_context():
+        user = User.query.filter_by(username=CREDENTIALS['username']).one()
+        return AuthService.password_cost(user.password)
+
+
+@ONE_SLOT
+def test_saturated_pool_rejects_logins_with_503(app, client, auth_headers, monkeypatch):
+    assert client.post('/api/register', json=CREDENTIALS).status_code == 201
+    started, release = threading.Event(), threading.Event()
+    check = bcrypt.check_password_hash
+    
+    def slow_check(*args):
+        started.set()
+        release.wait(10)
+        return check(*args)
+    monkeypatch.setattr(bcrypt, 'check_password_hash', slow_check)
+    
+    rejected = password_pool.rejected
+    results = []
+    worker = threading.Thread(target=lambda: results.append(
+        app.test_client().post('/api/login', json=CREDENTIALS).status_code))
+    worker.start()
+    try:
+        assert started.wait(10)
+        response = client.post('/api/login', json=CREDENTIALS)
+        assert response.status_code == 503
+        assert response.headers['Retry-After']
+    finally:
+        release.set()
+        worker.join(10)
+    assert results == [200]
+    
+    stats = client.get('/api/auth/pool-stats', headers=auth_headers(1, is_admin=True)).get_json()
+    assert stats['workers'] == 1
+    assert stats['max_pending'] == 1
+    assert stats['rejected'] == rejected + 1
+    assert stats['in_flight'] == stats['queued'] == 0
+
+
+def test_login_rehashes_when_the_cost_changes(app, client):
+    assert client.post('/api/register', json=CREDENTIALS).status_code == 201
+    assert _stored_cost(app) == 4
+    
+    app.config['BCRYPT_LOG_ROUNDS'] = 5
+    assert client.post('/api/login', json={**CREDENTIALS, 'password': 'wrong-one'}).status_code == 401
+    assert _stored_cost(app) == 4
+    
+    assert client.post('/api/login', json=CREDENTIALS).status_code == 200
+    assert _stored_cost(app) == 5
+    assert client.post('/api/login', json=CREDENTIALS).status_code == 200
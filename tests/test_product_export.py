@@ -0,0 +1,72 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+from models import db, Offer, Product
+
+SMALL_BATCHES = pytest.mark.parametrize('app', [{'EXPORT_BATCH_SIZE': '2'}], indirect=True)
+
+
+def _create_products(app, count):
+    with app.app_context():
+        now = datetime.utcnow()
+        offer = Offer(name='Sale', discount_percent=10, start_time=now - timedelta(days=1), end_time=now + timedelta(days=1))
+        db.session.add(offer)
+        db.session.flush()
+        products = [Product(name=f'p{i}', price=10.0, stock=1, category_id=1, offer_id=offer.id if i == 0 else None)
+                    for i in range(count)]
+        db.session.add_all(products)
+        db.session.commit()
+        return [product.id for product in products]
+
+
+@SMALL_BATCHES
+def test_ndjson_is_streamed_one_batch_per_chunk(app, client):
+    ids = _create_products(app, 5)
+    response = client.get('/api/products/export')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    chunks = list(response.response)
+    assert len(chunks) == 3  # Batches of 2, 2 and 1
+    
+    items = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+    assert [item['id'] for item in items] == ids
+    assert items[0]['current_price'] == 9.0
+    assert items[1]['current_price'] == 10.0
+    assert 'image_url' in items[0]
+
+
+@SMALL_BATCHES
+def test_json_array_matches_ndjson(app, client):
+    _create_products(app, 5)
+    ndjson = [json.loads(line) for line in client.get('/api/products/export').get_data(as_text=True).splitlines()]
+    response = client.get('/api/products/export?format=json')
+    assert response.mimetype == 'application/json'
+    assert response.get_json() == ndjson
+
+
+def test_empty_catalog(client):
+    assert client.get('/api/products/export?format=json').get_json() == []
+    assert client.get('/api/products/export?format=ndjson').get_data() == b''
+
+
+@pytest.mark.parametrize('accept, query, mimetype', [
+    (None, '', 'application/x-ndjson'),
+    ('*/*', '', 'application/x-ndjson'),
+    ('application/json', '', 'application/json'),
+    ('application/x-ndjson', '', 'application/x-ndjson'),
+    ('text/html,application/json;q=0.9', '', 'application/json'),
+    ('application/json', '?format=ndjson', 'application/x-ndjson'),
+    ('application/x-ndjson', '?format=json', 'application/json'),
+])
+def test_format_negotiation(client, accept, query, mimetype):
+    headers = {'Accept': accept} if accept else {}
+    response = client.get(f'/api/products/export{query}', headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == mimetype
+
+
+def test_unknown_format_is_a_400(client):
+    response = client.get('/api/products/export?format=xml')
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "format must be ndjson or json"}
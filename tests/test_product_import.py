@@ -0,0 +1,88 @@
+import json
+import pytest
+from models import Product
+from services import ProductImportService
+from utils.http_cache import catalog_version
+
+
+def test_failed_import_still_invalidates_committed_chunks(app):
+    def rows():
+        yield {'sku': 'A-1', 'name': 'Alpha', 'price': 5, 'stock': 1, 'category_id': 1}
+        raise RuntimeError("Upload stream broke")
+    
+    with app.app_context():
+        before = catalog_version()
+        with pytest.raises(RuntimeError):
+            ProductImportService.import_rows(rows(), chunk_size=1)
+        assert catalog_version() == before + 1
+
+
+def _row(sku, **fields):
+    return dict({'sku': sku, 'name': f'Item {sku}', 'price': 5, 'stock': 1, 'category_id': 1}, **fields)
+
+
+def _products(app):
+    with app.app_context():
+        return {p.sku: (p.name, p.price, p.stock, p.category_id, p.offer_id) for p in Product.query.order_by(Product.sku)}
+
+
+def test_rows_are_inserted_or_updated_by_sku(app):
+    with app.app_context():
+        first = ProductImportService.import_rows([_row('A-1'), _row('B-2')])
+        second = ProductImportService.import_rows([
+            _row('A-1', price=7.5, stock=3),
+            _row('C-3'),
+            _row('C-3', name='Last one wins'),
+        ])
+    assert (first['inserted'], first['updated']) == (2, 0)
+    assert (second['processed'], second['inserted'], second['updated'], second['errors']) == (3, 1, 1, [])
+    assert _products(app) == {
+        'A-1': ('Item A-1', 7.5, 3, 1, None),
+        'B-2': ('Item B-2', 5.0, 1, 1, None),
+        'C-3': ('Last one wins', 5.0, 1, 1, None),
+    }
+
+
+def test_missing_categories_and_offers_are_rejected(app):
+    with app.app_context():
+        report = ProductImportService.import_rows([
+            _row('A-1', category_id=999),
+            _row('B-2', offer_id=999),
+            _row('C-3'),
+        ])
+    assert report['inserted'] == 1
+    assert report['errors'] == [
+        {"row": 1, "sku": 'A-1', "errors": {"category_id": ["Category 999 does not exist"]}},
+        {"row": 2, "sku": 'B-2', "errors": {"offer_id": ["Offer 999 does not exist"]}},
+    ]
+    assert list(_products(app)) == ['C-3']
+
+
+def test_error_report_names_each_bad_row(app):
+    with app.app_context():
+        report = ProductImportService.import_rows([
+            _row('A-1'),
+            _row('B-2', price=-1),
+            {'name': 'No SKU', 'price': 5, 'stock': 1, 'category_id': 1},
+            ['not', 'an', 'object'],
+            _row('E-5', stock='many'),
+            _row('F-6'),
+        ], chunk_size=4)
+    assert (report['processed'], report['inserted'], report['updated']) == (6, 2, 0)
+    errors = {error['row']: error for error in report['errors']}
+    assert sorted(errors) == [2, 3, 4, 5]
+    assert errors[2]['sku'] == 'B-2' and list(errors[2]['errors']) == ['price']
+    assert errors[3] == {"row": 3, "sku": None, "errors": {"sku": ["Missing data for required field."]}}
+    assert errors[4] == {"row": 4, "sku": None, "errors": {"_schema": ["Row must be an object"]}}
+    assert errors[5]['sku'] == 'E-5' and list(errors[5]['errors']) == ['stock']
+    assert list(_products(app)) == ['A-1', 'F-6']
+
+
+def test_ndjson_upload_reports_bad_lines(client, auth_headers):
+    body = '\n'.join([json.dumps(_row('A-1')), '{broken', json.dumps(_row('B-2'))])
+    response = client.post('/api/products/import', data=body, content_type='application/x-ndjson',
+                           headers=auth_headers(1, is_admin=True))
+    assert response.status_code == 200
+    report = response.get_json()
+    assert (report['processed'], report['inserted']) == (3, 2)
+    assert report['errors'] == [{"row": 2, "sku": None, "errors": {"_schema": ["Invalid JSON"]}}]
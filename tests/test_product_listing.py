@@ -0,0 +1,54 @@
+import pytest
+from models import db, Product
+
+# No response cache, so every request really queries
+UNCACHED = {'RESPONSE_CACHE_URL': 'none://'}
+
+
+def _create_products(app, count):
+    with app.app_context():
+        products = [Product(name=f'p{i}', price=10.0 + i, stock=i % 2, category_id=1 + i % 3) for i in range(count)]
+        db.session.add_all(products)
+        db.session.commit()
+        return [product.id for product in products]
+
+
+@pytest.mark.parametrize('app', [UNCACHED], indirect=True)
+def test_cursor_walks_every_product_once(app, client):
+    ids = _create_products(app, 7)
+    seen, cursor, pages = [], None, 0
+    while True:
+        response = client.get('/api/products', query_string={'limit': 3, 'cursor': cursor} if cursor else {'limit': 3})
+        assert response.status_code == 200
+        body = response.get_json()
+        seen += [item['id'] for item in body['items']]
+        pages += 1
+        cursor = body['next']
+        if cursor is None:
+            break
+    assert seen == ids
+    assert pages == 3
+
+
+@pytest.mark.parametrize('app', [UNCACHED], indirect=True)
+def test_cursor_pages_keep_filters(app, client):
+    ids = _create_products(app, 9)
+    first = client.get('/api/products?limit=2&category_id=1').get_json()
+    second = client.get(f"/api/products?limit=2&category_id=1&cursor={first['next']}").get_json()
+    assert [item['id'] for item in first['items'] + second['items']] == ids[0::3]
+    assert second['next'] is None
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor!', 'YWJj', '%%%'])
+def test_invalid_cursor_is_a_400(client, cursor):
+    response = client.get('/api/products', query_string={'cursor': cursor})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid cursor"}
+
+
+@pytest.mark.parametrize('app', [dict(UNCACHED, PRODUCTS_PAGE_SIZE='2', PRODUCTS_MAX_PAGE_SIZE='4')], indirect=True)
+def test_page_size_is_capped(app, client):
+    _create_products(app, 6)
+    assert len(client.get('/api/products').get_json()['items']) == 2
+    assert len(client.get('/api/products?limit=100').get_json()['items']) == 4
+    assert len(client.get('/api/products?limit=0').get_json()['items']) == 1
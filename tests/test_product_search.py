@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import update
+from models import db, Offer, Product
+from services import ProductImportService, SearchService
+from services.offer_index import active_offer_index
+from utils.pagination import encode_cursor
+
+BACKENDS = pytest.mark.parametrize('app', [{'SEARCH_BACKEND': 'fts5'}, {'SEARCH_BACKEND': 'memory'}],
+                                   indirect=True, ids=['fts5', 'memory'])
+
+
+def _create_products(app, *specs):
+    """specs: (name, price, category_id, on_offer) -> product ids, in order"""
+    with app.app_context():
+        now = datetime.utcnow()
+        active = Offer(name='Sale', discount_percent=10, start_time=now - timedelta(days=1), end_time=now + timedelta(days=1))
+        expired = Offer(name='Old', discount_percent=10, start_time=now - timedelta(days=9), end_time=now - timedelta(days=1))
+        db.session.add_all([active, expired])
+        db.session.flush()
+        products = [
+            Product(name=name, sku=f'SKU-{i}', price=price, stock=1, category_id=category_id,
+                    offer_id={True: active.id, False: expired.id}.get(on_offer))
+            for i, (name, price, category_id, on_offer) in enumerate(specs)
+        ]
+        db.session.add_all(products)
+        db.session.commit()
+        active_offer_index.invalidate()  # As OfferService does after writing offers
+        return [product.id for product in products], active.id
+
+
+def _search(app, q, **filters):
+    with app.app_context():
+        result = SearchService.search(q, **filters)
+        return [product.name for product in result['items']]
+
+
+@BACKENDS
+def test_every_word_must_match_best_match_first(app, client):
+    _create_products(app,
+                     ('Cables and adapters kit for travel', 10, 1, None),
+                     ('Cable cable', 10, 1, None),
+                     ('Laptop Pro 14', 900, 2, None),
+                     ('Laptop Stand', 40, 2, None))
+    response = client.get('/api/products/search?q=cable')
+    assert response.status_code == 200
+    assert [item['name'] for item in response.get_json()['items']] == ['Cable cable', 'Cables and adapters kit for travel']
+    assert _search(app, 'lap pro') == ['Laptop Pro 14']
+    assert _search(app, 'SKU-3') == ['Laptop Stand']
+    assert client.get('/api/products/search?q=%20').status_code == 400
+
+
+@BACKENDS
+def test_facets_count_the_whole_filtered_result(app, client):
+    _, offer_id = _create_products(app,
+                                   ('Desk lamp', 20, 1, True),
+                                   ('Floor lamp', 120, 1, False),
+                                   ('Lamp shade', 30, 2, True),
+                                   ('Lamp bulb', 5, 2, None),
+                                   ('Chair', 60, 1, True))
+    body = client.get('/api/products/search?q=lamp&limit=1').get_json()
+    assert len(body['items']) == 1 and body['next']
+    assert body['total'] == 4
+    facets = body['facets']
+    assert {(c['id'], c['count']) for c in facets['categories']} == {(1, 2), (2, 2)}
+    assert facets['offers'] == [{'id': offer_id, 'count': 2}]  # The expired offer is left out
+    assert [bucket['count'] for bucket in facets['price']] == [2, 1, 0, 1, 0, 0]
+    
+    body = client.get('/api/products/search?q=lamp&category_id=2&on_offer=true').get_json()
+    assert [item['name'] for item in body['items']] == ['Lamp shade']
+    assert body['total'] == 1
+    assert 'facets' not in client.get('/api/products/search?q=lamp&facets=false').get_json()
+
+
+@BACKENDS
+def test_cursor_pages_through_results(app, client):
+    _create_products(app, *((f'Mug {i}', 10, 1, None) for i in range(5)))
+    names, cursor = [], None
+    while True:
+        url = '/api/products/search?q=mug&limit=2&facets=false' + (f'&cursor={cursor}' if cursor else '')
+        body = client.get(url).get_json()
+        names += [item['name'] for item in body['items']]
+        cursor = body['next']
+        if not cursor:
+            break
+    assert sorted(names) == [f'Mug {i}' for i in range(5)]
+    
+    for bad in ('not-a-cursor', encode_cursor(-1)):
+        response = client.get(f'/api/products/search?q=mug&cursor={bad}')
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Invalid cursor'}
+
+
+@BACKENDS
+def test_renamed_products_are_found_by_their_new_name(app):
+    _create_products(app, ('Old kettle', 25, 1, None), ('Teapot', 15, 1, None))
+    assert _search(app, 'kettle') == ['Old kettle']
+    with app.app_context():
+        report = ProductImportService.import_rows([
+            {'sku': 'SKU-0', 'name': 'Electric boiler', 'price': 25, 'stock': 1, 'category_id': 1}
+        ])
+    assert report['updated'] == 1
+    assert _search(app, 'kettle') == []
+    assert _search(app, 'boiler') == ['Electric boiler']
+
+
+@pytest.mark.parametrize('app', [{'SEARCH_BACKEND': 'fts5'}], indirect=True)
+def test_fts5_triggers_follow_direct_writes(app):
+    ids, _ = _create_products(app, ('Green tea', 5, 1, None), ('Black tea', 5, 1, None))
+    with app.app_context():
+        db.session.execute(update(Product).where(Product.id == ids[0]).values(name='Green coffee'))
+        db.session.delete(db.session.get(Product, ids[1]))
+        db.session.commit()
+    assert _search(app, 'tea') == []
+    assert _search(app, 'coffee') == ['Green coffee']
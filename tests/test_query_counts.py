@@ -0,0 +1,71 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from models import db, Category, Offer, Product, CartItem, User
+
+# No response cache, so every request really queries
+UNCACHED = pytest.mark.parametrize('app', [{'RESPONSE_CACHE_URL': 'none://'}], indirect=True)
+
+
+@contextmanager
+def count_queries(app):
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def _add_products(app, count, user_id=None):
+    """Products spread over categories, half of them on an offer (and in the user's cart)"""
+    with app.app_context():
+        now = datetime.utcnow()
+        offer = Offer(name='Sale', discount_percent=10, start_time=now - timedelta(days=1), end_time=now + timedelta(days=1))
+        db.session.add(offer)
+        db.session.flush()
+        category_ids = [c.id for c in Category.query.all()]
+        products = [
+            Product(name=f'p{i}', price=10.0 + i, stock=5, category_id=category_ids[i % len(category_ids)],
+                    offer_id=offer.id if i % 2 else None)
+            for i in range(count)
+        ]
+        db.session.add_all(products)
+        db.session.flush()
+        if user_id is not None:
+            db.session.add_all([CartItem(user_id=user_id, product_id=p.id, quantity=1) for p in products])
+        db.session.commit()
+
+
+def _queries(app, client, path, headers=None):
+    with count_queries(app) as statements:
+        response = client.get(path, headers=headers or {})
+    assert response.status_code == 200
+    return len(statements)
+
+
+@UNCACHED
+@pytest.mark.parametrize('path, expected', [
+    ('/api/products?limit=50', 1),  # Products with category and offer joined
+    ('/api/categories', 1),         # Categories with a grouped product count
+    ('/api/cart', 1),               # Cart lines with product, category and offer joined
+])
+def test_query_count_does_not_grow_with_rows(app, client, auth_headers, path, expected):
+    with app.app_context():
+        user = User(username='shopper', password='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    headers = auth_headers(user_id)
+    
+    _add_products(app, 5, user_id)
+    client.get(path, headers=headers)  # Warm the active offer index
+    assert _queries(app, client, path, headers) == expected
+    _add_products(app, 40, user_id)
+    assert _queries(app, client, path, headers) == expected
@@ -0,0 +1,42 @@
+import pytest
+
+BEHIND_ONE_PROXY = pytest.mark.parametrize('app', [{'TRUSTED_PROXY_COUNT': '1', 'RATE_LIMIT_AUTH': '2/minute'}],
+                                           indirect=True)
+
+
+def _login_statuses(client, forwarded_for, attempts):
+    return [
+        client.post('/api/login', json={'username': 'nobody', 'password': 'x'},
+                    headers={'X-Forwarded-For': forwarded_for}).status_code
+        for _ in range(attempts)
+    ]
+
+
+@BEHIND_ONE_PROXY
+def test_anonymous_clients_behind_a_proxy_get_their_own_bucket(client):
+    assert _login_statuses(client, '203.0.113.1', 3) == [401, 401, 429]
+    assert _login_statuses(client, '203.0.113.2', 2) == [401, 401]
+
+
+@pytest.mark.parametrize('app', [{'RATE_LIMIT_AUTH': '2/minute'}], indirect=True)
+def test_limits_belong_to_their_app(app, client, monkeypatch):
+    from app import create_app
+    monkeypatch.setenv('RATE_LIMIT_AUTH', '')
+    other = create_app()
+    assert other.extensions['rate_limiter']['limits'] == {}
+    assert app.extensions['rate_limiter']['limits']['auth'] == (2, 2 / 60)
+    assert _login_statuses(client, '203.0.113.1', 3) == [401, 401, 429]
+    assert _login_statuses(other.test_client(), '203.0.113.1', 3) == [401, 401, 401]
+
+
+@pytest.mark.parametrize('app', [{'RATE_LIMIT_PRODUCTS': '10/minute'}], indirect=True)
+def test_limited_write_looks_the_user_up_once(app, client, auth_headers, monkeypatch):
+    from services.token_service import UserClaimsCache
+    calls = []
+    get_user = UserClaimsCache.get_user
+    monkeypatch.setattr(UserClaimsCache, 'get_user', staticmethod(lambda user_id: calls.append(user_id) or get_user(user_id)))
+    headers = auth_headers(1, is_admin=True)
+    for _ in range(2):
+        response = client.post('/api/offers/999/products', headers=headers, json={'product_ids': [1]})
+        assert response.status_code == 404
+    assert calls == ['1', '1']
@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+import pytest
+from flask import g
+from models import db
+from services.offer_index import active_offer_index
+from utils.db_engine import REPLICA_BIND
+
+LAGGING_REPLICA = pytest.mark.parametrize('app', [{
+    'REPLICA_DATABASE_URL': 'sqlite:///{tmp_path}/replica.db',
+    'REPLICA_LAG_GRACE': '0',
+}], indirect=True)
+
+
+@LAGGING_REPLICA
+def test_offer_index_is_rebuilt_from_the_primary(app, client):
+    with app.app_context():
+        # Same schema, none of the rows: a replica that hasn't caught up
+        db.metadata.create_all(bind=db.engines[REPLICA_BIND])
+    admin = client.post('/api/login', json={'username': 'admin', 'password': 'admin123'}).get_json()
+    now = datetime.utcnow()
+    response = client.post('/api/offers', headers={'Authorization': f"Bearer {admin['access_token']}"}, json={
+        'name': 'Sale', 'discount_percent': 10,
+        'start_time': (now - timedelta(days=1)).isoformat(), 'end_time': (now + timedelta(days=1)).isoformat(),
+    })
+    assert response.status_code == 201
+    
+    with app.test_request_context('/api/offers/active'):
+        g.use_replica = True
+        assert active_offer_index.active_offer_ids() == (response.get_json()['id'],)
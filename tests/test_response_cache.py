@@ -0,0 +1,27 @@
+from utils.response_cache import FileResponseCache, response_cache
+
+
+def test_file_cache_stays_bounded_without_scanning_on_every_write(tmp_path, monkeypatch):
+    cache = FileResponseCache(str(tmp_path), max_entries=64, ttl=300)
+    scans = []
+    files = cache._files
+    monkeypatch.setattr(cache, '_files', lambda: scans.append(1) or files())
+    
+    for i in range(1000):
+        cache.set(f'key{i}', b'body')
+    
+    assert len(scans) == 1000 // cache._sweep_every
+    assert len(files()) <= 64 + cache._sweep_every
+    assert cache.get('key999') == b'body'
+    assert cache.get('key0') is None
+
+
+def test_stats_of_an_empty_cache(app, monkeypatch):
+    with app.app_context():
+        backend = response_cache.backend
+        lengths = []
+        monkeypatch.setattr(type(backend), '__len__', lambda self: lengths.append(1) or 0)
+        stats = response_cache.stats()
+    assert stats['backend'] == 'MemoryResponseCache'
+    assert stats['entries'] == 0
+    assert len(lengths) == 1
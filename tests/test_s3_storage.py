@@ -0,0 +1,134 @@
+import io
+import os
+from concurrent.futures import Future
+from urllib.parse import urlparse
+import pytest
+from PIL import Image
+from models import db, Product, ImageBlob
+from services.image_processing import image_pipeline
+from services.storage import storage
+
+boto3 = pytest.importorskip('boto3')
+moto = pytest.importorskip('moto')
+
+BUCKET = 'images'
+
+
+@pytest.fixture(autouse=True)
+def s3(monkeypatch):
+    """An in-memory S3 (moto) the app is configured against; started before the app creates its client"""
+    for name, value in {'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing',
+                        'AWS_SESSION_TOKEN': 'testing', 'AWS_DEFAULT_REGION': 'us-east-1',
+                        'STORAGE_BACKEND': 's3', 'S3_BUCKET': BUCKET, 'S3_REGION': 'us-east-1',
+                        'S3_KEY_PREFIX': 'media/', 'IMAGE_EXECUTOR': 'sync'}.items():
+        monkeypatch.setenv(name, value)
+    with moto.mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def _png(color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _create_products(app, count):
+    with app.app_context():
+        products = [Product(name=f'p{i}', price=1.0, stock=1, category_id=1) for i in range(count)]
+        db.session.add_all(products)
+        db.session.commit()
+        return [product.id for product in products]
+
+
+def _upload(client, headers, product_id, data):
+    response = client.post(f'/api/products/{product_id}/image', headers=headers,
+                           data={'image': (io.BytesIO(data), 'photo.png')}, content_type='multipart/form-data')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['product']
+
+
+def test_put_exists_delete(app, s3, tmp_path):
+    local = tmp_path / 'upload.png'
+    local.write_bytes(_png())
+    with app.app_context():
+        assert not storage.exists('products', 'a.png')
+        storage.put_file(str(local), 'products', 'a.png')
+        assert storage.exists('products', 'a.png')
+        assert not local.exists()
+        
+        head = s3.head_object(Bucket=BUCKET, Key='media/products/a.png')
+        assert head['ContentType'] == 'image/png'
+        assert 'immutable' in head['CacheControl']
+        
+        assert storage.delete('products', 'a.png') is True
+        assert not storage.exists('products', 'a.png')
+
+
+def test_serve_redirects_to_a_presigned_url(app, client, s3):
+    s3.put_object(Bucket=BUCKET, Key='media/products/a.png', Body=_png())
+    response = client.get('/static/products/a.png')
+    assert response.status_code == 302
+    location = urlparse(response.headers['Location'])
+    assert location.path.endswith('/media/products/a.png')
+    assert 'Signature=' in location.query or 'X-Amz-Signature=' in location.query
+    assert response.cache_control.max_age == app.config['S3_PRESIGN_EXPIRES'] - 60
+    with app.app_context():
+        assert storage.url('products', 'a.png') == '/static/products/a.png'
+
+
+@pytest.mark.parametrize('app', [{'S3_PUBLIC_BASE_URL': 'https://cdn.example.com/'}], indirect=True)
+def test_public_base_url(app):
+    with app.app_context():
+        assert storage.url('products', 'a.png') == 'https://cdn.example.com/media/products/a.png'
+
+
+def test_upload_stores_original_and_variants(app, client, auth_headers, s3):
+    [product_id] = _create_products(app, 1)
+    product = _upload(client, auth_headers(1), product_id, _png())
+    filename = product['image']
+    keys = {obj['Key'] for obj in s3.list_objects_v2(Bucket=BUCKET)['Contents']}
+    assert f'media/products/{filename}' in keys
+    with app.app_context():
+        variants = db.session.get(ImageBlob, ('products', filename)).variants
+    assert variants and {f'media/products/{name}' for name in variants.values()} <= keys
+    assert os.listdir(os.path.join(app.config['STORAGE_WORK_DIR'], 'products')) == []  # Released once processed
+
+
+class DeferredExecutor:
+    """Executor that queues jobs until run_all()"""
+    
+    def __init__(self):
+        self.jobs = []
+    
+    def submit(self, fn, *args):
+        future = Future()
+        self.jobs.append((future, fn, args))
+        return future
+    
+    def run_all(self):
+        for future, fn, args in self.jobs:
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+
+def test_duplicate_upload_keeps_the_copy_a_queued_job_needs(app, client, auth_headers, monkeypatch):
+    first, second = _create_products(app, 2)
+    headers = auth_headers(1)
+    executor = DeferredExecutor()
+    monkeypatch.setattr(image_pipeline, 'executor', executor)
+    
+    data = _png()
+    filename = _upload(client, headers, first, data)['image']
+    _upload(client, headers, second, data)  # Same bytes while the first job is still queued
+    assert len(executor.jobs) == 1
+    
+    executor.run_all()
+    [(future, _, _)] = executor.jobs
+    assert future.result()  # The local copy was still there to decode
+    with app.app_context():
+        assert db.session.get(ImageBlob, ('products', filename)).variants == future.result()
+        assert not os.path.exists(os.path.join(storage.work_dir('products'), filename))
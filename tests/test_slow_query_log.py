@@ -0,0 +1,25 @@
+import pytest
+from services import ProductImportService
+from utils.slow_query_log import slow_query_log
+
+
+def test_off_by_default(app, client):
+    assert app.config['SLOW_QUERY_MS'] == 0
+    assert slow_query_log.threshold is None
+
+
+@pytest.mark.parametrize('app', [{'SLOW_QUERY_MS': '1'}], indirect=True)
+def test_inserts_and_batches_are_not_explained(app, monkeypatch):
+    monkeypatch.setattr(slow_query_log, 'threshold', 0)  # Log every statement
+    slow_query_log.clear()
+    with app.app_context():
+        ProductImportService.import_rows(
+            [{'sku': f'S-{i}', 'name': f'Item {i}', 'price': 1, 'stock': 1, 'category_id': 1} for i in range(3)]
+        )
+    entries = slow_query_log.recent()
+    batches = [e for e in entries if isinstance(e['parameters'], dict)]
+    inserts = [e for e in entries if e['statement'].lstrip().upper().startswith('INSERT')]
+    selects = [e for e in entries if e['statement'].lstrip().upper().startswith('SELECT')]
+    assert inserts and selects
+    assert all(e['explain'] is None for e in batches + inserts)
+    assert all(e['explain'] for e in selects)
@@ -0,0 +1,36 @@
+def _login(client, username, password):
+    response = client.post('/api/login', json={'username': username, 'password': password})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def _bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_admin_change_revokes_old_tokens_but_not_new_logins(client):
+    client.post('/api/register', json={'username': 'alice', 'password': 'secret123'})
+    admin = _login(client, 'admin', 'admin123')
+    old = _login(client, 'alice', 'secret123')
+    
+    response = client.put(f"/api/users/{old['user']['id']}/admin", json={'is_admin': True},
+                          headers=_bearer(admin['access_token']))
+    assert response.status_code == 200
+    
+    # Old access and refresh tokens are rejected...
+    assert client.get('/api/cart', headers=_bearer(old['access_token'])).status_code == 401
+    assert client.post('/api/refresh', headers=_bearer(old['refresh_token'])).status_code == 401
+    # ...while logging in again in the same second works
+    new = _login(client, 'alice', 'secret123')
+    assert client.get('/api/cart', headers=_bearer(new['access_token'])).status_code == 200
+    assert client.post('/api/refresh', headers=_bearer(new['refresh_token'])).status_code == 200
+
+
+def test_logout_revokes_only_that_token(client):
+    client.post('/api/register', json={'username': 'bob', 'password': 'secret123'})
+    first = _login(client, 'bob', 'secret123')
+    second = _login(client, 'bob', 'secret123')
+    
+    assert client.post('/api/logout', headers=_bearer(first['access_token'])).status_code == 200
+    assert client.get('/api/cart', headers=_bearer(first['access_token'])).status_code == 401
+    assert client.get('/api/cart', headers=_bearer(second['access_token'])).status_code == 200
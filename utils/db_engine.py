@@ -0,0 +1,105 @@
+# utils/db_engine.py
+import time
+from flask import current_app, g, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, Select
+from sqlalchemy.engine import make_url
+from utils.http_cache import MODIFIED_KEY
+from utils.store import shared_store
+
+SQLITE_JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SQLITE_SYNCHRONOUS = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+REPLICA_BIND = 'replica'
+
+
+def _is_sqlite_memory(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(uri, config):
+    """
+    Engine keyword arguments for one database URL (SQLALCHEMY_ENGINE_OPTIONS
+    or a bind). Pool sizing applies to every server database and to SQLite
+    files; in-memory SQLite keeps its single shared connection.
+    """
+    url = make_url(uri)
+    if _is_sqlite_memory(url):
+        return {}
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+    if url.get_backend_name() != 'sqlite':
+        # Server connections can be dropped by the server or a proxy
+        options['pool_pre_ping'] = config['DB_POOL_PRE_PING']
+        options['pool_recycle'] = config['DB_POOL_RECYCLE']
+    timeout = config['DB_STATEMENT_TIMEOUT_MS']
+    if timeout and url.get_backend_name() == 'postgresql':
+        options['connect_args'] = {'options': f"-c statement_timeout={int(timeout)}"}
+    return options
+
+
+def configure_engine(engine, config):
+    """Per-connection settings that can't be passed as engine options"""
+    backend = engine.dialect.name
+    if backend == 'sqlite':
+        journal_mode = config['SQLITE_JOURNAL_MODE'].upper()
+        synchronous = config['SQLITE_SYNCHRONOUS'].upper()
+        if journal_mode not in SQLITE_JOURNAL_MODES or synchronous not in SQLITE_SYNCHRONOUS:
+            raise ValueError(f"Invalid SQLite journal mode or synchronous setting: {journal_mode}, {synchronous}")
+        pragmas = [
+            f"PRAGMA synchronous={synchronous}",
+            f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+            f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        ]
+        if not _is_sqlite_memory(engine.url):
+            # journal_mode is persistent, but setting it is cheap and idempotent
+            pragmas.insert(0, f"PRAGMA journal_mode={journal_mode}")
+        
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+    
+    elif backend == 'mysql' and config['DB_STATEMENT_TIMEOUT_MS']:
+        timeout = int(config['DB_STATEMENT_TIMEOUT_MS'])
+        
+        @event.listens_for(engine, 'connect')
+        def set_mysql_timeout(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"SET SESSION max_execution_time = {timeout}")
+            cursor.close()
+
+
+def route_reads_to_replica():
+    """
+    before_request hook for read-only blueprints: serve safe requests from
+    the replica bind, except shortly after a catalog write, while the
+    replica may still lag (a stale page would be cached under the new
+    catalog version).
+    """
+    if request.method not in ('GET', 'HEAD') or not current_app.config.get('REPLICA_DATABASE_URL'):
+        return
+    modified = shared_store.get(MODIFIED_KEY)
+    if modified and time.time() - modified < current_app.config['REPLICA_LAG_GRACE']:
+        return
+    g.use_replica = True
+
+
+class RoutingSession(Session):
+    """
+    Session sending plain SELECTs to the 'replica' bind when the request
+    opted in (see route_reads_to_replica). Writes, flushes and SELECT ...
+    FOR UPDATE always go to the primary.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and g and g.get('use_replica')
+                and isinstance(clause, Select) and clause._for_update_arg is None):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
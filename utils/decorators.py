@@ -1,15 +1,19 @@
 # utils/decorators.py
 from functools import wraps
-from flask_jwt_extended import jwt_required, get_jwt
+from flask_jwt_extended import jwt_required, get_jwt, get_current_user
 from flask import jsonify
 
 def admin_required(fn):
-    """Decorator to require admin privileges"""
+    """
+    Decorator to require admin privileges.
+    Checks the token claim and the cached user (see UserClaimsCache), so
+    demoted admins lose access without waiting for token expiry.
+    """
     @wraps(fn)
     @jwt_required()
     def wrapper(*args, **kwargs):  
         claims = get_jwt()
-        if not claims.get('is_admin'):
+        if not claims.get('is_admin') or not get_current_user().is_admin:
             return jsonify({"error": "Admin access required"}), 403
         return fn(*args, **kwargs) 
     return wrapper
\ No newline at end of file
@@ -0,0 +1,116 @@
+# utils/http_cache.py
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, request, make_response
+from utils.store import shared_store
+from utils.response_cache import response_cache
+
+VERSION_KEY = 'catalog:version'
+MODIFIED_KEY = 'catalog:modified'
+STOCK_CHANGED_KEY = 'catalog:stock_changed'
+
+
+def bump_catalog_version():
+    """Mark the public catalog as changed. Call after every committed catalog write."""
+    shared_store.incr(VERSION_KEY)
+    shared_store.set(MODIFIED_KEY, time.time())
+    # Old entries are unreachable under the new version anyway; free them now
+    response_cache.clear()
+
+
+def mark_stock_changed():
+    """
+    Note a stock-only change (checkout). Unlike bump_catalog_version() this
+    keeps the response cache and the replica routing; catalog responses
+    pick the new stock up within CATALOG_STOCK_STALENESS seconds.
+    """
+    shared_store.set(STOCK_CHANGED_KEY, time.time())
+
+
+def catalog_version():
+    return shared_store.get(VERSION_KEY) or 0
+
+
+def _stock_epoch(now):
+    """
+    (epoch, visible_since) for stock changes: the epoch advances at most
+    once per CATALOG_STOCK_STALENESS window - when the window holding the
+    last change ends - so ETags change within one window of any stock
+    change without changing on every checkout.
+    """
+    changed = shared_store.get(STOCK_CHANGED_KEY)
+    if changed is None:
+        return 0, None
+    window = max(1, current_app.config['CATALOG_STOCK_STALENESS'])
+    changed_epoch = int(changed // window)
+    if int(now // window) == changed_epoch:
+        return changed_epoch, changed
+    return changed_epoch + 1, (changed_epoch + 1) * window
+
+
+def _catalog_state():
+    """
+    Everything a catalog response depends on besides the URL: the write
+    version, the stock epoch, plus the currently active offers (prices
+    change when an offer starts or ends, without any write).
+    """
+    from services.offer_index import active_offer_index
+    now = datetime.now(timezone.utc)
+    active_ids = active_offer_index.active_offer_ids(now)
+    stock_epoch, stock_visible = _stock_epoch(now.timestamp())
+    
+    modified = max(shared_store.get(MODIFIED_KEY) or 0, stock_visible or 0)
+    last_modified = datetime.fromtimestamp(modified, timezone.utc) if modified else None
+    last_transition = active_offer_index.last_transition()
+    if last_transition and (last_modified is None or last_transition > last_modified):
+        last_modified = last_transition
+    
+    max_age = current_app.config['CATALOG_CACHE_MAX_AGE']
+    next_transition = active_offer_index.next_transition()
+    if next_transition:
+        max_age = max(0, min(max_age, int((next_transition - now).total_seconds())))
+    return f"{catalog_version()}.{stock_epoch}", active_ids, last_modified, max_age
+
+
+def catalog_cached(fn):
+    """
+    Make a public catalog view conditional: emits a strong ETag,
+    Last-Modified and Cache-Control, and answers If-None-Match /
+    If-Modified-Since with 304 before the view does any work.
+    Successful bodies are kept in the response cache under the ETag, so
+    repeat requests skip querying, serializing and encoding entirely.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        version, active_ids, last_modified, max_age = _catalog_state()
+        key = f"{version}:{','.join(map(str, active_ids))}:{request.full_path}"
+        etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        
+        def add_headers(response):
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            return response
+        
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            since = request.if_modified_since
+            not_modified = bool(since and last_modified and last_modified.replace(microsecond=0) <= since)
+        if not_modified:
+            return add_headers(current_app.response_class(status=304))
+        
+        body = response_cache.get(etag)
+        if body is not None:
+            return add_headers(current_app.response_class(body, mimetype='application/json'))
+        
+        response = make_response(fn(*args, **kwargs))
+        if response.status_code == 200:
+            response_cache.set(etag, response.get_data())
+            add_headers(response)
+        return response
+    return wrapper
@@ -0,0 +1,58 @@
+# utils/json_provider.py
+from flask.json.provider import DefaultJSONProvider
+from utils.metrics import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that encodes with orjson when it is installed and falls
+    back to Flask's stdlib provider otherwise.
+    
+    Output matches the default provider: keys are sorted, and datetime/
+    date and Decimal values still go through Flask's `default` hook
+    (RFC 822 dates, Decimal as string).
+    """
+    
+    def _options(self, indent=False):
+        option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+        option |= orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+    
+    def _encode(self, obj, indent=False):
+        """Encode to bytes, or return None if orjson can't handle this value"""
+        if orjson is None:
+            return None
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(indent))
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits; let the stdlib handle them
+            return None
+    
+    def dumps(self, obj, **kwargs):
+        with timed('json'):
+            if not kwargs:
+                encoded = self._encode(obj)
+                if encoded is not None:
+                    return encoded.decode('utf-8')
+            return super().dumps(obj, **kwargs)
+    
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        with timed('json'):
+            encoded = self._encode(obj, indent=indent)
+            if encoded is None:
+                return super().response(obj)
+        return self._app.response_class(encoded + b"\n", mimetype=self.mimetype)
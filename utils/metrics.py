@@ -0,0 +1,218 @@
+# utils/metrics.py
+import hmac
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from flask import current_app, g, jsonify, request, request_started, request_finished, has_request_context, Response
+from sqlalchemy import event
+from models import db
+from utils.decorators import admin_required
+
+logger = logging.getLogger('app.requests')
+
+PHASES = ('sql', 'serialize', 'json')
+
+
+class RequestStats:
+    """What one request spent its time on (kept on flask.g)"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self._depth = dict.fromkeys(PHASES, 0)
+
+
+def current_stats():
+    if not has_request_context():
+        return None
+    return g.get('request_stats')
+
+
+@contextmanager
+def timed(phase):
+    """
+    Add the time spent in the block to the current request's `phase`.
+    Re-entrant: nested blocks (e.g. nested schemas) are only counted once.
+    """
+    stats = current_stats()
+    if stats is None or stats._depth[phase]:
+        yield
+        return
+    stats._depth[phase] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.seconds[phase] += time.perf_counter() - started
+        stats._depth[phase] -= 1
+
+
+class RequestMetrics:
+    """
+    Flask extension recording per-request performance data.
+    
+    SQL statements are counted and timed through the engines'
+    before/after_cursor_execute events, schema dumps and JSON encoding
+    through `timed` blocks. Each request then gets a Server-Timing header
+    and a structured log line (logger 'app.requests', INFO), and feeds the
+    Prometheus metrics served at METRICS_PATH: per-route request counts,
+    latency histograms and SQL/serialization/JSON time totals.
+    Metrics are per process; scrape every worker. The endpoint takes
+    `Authorization: Bearer <METRICS_TOKEN>`, or an admin's JWT when no
+    token is configured.
+    """
+    
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.buckets = ()
+        self._requests = defaultdict(int)      # (route, method, status) -> count
+        self._histograms = {}                  # (route, method) -> [bucket counts..., +Inf]
+        self._latency_sum = defaultdict(float)  # (route, method) -> seconds
+        self._phase_sum = defaultdict(float)   # (route, phase) -> seconds
+        self._sql_queries = defaultdict(int)   # route -> statements
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_PATH', '/metrics')
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.config.setdefault('METRICS_LATENCY_BUCKETS', (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+        if not app.config['METRICS_ENABLED']:
+            return
+        self.buckets = tuple(sorted(app.config['METRICS_LATENCY_BUCKETS']))
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+                event.listen(engine, 'handle_error', self._handle_error)
+        request_started.connect(self._request_started, app)
+        request_finished.connect(self._request_finished, app)
+        app.add_url_rule(app.config['METRICS_PATH'], 'metrics', self.render_view)
+        app.extensions['request_metrics'] = self
+    
+    # --- Collection ---
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+    
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        stats = current_stats()
+        if stats is not None:
+            stats.sql_count += 1
+            stats.seconds['sql'] += elapsed
+    
+    @staticmethod
+    def _handle_error(context):
+        # A failed statement never reaches after_cursor_execute
+        if context.execution_context is not None and context.connection is not None:
+            started = context.connection.info.get('query_started')
+            if started:
+                started.pop()
+    
+    @staticmethod
+    def _request_started(sender, **extra):
+        g.request_stats = RequestStats()
+    
+    def _request_finished(self, sender, response, **extra):
+        stats = current_stats()
+        if stats is None:
+            return
+        total = time.perf_counter() - stats.started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        
+        response.headers['Server-Timing'] = ', '.join([
+            f'sql;dur={stats.seconds["sql"] * 1000:.2f};desc="{stats.sql_count} queries"',
+            f'serialize;dur={stats.seconds["serialize"] * 1000:.2f}',
+            f'json;dur={stats.seconds["json"] * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+        logger.info(json.dumps({
+            "method": request.method,
+            "route": route,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(total * 1000, 2),
+            "sql_count": stats.sql_count,
+            "sql_ms": round(stats.seconds['sql'] * 1000, 2),
+            "serialize_ms": round(stats.seconds['serialize'] * 1000, 2),
+            "json_ms": round(stats.seconds['json'] * 1000, 2),
+        }))
+        self._observe(route, request.method, response.status_code, total, stats)
+    
+    def _observe(self, route, method, status, total, stats):
+        key = (route, method)
+        with self._lock:
+            self._requests[(route, method, status)] += 1
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1)
+            histogram[bisect_left(self.buckets, total)] += 1
+            self._latency_sum[key] += total
+            self._sql_queries[route] += stats.sql_count
+            for phase in PHASES:
+                self._phase_sum[(route, phase)] += stats.seconds[phase]
+    
+    # --- Exposition ---
+    def render(self):
+        """Current metrics in the Prometheus text format"""
+        def labels(**values):
+            return ','.join(f'{k}="{v}"' for k, v in values.items())
+        
+        lines = [
+            '# HELP http_requests_total Requests handled, by route, method and status.',
+            '# TYPE http_requests_total counter',
+        ]
+        with self._lock:
+            for (route, method, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{{labels(route=route, method=method, status=status)}}} {count}')
+            
+            lines += [
+                '# HELP http_request_duration_seconds Request latency, by route and method.',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for (route, method), histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, '+Inf'), histogram):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else repr(float(bound))
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels(route=route, method=method, le=le)}}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_sum{{{labels(route=route, method=method)}}} {self._latency_sum[(route, method)]:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{{labels(route=route, method=method)}}} {cumulative}')
+            
+            lines += [
+                '# HELP http_request_sql_queries_total SQL statements executed, by route.',
+                '# TYPE http_request_sql_queries_total counter',
+            ]
+            for route, count in sorted(self._sql_queries.items()):
+                lines.append(f'http_request_sql_queries_total{{{labels(route=route)}}} {count}')
+            
+            lines += [
+                '# HELP http_request_phase_seconds_total Time spent in SQL, schema serialization and JSON encoding, by route.',
+                '# TYPE http_request_phase_seconds_total counter',
+            ]
+            for (route, phase), seconds in sorted(self._phase_sum.items()):
+                lines.append(f'http_request_phase_seconds_total{{{labels(route=route, phase=phase)}}} {seconds:.6f}')
+        return '\n'.join(lines) + '\n'
+    
+    def _metrics_response(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+    
+    def render_view(self):
+        token = current_app.config['METRICS_TOKEN']
+        if not token:
+            return admin_required(self._metrics_response)()
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+            return jsonify({"error": "Invalid metrics token"}), 401
+        return self._metrics_response()
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,28 @@
+# utils/pagination.py
+import base64
+import binascii
+
+
+def encode_cursor(last_id):
+    """Encode the last seen primary key into an opaque cursor string"""
+    raw = str(last_id).encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode an opaque cursor back into the last seen primary key
+    Args:
+        cursor: Cursor string from a previous page (or None)
+    Returns:
+        int or None: The id to continue after
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if not cursor:
+        return None
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        return int(base64.urlsafe_b64decode(padded.encode('ascii')).decode('ascii'))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Invalid cursor")
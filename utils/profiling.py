@@ -0,0 +1,152 @@
+# utils/profiling.py
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from flask import current_app, g, request, Response
+from utils.decorators import admin_required
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ARG = '_profile'
+FORMATS = ('pstats', 'collapsed')
+
+
+class StackSampler:
+    """
+    Sampling profiler for one thread: snapshots its stack every `interval`
+    seconds from a background thread and counts identical stacks, which
+    gives collapsed stacks ready for flamegraph tools.
+    """
+    
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}")
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+    
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """
+    Flask extension profiling single requests on demand.
+    
+    An admin sends `X-Profile: pstats|collapsed` or `?_profile=...` (the
+    check goes through admin_required, anyone else gets its 401/403).
+    'pstats' runs the request under cProfile; 'collapsed' samples the
+    request thread every PROFILE_SAMPLE_INTERVAL seconds. The response body
+    is replaced by the profile as text (the original status is kept in
+    X-Profiled-Status), and a copy is written to PROFILE_DIR when set
+    (X-Profile-File names it).
+    """
+    
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.config.setdefault('PROFILE_DIR', None)
+        app.config.setdefault('PROFILE_SAMPLE_INTERVAL', 0.005)
+        app.config.setdefault('PROFILE_TOP', 60)
+        # Registered first so the profile covers the other hooks too
+        app.before_request_funcs.setdefault(None, []).insert(0, self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._cleanup)
+        app.extensions['request_profiler'] = self
+    
+    @staticmethod
+    def _requested_format():
+        return request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_ARG)
+    
+    def _start(self):
+        fmt = self._requested_format()
+        if not fmt:
+            return None
+        if fmt not in FORMATS:
+            return {"error": f"{PROFILE_HEADER} must be one of: {', '.join(FORMATS)}"}, 400
+        denied = admin_required(lambda: None)()
+        if denied is not None:
+            return denied
+        if fmt == 'pstats':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident(), current_app.config['PROFILE_SAMPLE_INTERVAL'])
+            profiler.start()
+        g.profile = (fmt, profiler, time.perf_counter())
+        return None
+    
+    @staticmethod
+    def _stop(profiler):
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+        else:
+            profiler.stop()
+    
+    def _finish(self, response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        fmt, profiler, started = profile
+        self._stop(profiler)
+        elapsed = time.perf_counter() - started
+        
+        if fmt == 'pstats':
+            out = io.StringIO()
+            stats = pstats.Stats(profiler, stream=out)
+            stats.sort_stats('cumulative').print_stats(current_app.config['PROFILE_TOP'])
+            body = out.getvalue()
+        else:
+            body = profiler.collapsed()
+        
+        profiled = Response(body, mimetype='text/plain')
+        profiled.headers['X-Profiled-Status'] = str(response.status_code)
+        profiled.headers['X-Profile-Seconds'] = f"{elapsed:.6f}"
+        directory = current_app.config['PROFILE_DIR']
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            endpoint = (request.endpoint or 'unmatched').replace('.', '-')
+            name = f"{time.strftime('%Y%m%dT%H%M%S')}-{endpoint}-{uuid.uuid4().hex[:8]}"
+            if fmt == 'pstats':
+                path = os.path.join(directory, f"{name}.prof")
+                profiler.dump_stats(path)
+            else:
+                path = os.path.join(directory, f"{name}.collapsed")
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(body)
+            profiled.headers['X-Profile-File'] = os.path.basename(path)
+        return profiled
+    
+    def _cleanup(self, exc):
+        # The view raised and after_request never ran
+        profile = g.pop('profile', None)
+        if profile is not None:
+            self._stop(profile[1])
+
+
+request_profiler = RequestProfiler()
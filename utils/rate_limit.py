@@ -0,0 +1,155 @@
+# utils/rate_limit.py
+import math
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, request
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
+from exceptions import RateLimitExceededException
+from utils.store import make_store
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+def parse_limit(spec):
+    """
+    Parse a rate like '10/minute'
+    Returns:
+        tuple: (burst capacity, refill rate in tokens per second), or None if unset
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    if not spec:
+        return None
+    try:
+        count, period = spec.split('/')
+        count = int(count)
+        seconds = PERIODS[period.strip()]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate limit {spec!r}, expected e.g. '10/minute'")
+    if count <= 0:
+        raise ValueError(f"Invalid rate limit {spec!r}, count must be positive")
+    return count, count / seconds
+
+
+def take_token(state, capacity, rate, now):
+    """
+    One token-bucket step
+    Args:
+        state: [tokens, updated_at] or None for a new (full) bucket
+    Returns:
+        tuple: (new state, seconds until a token is available - 0 if one was taken)
+    """
+    tokens, updated_at = state if state else (capacity, now)
+    tokens = min(capacity, tokens + max(0, now - updated_at) * rate)
+    if tokens >= 1:
+        return [tokens - 1, now], 0
+    return [tokens, now], (1 - tokens) / rate
+
+
+class RateLimiter:
+    """
+    Flask extension for admission control on write endpoints.
+    
+    RATE_LIMITS maps blueprint names to token buckets ('10/minute' allows a
+    burst of 10, refilled at 10 per minute). Every caller has its own
+    bucket, keyed by JWT identity when a valid token is sent and by client
+    IP otherwise. Only writes are counted (safe methods are served from
+    the HTTP caches). Buckets live in RATE_LIMIT_STORAGE_URL: memory://
+    limits each worker separately, a file:// or redis:// store URL (e.g.
+    SHARED_STORE_URL) enforces one limit across workers and nodes.
+    
+    CONCURRENCY_LIMITS caps in-flight requests per worker for views wrapped
+    with @concurrency_limit(name).
+    
+    Both reject with RateLimitExceededException (429 + Retry-After)
+    instead of letting requests queue. The buckets' store, the limits and
+    the slots belong to the app (app.extensions['rate_limiter']).
+    """
+    
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMITS', {})
+        app.config.setdefault('RATE_LIMIT_STORAGE_URL', None)
+        app.config.setdefault('CONCURRENCY_LIMITS', {})
+        app.extensions['rate_limiter'] = {
+            'store': make_store(app.config['RATE_LIMIT_STORAGE_URL']),
+            'limits': {
+                blueprint: limit for blueprint, limit in
+                ((name, parse_limit(spec)) for name, spec in app.config['RATE_LIMITS'].items())
+                if limit
+            },
+            'slots': {
+                name: threading.BoundedSemaphore(size)
+                for name, size in app.config['CONCURRENCY_LIMITS'].items() if size
+            }
+        }
+        app.before_request(self._check_rate_limit)
+    
+    @property
+    def state(self):
+        return current_app.extensions['rate_limiter']
+    
+    @staticmethod
+    def client_key():
+        """
+        JWT identity if the request carries a valid token, else the client IP.
+        The view's own JWT check reuses the user looked up here (see
+        load_user in create_app).
+        """
+        try:
+            verify_jwt_in_request(optional=True, verify_type=False)
+            identity = get_jwt_identity()
+        except (JWTExtendedException, PyJWTError):
+            identity = None
+        if identity is not None:
+            return f"user:{identity}"
+        return f"ip:{request.remote_addr}"
+    
+    def _check_rate_limit(self):
+        state = self.state
+        limit = state['limits'].get(request.blueprint)
+        if limit is None or request.method in SAFE_METHODS:
+            return
+        capacity, rate = limit
+        key = f"ratelimit:{request.blueprint}:{self.client_key()}"
+        # Idle buckets expire once they would be full again anyway
+        ttl = math.ceil(capacity / rate) + 1
+        wait = state['store'].update(key, lambda bucket: take_token(bucket, capacity, rate, time.time()), ttl)
+        if wait:
+            raise RateLimitExceededException("Too many requests", retry_after=math.ceil(wait))
+    
+    @contextmanager
+    def slot(self, name):
+        """Hold one of the CONCURRENCY_LIMITS[name] slots for the duration"""
+        slots = self.state['slots'].get(name)
+        if slots is None:
+            yield
+            return
+        if not slots.acquire(blocking=False):
+            raise RateLimitExceededException(f"Too many concurrent {name}, retry shortly")
+        try:
+            yield
+        finally:
+            slots.release()
+
+
+rate_limiter = RateLimiter()
+
+
+def concurrency_limit(name):
+    """Decorator rejecting the view with 429 while CONCURRENCY_LIMITS[name] requests are in flight"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with rate_limiter.slot(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,250 @@
+# utils/response_cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+from flask import current_app
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class MemoryResponseCache:
+    """LRU cache of encoded response bodies, bounded by entry count, bytes and TTL"""
+    
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+    
+    def _remove(self, key):
+        body, _ = self._entries.pop(key)
+        self._size -= len(body)
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            body, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return body
+    
+    def set(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (body, time.time() + self.ttl)
+            self._size += len(body)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+    
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileResponseCache:
+    """
+    Response bodies stored as files in a directory shared by all workers.
+    Expired and excess files are swept every `max_entries // 8` writes
+    (per worker) rather than on each one, so a write doesn't scan the
+    directory; the cache can briefly hold that many extra entries.
+    """
+    
+    def __init__(self, directory, max_entries=1024, ttl=300):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._sweep_every = max(16, max_entries // 8)
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+    
+    def _files(self):
+        return [e for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith('.tmp')]
+    
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if os.path.getmtime(path) + self.ttl <= time.time():
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def set(self, key, body):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self._sweep_every == 0
+        if due:
+            self._sweep()
+    
+    def _sweep(self):
+        """Remove expired files, then the oldest ones beyond max_entries"""
+        expired_before = time.time() - self.ttl
+        files = []
+        for entry in self._files():
+            try:
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            files.append((mtime, entry.path))
+        files.sort()
+        excess = max(0, len(files) - self.max_entries)
+        for index, (mtime, path) in enumerate(files):
+            if index >= excess and mtime > expired_before:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except OSError:
+                pass
+    
+    def clear(self):
+        for entry in self._files():
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+    
+    def __len__(self):
+        return len(self._files())
+
+
+class RedisResponseCache:
+    """Response bodies stored in Redis (or any Redis-protocol server) with a TTL"""
+    
+    PREFIX = 'response:'
+    
+    def __init__(self, url, ttl=300):
+        if redis is None:
+            raise RuntimeError("The 'redis' package is required for redis:// cache URLs")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.evictions = 0  # Redis evicts on its own (maxmemory-policy)
+    
+    def get(self, key):
+        return self.client.get(self.PREFIX + key)
+    
+    def set(self, key, body):
+        self.client.set(self.PREFIX + key, body, ex=self.ttl)
+    
+    def clear(self):
+        for key in self.client.scan_iter(self.PREFIX + '*'):
+            self.client.delete(key)
+    
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(self.PREFIX + '*'))
+
+
+def make_response_cache(url, max_entries, max_bytes, ttl):
+    """
+    Build a response cache from a URL
+        None / 'memory://'      -> MemoryResponseCache
+        'file:///path/to/dir'   -> FileResponseCache
+        'redis://host:6379/0'   -> RedisResponseCache
+        'none://'               -> caching disabled
+    """
+    if not url or url.startswith('memory://'):
+        return MemoryResponseCache(max_entries, max_bytes, ttl)
+    if url.startswith('none://'):
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == 'file':
+        return FileResponseCache(parsed.path, max_entries, ttl)
+    if parsed.scheme in ('redis', 'rediss', 'unix'):
+        return RedisResponseCache(url, ttl)
+    raise ValueError(f"Unsupported response cache URL: {url}")
+
+
+class ResponseCache:
+    """Flask extension caching already-encoded JSON bodies, with hit/miss counters"""
+    
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_URL', None)
+        app.config.setdefault('RESPONSE_CACHE_TTL', 300)
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        app.extensions['response_cache'] = make_response_cache(
+            app.config['RESPONSE_CACHE_URL'],
+            app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+            app.config['RESPONSE_CACHE_MAX_BYTES'],
+            app.config['RESPONSE_CACHE_TTL']
+        )
+    
+    @property
+    def backend(self):
+        return current_app.extensions.get('response_cache')
+    
+    def _count(self, attr):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+    
+    def get(self, key):
+        if self.backend is None:
+            return None
+        body = self.backend.get(key)
+        self._count('hits' if body is not None else 'misses')
+        return body
+    
+    def set(self, key, body):
+        if self.backend is not None:
+            self.backend.set(key, body)
+    
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+            self._count('invalidations')
+    
+    def stats(self):
+        """Counters for sizing the cache (per worker process)"""
+        backend = self.backend
+        # Not `if backend`: that calls __len__ (a full SCAN on Redis), and an empty cache is falsy
+        return {
+            "backend": type(backend).__name__ if backend is not None else None,
+            "entries": len(backend) if backend is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": backend.evictions if backend is not None else 0,
+            "invalidations": self.invalidations
+        }
+
+
+response_cache = ResponseCache()
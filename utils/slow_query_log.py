@@ -0,0 +1,153 @@
+# utils/slow_query_log.py
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from flask import has_request_context, request
+from sqlalchemy import event
+from models import db
+
+logger = logging.getLogger('app.slow_queries')
+
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+    'mysql': 'EXPLAIN ',
+    'mariadb': 'EXPLAIN ',
+}
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+
+class SlowQueryLog:
+    """
+    Flask extension logging SQL statements slower than SLOW_QUERY_MS.
+    Off by default (SLOW_QUERY_MS=0): the logged queries are EXPLAINed on
+    the request's own connection, so enable it per environment.
+    
+    Each entry has the statement, its bound parameters, the database's
+    EXPLAIN output (skipped for INSERTs and batches, or entirely with
+    SLOW_QUERY_EXPLAIN off), and where it came from: the Flask endpoint plus the innermost
+    service function on the stack (e.g. CartService.checkout). Batches
+    (executemany) count as slow by their time per row, so bulk writes
+    aren't logged just for being big.
+    Entries go to the 'app.slow_queries' logger (WARNING, one JSON object
+    per line) and the last SLOW_QUERY_KEEP are kept in memory for
+    /api/debug/slow-queries.
+    """
+    
+    def __init__(self, app=None):
+        self.threshold = None
+        self.entries = deque()
+        self._lock = threading.Lock()
+        self._project_root = None
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.config.setdefault('SLOW_QUERY_MS', 0)
+        app.config.setdefault('SLOW_QUERY_KEEP', 100)
+        app.config.setdefault('SLOW_QUERY_EXPLAIN', True)
+        app.extensions['slow_query_log'] = self
+        if not app.config['SLOW_QUERY_MS']:
+            self.threshold = None
+            return
+        self.threshold = app.config['SLOW_QUERY_MS'] / 1000
+        self.explain = app.config['SLOW_QUERY_EXPLAIN']
+        self.entries = deque(maxlen=app.config['SLOW_QUERY_KEEP'])
+        self._project_root = app.root_path
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+                event.listen(engine, 'handle_error', self._handle_error)
+    
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slow_query_started', []).append(time.perf_counter())
+    
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['slow_query_started'].pop()
+        rows = len(parameters) if executemany else 1
+        if elapsed < self.threshold * max(rows, 1):
+            return
+        entry = {
+            "duration_ms": round(elapsed * 1000, 2),
+            "statement": statement,
+            "parameters": self._format_parameters(parameters, executemany),
+            "explain": self._explain(conn, cursor, statement, parameters, executemany),
+            "endpoint": request.endpoint if has_request_context() else None,
+            "service": self._service_function(),
+            "at": time.time(),
+        }
+        with self._lock:
+            self.entries.append(entry)
+        logger.warning(json.dumps(entry, default=repr))
+    
+    @staticmethod
+    def _handle_error(context):
+        # A failed statement never reaches after_cursor_execute
+        if context.execution_context is not None and context.connection is not None:
+            started = context.connection.info.get('slow_query_started')
+            if started:
+                started.pop()
+    
+    @staticmethod
+    def _format_parameters(parameters, executemany):
+        if executemany:
+            # Only a sample of large batches
+            return {"rows": len(parameters), "first": repr(parameters[0])[:500] if parameters else None}
+        return repr(parameters)[:1000]
+    
+    @staticmethod
+    def _explainable(statement, executemany):
+        """Reads, updates and deletes; never batches or INSERTs"""
+        return not executemany and statement.lstrip().upper().startswith(EXPLAINABLE)
+    
+    def _explain(self, conn, cursor, statement, parameters, executemany):
+        prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if not self.explain or prefix is None or not self._explainable(statement, executemany):
+            return None
+        # Run on a raw DB-API cursor of the same connection: same transaction,
+        # no SQLAlchemy events (so this can't trigger itself)
+        explain_cursor = cursor.connection.cursor()
+        # A failed statement aborts the whole transaction on PostgreSQL
+        savepoint = conn.dialect.name == 'postgresql'
+        try:
+            if savepoint:
+                explain_cursor.execute("SAVEPOINT slow_query_explain")
+            explain_cursor.execute(prefix + statement, parameters)
+            plan = [' '.join(str(value) for value in row) for row in explain_cursor.fetchall()]
+            if savepoint:
+                explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            return plan
+        except Exception as e:
+            if savepoint:
+                explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return [f"EXPLAIN failed: {e}"]
+        finally:
+            explain_cursor.close()
+    
+    def _service_function(self):
+        """Innermost project function under services/ on the current stack, e.g. 'CartService.checkout'"""
+        services_dir = os.path.join(self._project_root, 'services') + os.sep
+        frame = sys._getframe(2)
+        while frame is not None:
+            code = frame.f_code
+            if code.co_filename.startswith(services_dir):
+                return getattr(code, 'co_qualname', code.co_name)
+            frame = frame.f_back
+        return None
+    
+    def recent(self):
+        with self._lock:
+            return list(reversed(self.entries))
+    
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+
+slow_query_log = SlowQueryLog()
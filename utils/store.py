@@ -0,0 +1,252 @@
+# utils/store.py
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class MemoryStore:
+    """Process-local key/value store. Fine for a single worker or tests."""
+    
+    SWEEP_EVERY = 1024  # writes between purges of expired keys
+    
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+    
+    def _sweep(self, now):
+        # Expired keys are otherwise only dropped when read again, which
+        # never happens for e.g. one-off client keys
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            for key in [k for k, (_, expires_at) in self._data.items()
+                        if expires_at is not None and expires_at <= now]:
+                del self._data[key]
+    
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return None
+        return entry
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.time())
+            return entry[0] if entry else None
+    
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with self._lock:
+            self._sweep(now)
+            self._data[key] = (value, expires_at)
+    
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def incr(self, key, amount=1):
+        with self._lock:
+            entry = self._live(key, time.time())
+            value, expires_at = entry if entry else (0, None)
+            value += amount
+            self._data[key] = (value, expires_at)
+            return value
+    
+    def update(self, key, fn, ttl=None):
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            entry = self._live(key, now)
+            value, result = fn(entry[0] if entry else None)
+            self._data[key] = (value, now + ttl if ttl else None)
+            return result
+
+
+class FileStore:
+    """
+    Key/value store on a shared directory, so several gunicorn workers
+    on one host (or hosts sharing a volume) see the same values.
+    Values must be JSON-serializable.
+    """
+    
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+    
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+    
+    def _read(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value, expires_at = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return value, expires_at
+    
+    def _write(self, path, value, expires_at):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump([value, expires_at], f)
+        os.replace(tmp_path, path)
+    
+    def get(self, key):
+        entry = self._read(self._path(key))
+        return entry[0] if entry else None
+    
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        self._write(self._path(key), value, expires_at)
+    
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+    
+    def _locked(self, path, fn):
+        """Run fn() holding this key's lock across threads and processes"""
+        with self._lock, open(path + '.lock', 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                return fn()
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def incr(self, key, amount=1):
+        path = self._path(key)
+        
+        def increment():
+            entry = self._read(path)
+            value, expires_at = entry if entry else (0, None)
+            value += amount
+            self._write(path, value, expires_at)
+            return value
+        return self._locked(path, increment)
+    
+    def update(self, key, fn, ttl=None):
+        path = self._path(key)
+        
+        def apply():
+            entry = self._read(path)
+            value, result = fn(entry[0] if entry else None)
+            self._write(path, value, time.time() + ttl if ttl else None)
+            return result
+        return self._locked(path, apply)
+
+
+class RedisStore:
+    """Key/value store on Redis (or any Redis-protocol server). Requires `redis`."""
+    
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError("The 'redis' package is required for redis:// store URLs")
+        self.client = redis.Redis.from_url(url)
+    
+    def get(self, key):
+        value = self.client.get(key)
+        return json.loads(value) if value is not None else None
+    
+    def set(self, key, value, ttl=None):
+        self.client.set(key, json.dumps(value), ex=int(ttl) if ttl else None)
+    
+    def delete(self, key):
+        self.client.delete(key)
+    
+    def incr(self, key, amount=1):
+        return self.client.incrby(key, amount)
+    
+    def update(self, key, fn, ttl=None):
+        # Optimistic transaction: retried if the key changes under us
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    raw = pipe.get(key)
+                    value, result = fn(json.loads(raw) if raw is not None else None)
+                    pipe.multi()
+                    pipe.set(key, json.dumps(value), ex=int(ttl) if ttl else None)
+                    pipe.execute()
+                    return result
+                except redis.WatchError:
+                    continue
+
+
+def make_store(url):
+    """
+    Build a store from a URL
+        None / 'memory://'      -> MemoryStore
+        'file:///path/to/dir'   -> FileStore
+        'redis://host:6379/0'   -> RedisStore
+    """
+    if not url or url.startswith('memory://'):
+        return MemoryStore()
+    parsed = urlparse(url)
+    if parsed.scheme == 'file':
+        return FileStore(parsed.path)
+    if parsed.scheme in ('redis', 'rediss', 'unix'):
+        return RedisStore(url)
+    raise ValueError(f"Unsupported store URL: {url}")
+
+
+class SharedStore:
+    """Flask extension exposing the configured store as `shared_store`"""
+    
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        app.config.setdefault('SHARED_STORE_URL', None)
+        app.extensions['shared_store'] = make_store(app.config['SHARED_STORE_URL'])
+    
+    @property
+    def backend(self):
+        return current_app.extensions['shared_store']
+    
+    def get(self, key):
+        return self.backend.get(key)
+    
+    def set(self, key, value, ttl=None):
+        return self.backend.set(key, value, ttl)
+    
+    def delete(self, key):
+        return self.backend.delete(key)
+    
+    def incr(self, key, amount=1):
+        return self.backend.incr(key, amount)
+    
+    def update(self, key, fn, ttl=None):
+        """
+        Atomically replace a value: fn(current or None) -> (new value, result)
+        Returns:
+            The `result` returned by fn
+        """
+        return self.backend.update(key, fn, ttl)
+
+
+shared_store = SharedStore()
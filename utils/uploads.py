@@ -0,0 +1,27 @@
+# utils/uploads.py
+from flask import Request, current_app
+from services.file_service import FileService
+
+
+class StreamingUploadRequest(Request):
+    """
+    Request class that streams multipart file parts into an UploadSink
+    instead of Werkzeug's spooled temp file, so uploads are validated,
+    hashed and stored while they arrive and rejected as early as possible.
+    """
+    
+    def _get_file_stream(self, total_content_length, content_type,
+                         filename=None, content_length=None):
+        return FileService.open_upload_sink()
+    
+    @property
+    def max_content_length(self):
+        """
+        MAX_CONTENT_LENGTH, unless the matched MethodView names another config
+        key in `max_content_length_config` (e.g. bulk imports)
+        """
+        view = current_app.view_functions.get(self.endpoint) if self.url_rule else None
+        config_key = getattr(getattr(view, 'view_class', None), 'max_content_length_config', None)
+        if config_key:
+            return current_app.config[config_key]
+        return super().max_content_length